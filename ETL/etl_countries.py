@@ -0,0 +1,183 @@
+# =============================================================================
+# Script : etl_countries.py
+# Description :
+# Index canonique des pays partagé par toutes les étapes de l'ETL.
+#
+# - Construit une fois par etl_table_pays.py : clé normalisée (minuscules,
+#   espaces réduits, sans accents) et alias connus -> id_pays
+# - Enregistré avec les sorties de l'ETL (DatasetClean/pays_index.parquet)
+# - Les tables principales obtiennent id_pays par codes catégoriels
+#   (chaque nom distinct n'est haché qu'une fois) au lieu d'une fusion sur chaînes
+# - Les noms non reconnus sont comptés par table et enregistrés dans
+#   DatasetClean/pays_non_reconnus.json au lieu d'être écartés silencieusement
+# =============================================================================
+
+import json
+import logging
+import os
+import threading
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+DATASET_DIR = Path(__file__).resolve().parent.parent / 'DatasetClean'
+INDEX_FILE = DATASET_DIR / 'pays_index.parquet'
+UNMATCHED_FILE = DATASET_DIR / 'pays_non_reconnus.json'
+
+# Variantes rencontrées dans les sources OMS / ONUSIDA -> nom de pays_clean.csv
+COUNTRY_ALIASES = {
+    "bolivia": "bolivia (plurinational state of)",
+    "brunei": "brunei darussalam",
+    "cape verde": "cabo verde",
+    "ivory coast": "côte d'ivoire",
+    "czech republic": "czechia",
+    "north korea": "democratic people's republic of korea",
+    "dr congo": "democratic republic of the congo",
+    "drc": "democratic republic of the congo",
+    "congo, democratic republic of the": "democratic republic of the congo",
+    "republic of the congo": "congo",
+    "swaziland": "eswatini",
+    "the gambia": "gambia",
+    "the bahamas": "bahamas",
+    "iran": "iran (islamic republic of)",
+    "laos": "lao people's democratic republic",
+    "south korea": "republic of korea",
+    "korea, republic of": "republic of korea",
+    "moldova": "republic of moldova",
+    "north macedonia": "republic of north macedonia",
+    "the former yugoslav republic of macedonia": "republic of north macedonia",
+    "russia": "russian federation",
+    "syria": "syrian arab republic",
+    "east timor": "timor-leste",
+    "türkiye": "turkey",
+    "united kingdom": "united kingdom of great britain and northern ireland",
+    "uk": "united kingdom of great britain and northern ireland",
+    "tanzania": "united republic of tanzania",
+    "united states": "united states of america",
+    "usa": "united states of america",
+    "venezuela": "venezuela (bolivarian republic of)",
+    "vietnam": "viet nam",
+    "burma": "myanmar",
+}
+
+_unmatched = {}
+_unmatched_lock = threading.Lock()
+
+
+def normalize_keys(values):
+    """
+    Clé de correspondance vectorisée d'un nom de pays
+    (minuscules, espaces réduits, accents supprimés : "Côte d'Ivoire " -> "cote d'ivoire")
+    Args:
+        values (Series): Noms de pays
+    Returns:
+        Series: Clés normalisées (NaN conservés)
+    """
+    keys = values.astype('string').str.strip().str.lower().str.replace(r"\s+", " ", regex=True)
+    return keys.str.normalize('NFKD').str.encode('ascii', errors='ignore').str.decode('ascii')
+
+
+def build_country_index(pays_df):
+    """
+    Construction de l'index des clés pays
+    Args:
+        pays_df (DataFrame): Table pays (id_pays, pays)
+    Returns:
+        DataFrame: cle, id_pays, origine ('nom' ou 'alias'), une ligne par clé
+    """
+    names = pd.DataFrame({
+        'cle': normalize_keys(pays_df['pays']),
+        'id_pays': pays_df['id_pays'].astype(np.int32).to_numpy(),
+        'origine': 'nom',
+    })
+    duplicated = names['cle'].duplicated()
+    if duplicated.any():
+        logging.warning(f"⚠️ Noms de pays identiques après normalisation : {names.loc[duplicated, 'cle'].tolist()}")
+
+    aliases = pd.DataFrame({'alias': list(COUNTRY_ALIASES), 'nom': list(COUNTRY_ALIASES.values())})
+    aliases = aliases.assign(
+        cle=normalize_keys(aliases['alias']),
+        nom=normalize_keys(aliases['nom']),
+    ).merge(names[['cle', 'id_pays']].rename(columns={'cle': 'nom'}), on='nom', how='inner')
+    aliases = aliases.assign(origine='alias')[['cle', 'id_pays', 'origine']]
+
+    # Un nom officiel l'emporte sur un alias identique
+    index = pd.concat([names, aliases], ignore_index=True).drop_duplicates('cle', keep='first')
+    return index.reset_index(drop=True)
+
+
+def write_country_index(index, index_file=INDEX_FILE):
+    """
+    Écriture atomique de l'index des pays
+    Returns:
+        Path: Fichier écrit
+    """
+    index_file = Path(index_file)
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = index_file.with_name(index_file.name + '.tmp')
+    pq.write_table(pa.Table.from_pandas(index, preserve_index=False), tmp)
+    os.replace(tmp, index_file)
+    return index_file
+
+
+def read_country_index(index_file=INDEX_FILE):
+    """
+    Lecture de l'index des pays (construit par etl_table_pays.py)
+    """
+    return pq.read_table(index_file, memory_map=True).to_pandas()
+
+
+def attach_country_ids(df, index, table, country_column='Country'):
+    """
+    Ajout de id_pays par codes catégoriels ; les lignes non reconnues sont écartées et comptées
+    (même résultat et même ordre qu'une fusion interne sur le nom)
+    Args:
+        df (DataFrame): Données sources
+        index (DataFrame): Index des pays (read_country_index)
+        table (str): Table en cours, pour le rapport des noms non reconnus
+        country_column (str): Colonne du nom de pays
+    Returns:
+        DataFrame: Lignes reconnues avec la colonne id_pays
+    """
+    keys = normalize_keys(df[country_column])
+    codes = pd.Categorical(keys, categories=index['cle']).codes
+    matched = codes >= 0
+
+    unmatched = keys[~matched & keys.notna().to_numpy()]
+    if len(unmatched):
+        with _unmatched_lock:
+            _unmatched.setdefault(table, Counter()).update(unmatched.value_counts().to_dict())
+
+    result = df.loc[matched].copy()
+    result['id_pays'] = index['id_pays'].to_numpy()[codes[matched]]
+    return result
+
+
+def write_unmatched_report(table, report_file=UNMATCHED_FILE):
+    """
+    Enregistrement des noms de pays non reconnus pour une table (et remise à zéro du compteur)
+    Returns:
+        dict: Nom normalisé -> nombre de lignes écartées
+    """
+    with _unmatched_lock:
+        counts = dict(sorted(_unmatched.pop(table, Counter()).items()))
+        report_file = Path(report_file)
+        try:
+            with open(report_file, encoding='utf-8') as f:
+                report = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            report = {}
+        report[table] = counts
+        report_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = report_file.with_name(report_file.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, sort_keys=True)
+        os.replace(tmp, report_file)
+
+    if counts:
+        logging.warning(f"⚠️ {sum(counts.values())} lignes de {table} sans pays reconnu : {', '.join(counts)}")
+    return counts
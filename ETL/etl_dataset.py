@@ -0,0 +1,222 @@
+# =============================================================================
+# Script : etl_dataset.py
+# Description :
+# Format d'échange de DatasetClean : fichiers Parquet typés.
+#
+# - Un schéma Arrow explicite par table, dérivé de backend/models.py
+#   (Integer -> int32, String -> string, DECIMAL -> float64, nullable)
+# - Écriture validée : une valeur hors type ou un NULL interdit fait échouer
+#   l'écriture au lieu de produire un fichier faux
+# - Contraintes des schémas pydantic (backend/schemas.py : bornes, longueurs)
+#   vérifiées par masques vectorisés avant l'écriture (backend/validation.py)
+# - Lecture sans analyse de texte ni inférence de types, en Arrow ou pandas
+#   (fichier projeté en mémoire, colonnes converties sans copie si possible)
+# - Repli sur le CSV de DatasetClean, typé avec le même schéma, si le
+#   fichier Parquet n'existe pas encore
+#
+# Le CSV reste produit par défaut (PowerBI, SQL/import_data.sql) ;
+# ETL_CSV_OUTPUT=0 le désactive.
+# =============================================================================
+
+import ast
+import os
+import sys
+from functools import lru_cache
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl_loader import TABLE_MAPPINGS
+
+DATASET_DIR = Path(__file__).resolve().parent.parent / 'DatasetClean'
+BACKEND_DIR = Path(__file__).resolve().parent.parent / 'backend'
+MODELS_FILE = BACKEND_DIR / 'models.py'
+
+# Types SQLAlchemy -> types Arrow
+ARROW_TYPES = {
+    "Integer": pa.int32(),
+    "String": pa.string(),
+    "DECIMAL": pa.float64(),
+}
+
+# Colonnes de DatasetClean sans équivalent dans backend/models.py (type SQLAlchemy, nullable)
+EXTRA_COLUMNS = {
+    "transmission_mere_enfant": {
+        "besoin_arv_min": ("Integer", False),
+        "besoin_arv_median": ("Integer", False),
+        "besoin_arv_max": ("Integer", False),
+        "pourcentage_recu_min": ("DECIMAL", False),
+        "pourcentage_recu_max": ("DECIMAL", False),
+    },
+}
+
+
+def _type_name(node):
+    """
+    Nom du type SQLAlchemy d'un argument de mapped_column (Integer, String(100), ...)
+    """
+    if isinstance(node, ast.Call):
+        node = node.func
+    return node.id if isinstance(node, ast.Name) else None
+
+
+@lru_cache(maxsize=None)
+def model_columns(models_file=MODELS_FILE):
+    """
+    Lecture des colonnes déclarées dans backend/models.py, sans importer le backend
+    (pas de connexion ni de configuration de base nécessaire)
+    Returns:
+        dict: Table SQL -> {colonne: (type SQLAlchemy, nullable)}
+    """
+    tree = ast.parse(Path(models_file).read_text(encoding='utf-8'))
+    tables = {}
+    for cls in tree.body:
+        if not isinstance(cls, ast.ClassDef):
+            continue
+        table, columns = None, {}
+        for stmt in cls.body:
+            if isinstance(stmt, ast.Assign) and getattr(stmt.targets[0], 'id', None) == '__tablename__':
+                table = stmt.value.value
+            elif (isinstance(stmt, ast.AnnAssign) and isinstance(stmt.value, ast.Call)
+                  and getattr(stmt.value.func, 'id', None) == 'mapped_column'):
+                kwargs = {kw.arg: kw.value.value for kw in stmt.value.keywords
+                          if isinstance(kw.value, ast.Constant)}
+                # Même règle que SQLAlchemy : nullable explicite, sinon Optional[...] hors clé primaire
+                optional = 'Optional' in ast.unparse(stmt.annotation)
+                nullable = kwargs.get('nullable', optional and not kwargs.get('primary_key', False))
+                columns[stmt.target.id] = (_type_name(stmt.value.args[0]), nullable)
+        if table:
+            tables[table] = columns
+    return tables
+
+
+@lru_cache(maxsize=None)
+def table_schema(name):
+    """
+    Schéma Arrow d'une table de DatasetClean
+    Args:
+        name (str): Nom de la table (clé de TABLE_MAPPINGS)
+    Returns:
+        pa.Schema: Colonnes DatasetClean typées d'après backend/models.py
+    """
+    mapping = TABLE_MAPPINGS[name]
+    sql_columns = model_columns()[mapping["table"]]
+    declared = {src: sql_columns[sql] for sql, src in mapping["columns"].items()}
+    declared.update(EXTRA_COLUMNS.get(name, {}))
+    return pa.schema([
+        pa.field(column, ARROW_TYPES[type_name], nullable=nullable)
+        for column, (type_name, nullable) in declared.items()
+    ])
+
+
+def validate_table(name, data):
+    """
+    Contrôle vectorisé des contraintes du schéma pydantic de la table (backend/schemas.py)
+    Seules les colonnes présentes sont contrôlées (colonnes DatasetClean -> champs du schéma).
+    Args:
+        name (str): Nom de la table (clé de TABLE_MAPPINGS)
+        data (DataFrame | pa.Table): Données transformées
+    Returns:
+        ValidationResult: Masque des lignes conformes et violations par règle
+    """
+    if str(BACKEND_DIR) not in sys.path:
+        sys.path.append(str(BACKEND_DIR))
+    import validation
+
+    mapping = TABLE_MAPPINGS[name]
+    if isinstance(data, (pa.Table, pa.RecordBatch)):
+        return validation.validate_arrow(data, mapping["table"], mapping["columns"])
+    return validation.validate_frame(data, mapping["table"], mapping["columns"])
+
+
+def parquet_path(name, dataset_dir=DATASET_DIR):
+    """
+    Chemin du fichier Parquet d'une table (même nom que le CSV, extension .parquet)
+    """
+    return Path(dataset_dir) / Path(TABLE_MAPPINGS[name]["file"]).with_suffix('.parquet').name
+
+
+def to_arrow(name, df):
+    """
+    Conversion d'un DataFrame transformé en table Arrow conforme au schéma
+    (types Arrow et contraintes de backend/schemas.py)
+    Raises:
+        ValueError: Colonnes différentes du schéma, valeurs non conformes ou hors contraintes
+    """
+    schema = table_schema(name)
+    if set(df.columns) != set(schema.names):
+        raise ValueError(f"Colonnes de {name} différentes du schéma : {list(df.columns)} / {schema.names}")
+    # Ordre des colonnes du DataFrame conservé (identique au CSV)
+    schema = pa.schema([schema.field(column) for column in df.columns])
+    try:
+        table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+        raise ValueError(f"Données de {name} non conformes au schéma : {str(e)}")
+    result = validate_table(name, table)
+    if not result.ok:
+        raise ValueError(f"Données de {name} hors contraintes : {result.summary()}")
+    return table
+
+
+def write_parquet(name, df, dataset_dir=DATASET_DIR):
+    """
+    Écriture atomique du fichier Parquet typé d'une table
+    Args:
+        name (str): Nom de la table (clé de TABLE_MAPPINGS)
+        df (DataFrame): Données transformées
+    Returns:
+        Path: Fichier écrit
+    """
+    output_file = parquet_path(name, dataset_dir)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    table = to_arrow(name, df)
+    tmp = output_file.with_suffix('.parquet.tmp')
+    pq.write_table(table, tmp, compression='zstd')
+    if pq.read_metadata(tmp).num_rows != len(df):
+        tmp.unlink()
+        raise ValueError(f"Fichier Parquet incomplet pour {name}")
+    os.replace(tmp, output_file)
+    return output_file
+
+
+def read_arrow(name, columns=None, dataset_dir=DATASET_DIR):
+    """
+    Lecture d'une table de DatasetClean en Arrow
+    Args:
+        name (str): Nom de la table (clé de TABLE_MAPPINGS)
+        columns (list): Colonnes à lire (toutes par défaut)
+    Returns:
+        pa.Table: Données typées selon le schéma déclaré
+    """
+    path = parquet_path(name, dataset_dir)
+    if path.exists():
+        return pq.read_table(path, columns=columns, memory_map=True)
+
+    # Repli : CSV existant, lu directement avec les types du schéma
+    from pyarrow import csv as pa_csv
+
+    schema = table_schema(name)
+    csv_file = Path(dataset_dir) / TABLE_MAPPINGS[name]["file"]
+    table = pa_csv.read_csv(
+        csv_file,
+        convert_options=pa_csv.ConvertOptions(
+            column_types={field.name: field.type for field in schema},
+            include_columns=columns,
+        ),
+    )
+    return table
+
+
+def read_table(name, columns=None, dataset_dir=DATASET_DIR):
+    """
+    Lecture d'une table de DatasetClean en pandas
+    Args:
+        name (str): Nom de la table (clé de TABLE_MAPPINGS)
+        columns (list): Colonnes à lire (toutes par défaut)
+    Returns:
+        DataFrame: Données typées (int32, float64, chaînes), sans inférence
+    """
+    # split_blocks : une colonne par bloc, les colonnes numériques sans NULL
+    # réutilisent directement la mémoire Arrow
+    return read_arrow(name, columns, dataset_dir).to_pandas(split_blocks=True)
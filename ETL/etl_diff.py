@@ -0,0 +1,315 @@
+# =============================================================================
+# Script : etl_diff.py
+# Description :
+# Comparaison ligne à ligne d'une table transformée avec la version
+# précédente de DatasetClean (chargements incrémentaux).
+#
+# - Chaque ligne est identifiée par sa clé naturelle (id_pays, annee, type...)
+# - Clés et valeurs sont comparées par empreintes vectorisées
+#   (pd.util.hash_pandas_object), sans fusion sur chaînes
+# - Une ligne dont la clé existait déjà garde son identifiant : une source
+#   modifiée ne décale plus les identifiants des lignes suivantes
+# - Seules les insertions, modifications et suppressions sont appliquées en
+#   base (etl_loader.py) ; les clés modifiées sont enregistrées dans
+#   DatasetClean/etl_changes.json pour invalider les caches concernés
+# - Chaque version a une empreinte (identifiant, clé et valeurs de chaque
+#   ligne, indépendante de l'ordre) : etl_loader.py ne l'applique en différence
+#   qu'à une base qui a enregistré l'empreinte de la version précédente
+# =============================================================================
+
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from etl_dataset import DATASET_DIR, parquet_path, read_table
+from etl_loader import TABLE_MAPPINGS
+
+CHANGES_FILE = DATASET_DIR / 'etl_changes.json'
+
+# Clé naturelle de chaque table (colonnes DatasetClean)
+NATURAL_KEYS = {
+    "unite": ["id_unite"],
+    "type_statistique": ["id_type_statistique"],
+    "type_traitement": ["id_type_traitement"],
+    "pays": ["id_pays"],
+    "population_hiv": ["id_pays", "annee"],
+    "mortalite": ["id_pays", "annee"],
+    "statistique": ["id_pays", "annee", "id_type_statistique"],
+    "traitement": ["id_pays", "id_type_traitement"],
+    "transmission_mere_enfant": ["id_pays"],
+}
+
+_changes_lock = threading.Lock()
+
+
+def id_column(name):
+    """
+    Colonne DatasetClean correspondant à la clé primaire SQL (id, id_traitement, id_pays...)
+    """
+    mapping = TABLE_MAPPINGS[name]
+    return mapping["columns"][mapping["key"][0]]
+
+
+def row_hashes(df, columns):
+    """
+    Empreinte 64 bits de chaque ligne sur les colonnes données
+    Les types sont harmonisés (nombres en float64, texte en objets Python) :
+    une même valeur lue du Parquet (int32) ou produite par l'ETL (int64) a la même empreinte.
+    Args:
+        df (DataFrame): Données
+        columns (list): Colonnes à prendre en compte
+    Returns:
+        ndarray: Empreintes uint64, une par ligne
+    """
+    if not columns:
+        return np.zeros(len(df), dtype=np.uint64)
+    normalized = {}
+    for column in columns:
+        values = df[column]
+        if pd.api.types.is_numeric_dtype(values):
+            normalized[column] = values.to_numpy(dtype=np.float64, na_value=np.nan)
+        else:
+            normalized[column] = values.astype(object).where(values.notna(), None).to_numpy(dtype=object)
+    return pd.util.hash_pandas_object(pd.DataFrame(normalized), index=False).to_numpy()
+
+
+def fingerprint_part(ids, key_hashes, value_hashes):
+    """
+    Contribution d'un lot de lignes à l'empreinte d'une version (somme modulo 2**64,
+    indépendante de l'ordre des lignes et du découpage en lots)
+    Returns:
+        int: Somme des empreintes (identifiant, clé, valeurs) des lignes
+    """
+    if not len(ids):
+        return 0
+    rows = pd.DataFrame({'id': np.asarray(ids, dtype=np.int64), 'key': key_hashes, 'value': value_hashes})
+    return int(pd.util.hash_pandas_object(rows, index=False).to_numpy().sum(dtype=np.uint64))
+
+
+def format_fingerprint(rows, total):
+    """
+    Empreinte d'une version : nombre de lignes et somme des empreintes de lignes
+    """
+    return f"{rows}:{total % (1 << 64):016x}"
+
+
+def table_fingerprint(name, df):
+    """
+    Empreinte d'une table DatasetClean complète (colonne identifiant comprise)
+    """
+    return TableSnapshot(name, [df]).fingerprint
+
+
+class TableChanges:
+    """
+    Résultat de la comparaison d'une table avec sa version précédente
+    """
+
+    def __init__(self, name, previous_rows):
+        self.name = name
+        self.previous_rows = previous_rows
+        self.inserted = []
+        self.updated = []
+        self.deleted = None
+        self.deleted_ids = np.empty(0, dtype=np.int64)
+        self.unchanged = 0
+        # Lignes insérées ou modifiées (traitement en une fois uniquement)
+        self.changed = None
+        # Empreintes de la version précédente et de la nouvelle (connue après finish())
+        self.previous_fingerprint = None
+        self.fingerprint = None
+
+    def counts(self):
+        return {
+            "inserted": sum(len(keys) for keys in self.inserted),
+            "updated": sum(len(keys) for keys in self.updated),
+            "deleted": len(self.deleted_ids),
+            "unchanged": self.unchanged,
+        }
+
+    def as_dict(self):
+        """
+        Clés modifiées, pour l'invalidation ciblée des caches
+        """
+        def records(frames):
+            frames = [frame for frame in frames if len(frame)]
+            if not frames:
+                return []
+            return pd.concat(frames, ignore_index=True).astype(object).to_dict(orient='records')
+
+        return {
+            "key": NATURAL_KEYS[self.name],
+            **self.counts(),
+            "inserted_keys": records(self.inserted),
+            "updated_keys": records(self.updated),
+            "deleted_keys": records([self.deleted] if self.deleted is not None else []),
+        }
+
+
+class TableSnapshot:
+    """
+    Empreintes de la version précédente d'une table de DatasetClean
+    (clé naturelle -> identifiant et empreinte des valeurs)
+    La table précédente est lue par lots : seules les empreintes restent en mémoire.
+    """
+
+    def __init__(self, name, batches=None):
+        """
+        Args:
+            name (str): Nom de la table (clé de TABLE_MAPPINGS)
+            batches (iterable): Lots de la version précédente (DataFrames), None si elle n'existe pas
+        """
+        self.name = name
+        self.keys = NATURAL_KEYS[name]
+        self.id_column = id_column(name)
+        # Tables de référence : l'identifiant est la clé naturelle, fourni par les données
+        self.assign_ids = self.id_column not in self.keys
+
+        key_hashes, value_hashes, ids, key_frames = [], [], [], []
+        for frame in batches or []:
+            values = [c for c in frame.columns if c not in self.keys and c != self.id_column]
+            key_hashes.append(row_hashes(frame, self.keys))
+            value_hashes.append(row_hashes(frame, values))
+            ids.append(frame[self.id_column].to_numpy(dtype=np.int64))
+            key_frames.append(frame[self.keys])
+
+        self.key_hashes = np.concatenate(key_hashes) if key_hashes else np.empty(0, dtype=np.uint64)
+        self.value_hashes = np.concatenate(value_hashes) if value_hashes else np.empty(0, dtype=np.uint64)
+        self.ids = np.concatenate(ids) if ids else np.empty(0, dtype=np.int64)
+        self.key_frame = pd.concat(key_frames, ignore_index=True) if key_frames else pd.DataFrame(columns=self.keys)
+        self.index = pd.Index(self.key_hashes)
+        if not self.index.is_unique:
+            raise ValueError(f"Clé naturelle {self.keys} non unique dans la version précédente de {name}")
+        self.seen = np.zeros(len(self.ids), dtype=bool)
+        self.next_id = int(self.ids.max()) + 1 if len(self.ids) else 1
+        self.fingerprint = format_fingerprint(len(self.ids),
+                                              fingerprint_part(self.ids, self.key_hashes, self.value_hashes))
+        self.changes = TableChanges(name, len(self.ids) if batches is not None else None)
+        if batches is not None:
+            self.changes.previous_fingerprint = self.fingerprint
+        # Empreinte de la nouvelle version, calculée lot par lot
+        self._new_rows = 0
+        self._new_total = 0
+
+    @classmethod
+    def load(cls, name, dataset_dir=DATASET_DIR, batch_size=100_000):
+        """
+        Empreintes de la version actuelle de DatasetClean (Parquet, ou CSV à défaut)
+        Returns:
+            TableSnapshot: Sans version précédente si la table n'a jamais été produite
+        """
+        path = parquet_path(name, dataset_dir)
+        if path.exists():
+            parquet_file = pq.ParquetFile(path)
+            return cls(name, (batch.to_pandas() for batch in parquet_file.iter_batches(batch_size=batch_size)))
+        if (Path(dataset_dir) / TABLE_MAPPINGS[name]["file"]).exists():
+            return cls(name, [read_table(name, dataset_dir=dataset_dir)])
+        return cls(name)
+
+    def match(self, rows):
+        """
+        Comparaison d'un lot de lignes transformées avec la version précédente
+        Args:
+            rows (DataFrame): Lignes transformées (colonne identifiant facultative)
+        Returns:
+            tuple: (identifiants à utiliser, masque des lignes insérées ou modifiées)
+        """
+        values = [c for c in rows.columns if c not in self.keys and c != self.id_column]
+        keys = row_hashes(rows, self.keys)
+        position = self.index.get_indexer(keys)
+        matched = position >= 0
+        # Une clé déjà rencontrée (doublon dans les nouvelles données) est traitée comme nouvelle
+        duplicated = pd.Series(np.where(matched, position, -1)).duplicated().to_numpy()
+        matched &= ~duplicated
+        already_seen = np.zeros(len(rows), dtype=bool)
+        already_seen[matched] = self.seen[position[matched]]
+        matched &= ~already_seen
+        self.seen[position[matched]] = True
+
+        value_hashes = row_hashes(rows, values)
+        updated = np.zeros(len(rows), dtype=bool)
+        updated[matched] = self.value_hashes[position[matched]] != value_hashes[matched]
+        inserted = ~matched
+
+        if self.assign_ids:
+            ids = np.empty(len(rows), dtype=np.int64)
+            ids[matched] = self.ids[position[matched]]
+            ids[inserted] = np.arange(self.next_id, self.next_id + inserted.sum(), dtype=np.int64)
+            self.next_id += int(inserted.sum())
+        else:
+            ids = rows[self.id_column].to_numpy(dtype=np.int64)
+
+        self.changes.inserted.append(rows.loc[inserted, self.keys])
+        self.changes.updated.append(rows.loc[updated, self.keys])
+        self.changes.unchanged += int((matched & ~updated).sum())
+        self._new_rows += len(rows)
+        self._new_total += fingerprint_part(ids, keys, value_hashes)
+        return ids, inserted | updated
+
+    def finish(self):
+        """
+        Fin de la comparaison : lignes précédentes absentes des nouvelles données
+        Returns:
+            TableChanges: Insertions, modifications et suppressions
+        """
+        missing = ~self.seen
+        self.changes.deleted_ids = self.ids[missing]
+        self.changes.deleted = self.key_frame.loc[missing]
+        self.changes.fingerprint = format_fingerprint(self._new_rows, self._new_total)
+        return self.changes
+
+
+def diff_with_snapshot(name, df, dataset_dir=DATASET_DIR):
+    """
+    Comparaison d'une table transformée avec DatasetClean avant son écriture
+    Args:
+        name (str): Nom de la table (clé de TABLE_MAPPINGS)
+        df (DataFrame): Données transformées
+    Returns:
+        tuple: (données avec les identifiants de la version précédente, TableChanges)
+    """
+    snapshot = TableSnapshot.load(name, dataset_dir)
+    ids, changed = snapshot.match(df)
+    if snapshot.assign_ids:
+        df = df.assign(**{snapshot.id_column: ids})
+    changes = snapshot.finish()
+    changes.changed = changed
+    return df, changes
+
+
+def write_changes_report(changes, report_file=CHANGES_FILE):
+    """
+    Enregistrement des clés modifiées d'une table (DatasetClean/etl_changes.json)
+    Returns:
+        dict: Nombre de lignes insérées, modifiées, supprimées et inchangées
+    """
+    counts = changes.counts()
+    with _changes_lock:
+        report_file = Path(report_file)
+        try:
+            with open(report_file, encoding='utf-8') as f:
+                report = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            report = {}
+        report[changes.name] = {
+            "generated_at": datetime.now().isoformat(timespec='seconds'),
+            **changes.as_dict(),
+        }
+        report_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = report_file.with_name(report_file.name + '.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, sort_keys=True, default=int)
+        os.replace(tmp, report_file)
+
+    logging.info(
+        f"🔍 {changes.name} : {counts['inserted']} insertions, {counts['updated']} modifications, "
+        f"{counts['deleted']} suppressions, {counts['unchanged']} lignes inchangées"
+    )
+    return counts
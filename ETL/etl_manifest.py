@@ -0,0 +1,132 @@
+# =============================================================================
+# Script : etl_manifest.py
+# Description :
+# Manifeste de construction de l'ETL incrémental.
+#
+# Pour chaque tâche, le manifeste enregistre l'empreinte (SHA-256) :
+# - des fichiers d'entrée (SourceData et tables produites en amont)
+# - du script ETL et des modules partagés qu'il utilise
+# - des fichiers produits
+# - des bases PostgreSQL cibles (ETL_DATABASE_URL)
+# Une tâche dont toutes les empreintes sont inchangées peut être ignorée.
+# Les tables en aval dont les entrées changent sont recalculées.
+# =============================================================================
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+MANIFEST_FILE = Path('../DatasetClean/etl_manifest.json')
+
+# Modules utilisés par tous les scripts : les modifier invalide toutes les tâches
+SHARED_MODULES = [
+    'etl_sources.py', 'etl_transform.py', 'etl_loader.py', 'etl_dataset.py', 'etl_stream.py',
+    'etl_countries.py', 'etl_metrics.py', 'etl_diff.py',
+    '../backend/models.py',  # schémas Parquet
+    '../backend/schemas.py', '../backend/validation.py',  # contraintes des données
+]
+
+
+def file_hash(file_path, chunk_size=1 << 20):
+    """
+    Empreinte SHA-256 du contenu d'un fichier, lu par blocs
+    Returns:
+        str: Empreinte hexadécimale, ou None si le fichier n'existe pas
+    """
+    path = Path(file_path)
+    if not path.exists():
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(files):
+    """
+    Empreintes d'une liste de fichiers
+    Returns:
+        dict: Chemin -> empreinte
+    """
+    return {str(f): file_hash(f) for f in files}
+
+
+def load_manifest(manifest_file=MANIFEST_FILE):
+    """
+    Lecture du manifeste (vide s'il n'existe pas ou est illisible)
+    """
+    try:
+        with open(manifest_file, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, manifest_file=MANIFEST_FILE):
+    """
+    Écriture atomique du manifeste
+    """
+    manifest_file = Path(manifest_file)
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp = manifest_file.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp, manifest_file)
+
+
+def hash_targets(targets):
+    """
+    Empreintes des bases cibles (les URLs, mots de passe compris, ne sont pas écrites dans le manifeste)
+    Returns:
+        list: Empreintes triées
+    """
+    return sorted(hashlib.sha256(target.encode('utf-8')).hexdigest() for target in targets)
+
+
+def task_state(script, inputs, targets=()):
+    """
+    État courant d'une tâche avant exécution (script, modules partagés, entrées et bases cibles)
+    Args:
+        script (str): Fichier du script ETL
+        inputs (list): Fichiers lus par la tâche
+        targets (list): URLs des bases PostgreSQL chargées par la tâche
+    Returns:
+        dict: {'script': ..., 'inputs': {...}, 'targets': [...]}
+    """
+    return {
+        'script': hash_files([script] + SHARED_MODULES),
+        'inputs': hash_files(inputs),
+        'targets': hash_targets(targets),
+    }
+
+
+def is_up_to_date(entry, state, outputs):
+    """
+    Vérifie qu'une tâche peut être ignorée
+    Args:
+        entry (dict): Entrée du manifeste pour la tâche (None si jamais exécutée)
+        state (dict): État courant calculé par task_state
+        outputs (list): Fichiers produits par la tâche
+    Returns:
+        bool: True si entrées, script, bases cibles et sorties sont identiques à la dernière exécution
+    """
+    if not entry:
+        return False
+    if entry.get('script') != state['script'] or entry.get('inputs') != state['inputs']:
+        return False
+    # Base ajoutée ou remplacée : elle n'a jamais reçu les sorties courantes
+    if entry.get('targets', []) != state['targets']:
+        return False
+    if None in state['inputs'].values():
+        return False
+    # Une sortie supprimée ou modifiée à la main force la reconstruction
+    return entry.get('outputs') == hash_files(outputs) and None not in entry['outputs'].values()
+
+
+def make_entry(state, outputs):
+    """
+    Entrée du manifeste après une exécution réussie
+    """
+    return {**state, 'outputs': hash_files(outputs)}
@@ -0,0 +1,309 @@
+# =============================================================================
+# Script : etl_metrics.py
+# Description :
+# Mesures des étapes ETL et rapport d'exécution.
+#
+# - stage() encadre une étape (extract, transform, load ou stream) d'une table :
+#   durée réelle, temps CPU du thread, lignes en entrée / sortie, lignes
+#   rejetées et pic de mémoire : pic propre à l'étape avec track_stage_peaks(),
+#   sinon RSS maximal du processus (peak_scope "process", non comparé entre
+#   deux rapports : il ne fait que croître et inclut les autres tables en cours)
+# - run_etl.py écrit un rapport JSON par exécution dans ETL/reports/
+#   et le compare automatiquement au rapport précédent
+# - Comparaison manuelle de deux rapports :
+#     python etl_metrics.py                       # deux derniers rapports
+#     python etl_metrics.py ancien.json nouveau.json --seuil 0.2
+#   Code de sortie 1 si une régression est détectée.
+# =============================================================================
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+REPORT_DIR = Path(os.getenv("ETL_REPORT_DIR", Path(__file__).resolve().parent / 'reports'))
+
+# Hausse relative au-delà de laquelle une mesure est signalée comme régression
+REGRESSION_THRESHOLD = 0.2
+# Écarts de durée trop faibles pour être significatifs (secondes)
+MIN_TIME_DELTA = 0.1
+
+_stages = []
+_stages_lock = threading.Lock()
+_local = threading.local()
+# Pic mémoire remis à zéro au début de chaque étape (processus mono-tâche, voir etl_benchmark.py)
+_stage_peaks = False
+
+
+def track_stage_peaks(enabled=True):
+    """
+    Pic mémoire propre à chaque étape plutôt que pic du processus
+    Réservé aux processus qui exécutent une seule table à la fois (le compteur est
+    celui du processus) ; sans effet hors Linux (/proc/self/clear_refs).
+    """
+    global _stage_peaks
+    _stage_peaks = enabled
+
+
+def _reset_peak_rss():
+    """
+    Remise à zéro du pic de mémoire résidente (VmHWM) du processus
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _hwm_mb():
+    """
+    Pic de mémoire résidente depuis la dernière remise à zéro (None si non disponible)
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    """
+    Pic de mémoire résidente du processus en Mo (None si non mesurable)
+    """
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Octets sous macOS, kilo-octets sous Linux
+        return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return round(getattr(info, 'peak_wset', info.rss) / (1 << 20), 1)
+    except ImportError:
+        return None
+
+
+class StageMetrics:
+    """
+    Mesures d'une étape, complétées par le code de l'étape (rows_in, rows_out, rejected)
+    """
+
+    def __init__(self, table, stage):
+        self.table = table
+        self.stage = stage
+        self.rows_in = None
+        self.rows_out = None
+        self.rejected = None
+        self.status = "ok"
+        self.wall_s = None
+        self.cpu_s = None
+        self.peak_rss_mb = None
+        # "stage" : pic propre à l'étape, "process" : pic du processus depuis son démarrage
+        self.peak_scope = None
+
+    def add(self, rows_in=0, rows_out=0, rejected=0):
+        """
+        Ajout de compteurs (traitement par morceaux)
+        """
+        self.rows_in = (self.rows_in or 0) + rows_in
+        self.rows_out = (self.rows_out or 0) + rows_out
+        self.rejected = (self.rejected or 0) + rejected
+
+    def as_dict(self):
+        rejected = self.rejected
+        if rejected is None and self.rows_in is not None and self.rows_out is not None:
+            # Lignes sources non retenues : vides, invalides ou pays non reconnu
+            rejected = max(self.rows_in - self.rows_out, 0)
+        return {
+            "table": self.table,
+            "stage": self.stage,
+            "status": self.status,
+            "wall_s": self.wall_s,
+            "cpu_s": self.cpu_s,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "rejected": rejected,
+            "rows_per_s": round(self.rows_out / self.wall_s) if self.rows_out and self.wall_s else None,
+            "peak_rss_mb": self.peak_rss_mb,
+            "peak_scope": self.peak_scope,
+        }
+
+
+@contextmanager
+def stage(table, name):
+    """
+    Mesure d'une étape ETL
+    Args:
+        table (str): Table traitée
+        name (str): Étape (extract, transform, load, stream)
+    Yields:
+        StageMetrics: Mesures à compléter (lignes en entrée, en sortie, rejetées)
+    """
+    metrics = StageMetrics(table, name)
+    previous = getattr(_local, 'current', None)
+    _local.current = metrics
+    stage_peak = _stage_peaks and _reset_peak_rss()
+    start_wall, start_cpu = time.perf_counter(), time.thread_time()
+    try:
+        yield metrics
+    except BaseException:
+        metrics.status = "erreur"
+        raise
+    finally:
+        metrics.wall_s = round(time.perf_counter() - start_wall, 4)
+        metrics.cpu_s = round(time.thread_time() - start_cpu, 4)
+        peak = _hwm_mb() if stage_peak else None
+        metrics.peak_rss_mb = peak if peak is not None else peak_rss_mb()
+        metrics.peak_scope = "stage" if peak is not None else "process"
+        _local.current = previous
+        record = metrics.as_dict()
+        with _stages_lock:
+            _stages.append(record)
+        rows = f"{record['rows_in']} → " if record['rows_in'] is not None else ""
+        rows += f"{record['rows_out']} lignes" if record['rows_out'] is not None else ""
+        if record['rejected']:
+            rows += f", {record['rejected']} rejetées"
+        logging.info(
+            f"⏱️ {table}/{name} : {record['wall_s']:.3f}s (CPU {record['cpu_s']:.3f}s)"
+            f"{', ' + rows if rows else ''}, RSS max {record['peak_rss_mb']} Mo"
+            f"{' (processus)' if record['peak_scope'] == 'process' else ''}"
+        )
+
+
+def current_stage():
+    """
+    Étape en cours dans le thread courant (None hors d'une étape mesurée)
+    """
+    return getattr(_local, 'current', None)
+
+
+def collected_stages(clear=False):
+    """
+    Mesures de toutes les étapes terminées dans le processus
+    """
+    with _stages_lock:
+        stages = list(_stages)
+        if clear:
+            _stages.clear()
+    return stages
+
+
+def write_report(report, report_dir=REPORT_DIR):
+    """
+    Écriture du rapport JSON d'une exécution
+    Returns:
+        Path: Fichier écrit (etl_run_AAAAMMJJ_HHMMSS.json)
+    """
+    report_dir = Path(report_dir)
+    report_dir.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.fromisoformat(report["started_at"]).strftime('%Y%m%d_%H%M%S')
+    report_file = report_dir / f"etl_run_{stamp}.json"
+    tmp = report_file.with_name(report_file.name + '.tmp')
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    os.replace(tmp, report_file)
+    return report_file
+
+
+def list_reports(report_dir=REPORT_DIR):
+    """
+    Rapports existants, du plus ancien au plus récent
+    """
+    return sorted(Path(report_dir).glob('etl_run_*.json'))
+
+
+def load_report(report_file):
+    with open(report_file, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def compare_reports(previous, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Comparaison de deux rapports d'exécution, étape par étape
+    Args:
+        previous (dict): Rapport de référence
+        current (dict): Nouveau rapport
+        threshold (float): Hausse relative tolérée (0.2 = +20 %)
+    Returns:
+        list: Écarts détectés {table, stage, metric, before, after, kind}
+              kind = "régression" (durée, CPU, mémoire propre à l'étape, rejets en hausse)
+              ou "changement" (lignes produites)
+    """
+    before = {(s["table"], s["stage"]): s for s in previous.get("stages", [])}
+    findings = []
+    for after in current.get("stages", []):
+        key = (after["table"], after["stage"])
+        ref = before.get(key)
+        if ref is None or ref["status"] != "ok" or after["status"] != "ok":
+            continue
+
+        for metric, min_delta in (("wall_s", MIN_TIME_DELTA), ("cpu_s", MIN_TIME_DELTA), ("peak_rss_mb", 1.0)):
+            old, new = ref.get(metric), after.get(metric)
+            # Pic du processus : croissant au fil des étapes et partagé entre threads, pas une mesure de l'étape
+            if metric == "peak_rss_mb" and "process" in (ref.get("peak_scope"), after.get("peak_scope")):
+                continue
+            if old is None or new is None:
+                continue
+            if new - old > min_delta and new > old * (1 + threshold):
+                findings.append({"table": key[0], "stage": key[1], "metric": metric,
+                                 "before": old, "after": new, "kind": "régression"})
+
+        if (after.get("rejected") or 0) > (ref.get("rejected") or 0):
+            findings.append({"table": key[0], "stage": key[1], "metric": "rejected",
+                             "before": ref.get("rejected"), "after": after.get("rejected"), "kind": "régression"})
+        if after.get("rows_out") != ref.get("rows_out"):
+            findings.append({"table": key[0], "stage": key[1], "metric": "rows_out",
+                             "before": ref.get("rows_out"), "after": after.get("rows_out"), "kind": "changement"})
+    return findings
+
+
+def log_findings(findings):
+    """
+    Affichage des écarts entre deux exécutions
+    Returns:
+        bool: True si au moins une régression
+    """
+    for f in findings:
+        icon = "🐢" if f["kind"] == "régression" else "ℹ️"
+        logging.warning(f"{icon} {f['kind']} {f['table']}/{f['stage']} {f['metric']} : {f['before']} → {f['after']}")
+    return any(f["kind"] == "régression" for f in findings)
+
+
+def main():
+    """
+    Comparaison de deux rapports d'exécution (les deux derniers par défaut)
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Comparaison de rapports d'exécution ETL")
+    parser.add_argument("reports", nargs="*", help="Rapport de référence puis nouveau rapport")
+    parser.add_argument("--seuil", type=float, default=REGRESSION_THRESHOLD, help="Hausse relative tolérée")
+    args = parser.parse_args()
+
+    reports = args.reports or list_reports()[-2:]
+    if len(reports) != 2:
+        logging.error("❌ Deux rapports sont nécessaires pour la comparaison")
+        sys.exit(1)
+
+    findings = compare_reports(load_report(reports[0]), load_report(reports[1]), args.seuil)
+    if log_findings(findings):
+        sys.exit(1)
+    logging.info(f"✅ Aucune régression entre {Path(reports[0]).name} et {Path(reports[1]).name}")
+
+
+if __name__ == "__main__":
+    main()
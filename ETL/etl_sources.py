@@ -0,0 +1,246 @@
+# =============================================================================
+# Script : etl_sources.py
+# Description :
+# Module partagé de lecture des fichiers CSV utilisés par les scripts ETL.
+#
+# - Chaque fichier n'est analysé qu'une seule fois par processus : les lectures
+#   suivantes renvoient une copie du DataFrame déjà chargé.
+# - Le cache est indexé par chemin, date de modification et taille : un fichier
+#   réécrit (ex. pays_clean.csv) est automatiquement relu.
+# - Utilisable depuis plusieurs threads (run_etl.py exécute les tables en parallèle).
+#
+# Lecture typée des fichiers SourceData (SOURCE_SCHEMAS) :
+# - Seules les colonnes utilisées par l'ETL sont lues (noms sans espaces)
+# - Espaces de remplissage supprimés à la lecture (moteur pyarrow), cellules
+#   vides ou non numériques converties en NULL, types déclarés par colonne
+# - Copie normalisée et compacte conservée en Parquet dans ETL/.source_cache :
+#   les exécutions suivantes ne réanalysent pas le CSV tant qu'il n'a pas changé
+# - Colonnes _median/_min/_max vides complétées depuis la chaîne "médiane[min–max]"
+#   de la colonne d'origine (SOURCE_RANGES, voir etl_transform.fill_from_ranges)
+# - normalize_table() s'applique aussi à chaque morceau du mode flux (etl_stream.py)
+# =============================================================================
+
+import hashlib
+import logging
+import os
+import threading
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+from etl_transform import fill_from_ranges
+
+CACHE_DIR = Path(os.getenv("ETL_SOURCE_CACHE", Path(__file__).resolve().parent / '.source_cache'))
+
+# Version du format de la copie normalisée (à incrémenter si la normalisation change)
+READER_VERSION = 2
+
+# Nombre décimal simple, après suppression des espaces ("na", "Nodata"... -> NULL)
+NUMBER_PATTERN = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+
+_COUNT_COLUMNS = {
+    'Country': 'string',
+    'Year': 'int32',
+    'Count_median': 'float64',
+    'Count_min': 'float64',
+    'Count_max': 'float64',
+    'WHO Region': 'string',
+}
+
+# Fichier SourceData -> colonnes utilisées par les scripts ETL et leur type
+SOURCE_SCHEMAS = {
+    'art_coverage_by_country_clean.csv': {
+        'Country': 'string',
+        'Estimated ART coverage among people living with HIV (%)_median': 'float64',
+        'WHO Region': 'string',
+    },
+    'art_pediatric_coverage_by_country_clean.csv': {
+        'Country': 'string',
+        'Estimated ART coverage among children (%)_median': 'float64',
+        'WHO Region': 'string',
+    },
+    'no_of_cases_adults_15_to_49_by_country_clean.csv': _COUNT_COLUMNS,
+    'no_of_deaths_by_country_clean.csv': _COUNT_COLUMNS,
+    'no_of_people_living_with_hiv_by_country_clean.csv': _COUNT_COLUMNS,
+    'prevention_of_mother_to_child_transmission_by_country_clean.csv': {
+        'Country': 'string',
+        'Needing antiretrovirals_median': 'float64',
+        'Needing antiretrovirals_min': 'float64',
+        'Needing antiretrovirals_max': 'float64',
+        'Percentage Recieved_median': 'float64',
+        'Percentage Recieved_min': 'float64',
+        'Percentage Recieved_max': 'float64',
+        'WHO Region': 'string',
+    },
+}
+
+# Fichier SourceData -> colonnes "médiane[min–max]" servant à compléter les colonnes détaillées
+SOURCE_RANGES = {
+    'art_coverage_by_country_clean.csv': ['Estimated ART coverage among people living with HIV (%)'],
+    'art_pediatric_coverage_by_country_clean.csv': ['Estimated ART coverage among children (%)'],
+    'no_of_cases_adults_15_to_49_by_country_clean.csv': ['Count'],
+    'no_of_deaths_by_country_clean.csv': ['Count'],
+    'no_of_people_living_with_hiv_by_country_clean.csv': ['Count'],
+    'prevention_of_mother_to_child_transmission_by_country_clean.csv': [
+        'Needing antiretrovirals', 'Percentage Recieved'
+    ],
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+_file_locks = {}
+
+
+def _file_lock(key):
+    with _cache_lock:
+        return _file_locks.setdefault(key, threading.Lock())
+
+
+def normalize_table(table, schema, ranges=()):
+    """
+    Normalisation d'un fichier source ou d'un morceau : espaces supprimés, cellules vides
+    ou non numériques converties en NULL, types appliqués, colonnes détaillées complétées
+    Args:
+        table (pyarrow.Table): Colonnes lues comme texte, noms sans espaces
+        schema (dict): Colonne -> type ('string', 'int32', 'float64')
+        ranges (list): Colonnes "médiane[min–max]" (SOURCE_RANGES), retirées du résultat
+    Returns:
+        tuple: (DataFrame normalisé, nombre de valeurs complétées depuis les plages)
+    """
+    columns = list(schema) + list(ranges)
+    arrays = []
+    for column in columns:
+        type_name = schema.get(column, 'string')
+        values = pc.utf8_trim_whitespace(table.column(column).cast(pa.string()))
+        values = pc.if_else(pc.equal(values, ''), pa.scalar(None, pa.string()), values)
+        if type_name != 'string':
+            numeric = pc.match_substring_regex(values, NUMBER_PATTERN)
+            values = pc.if_else(numeric, values, pa.scalar(None, pa.string()))
+            values = pc.cast(values, pa.float64())
+            if type_name != 'float64':
+                values = pc.cast(values, type_name)
+        arrays.append(values)
+    df = pa.table(arrays, names=columns).to_pandas()
+
+    # Valeurs détaillées absentes mais présentes dans la chaîne "médiane[min–max]"
+    recovered = fill_from_ranges(df, ranges)
+    return df.drop(columns=list(ranges)), recovered
+
+
+def source_layout(path, schema):
+    """
+    Colonnes à lire dans un fichier source
+    Returns:
+        tuple: (nom sans espaces -> nom brut, colonnes "médiane[min–max]" présentes)
+    """
+    path = Path(path)
+    raw = {column.strip(): column for column in pd.read_csv(path, nrows=0).columns}
+    missing = [column for column in schema if column not in raw]
+    if missing:
+        raise ValueError(f"Colonnes absentes de {path.name} : {missing}")
+    return raw, [column for column in SOURCE_RANGES.get(path.name, []) if column in raw]
+
+
+def _normalize_csv(path, schema):
+    """
+    Analyse d'un fichier CSV source : colonnes utiles uniquement, espaces supprimés, types appliqués
+    Args:
+        path (Path): Fichier source
+        schema (dict): Colonne (nom sans espaces) -> type ('string', 'int32', 'float64')
+    Returns:
+        DataFrame: Données normalisées
+    """
+    from pyarrow import csv as pa_csv
+
+    # En-tête seul : correspondance nom sans espaces -> nom brut
+    raw, ranges = source_layout(path, schema)
+
+    # Tout est lu comme texte : la conversion a lieu après suppression des espaces
+    columns = list(schema) + ranges
+    table = pa_csv.read_csv(
+        path,
+        convert_options=pa_csv.ConvertOptions(
+            include_columns=[raw[column] for column in columns],
+            column_types={raw[column]: pa.string() for column in columns},
+        ),
+    )
+
+    df, recovered = normalize_table(table.rename_columns(columns), schema, ranges)
+    if recovered:
+        logging.info(f"🔧 {recovered} valeurs complétées depuis les plages de {path.name}")
+    return df
+
+
+def _cache_file(path, stat, schema):
+    """
+    Fichier de la copie normalisée (dépend du contenu, du schéma et de la version du lecteur)
+    """
+    digest = hashlib.sha1(
+        repr((stat.st_mtime_ns, stat.st_size, READER_VERSION, sorted(schema.items()))).encode()
+    ).hexdigest()[:16]
+    return CACHE_DIR / f"{path.stem}-{digest}.parquet"
+
+
+def _read_typed(path, stat, schema):
+    """
+    Lecture typée d'un fichier source, depuis la copie normalisée si elle est à jour
+    """
+    cache_file = _cache_file(path, stat, schema)
+    if cache_file.exists():
+        return pq.read_table(cache_file, memory_map=True).to_pandas()
+
+    df = _normalize_csv(path, schema)
+    try:
+        CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_name(cache_file.name + '.tmp')
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp)
+        os.replace(tmp, cache_file)
+        # Les copies des versions précédentes du fichier sont supprimées
+        for old in CACHE_DIR.glob(f"{path.stem}-*.parquet"):
+            if old != cache_file:
+                old.unlink(missing_ok=True)
+    except OSError:
+        # Cache non inscriptible : la lecture reste valide
+        pass
+    return df
+
+
+def read_source(file_path, columns=None, **read_csv_kwargs):
+    """
+    Lecture d'un fichier CSV avec mise en cache en mémoire
+    Les fichiers déclarés dans SOURCE_SCHEMAS sont lus typés et normalisés
+    (noms de colonnes et valeurs sans espaces), les autres avec pd.read_csv.
+    Args:
+        file_path (str | Path): Chemin du fichier à lire
+        columns (list): Colonnes à renvoyer (toutes par défaut)
+        **read_csv_kwargs: Options transmises à pd.read_csv (désactivent la lecture typée)
+    Returns:
+        DataFrame: Copie du DataFrame lu (les scripts peuvent la modifier librement)
+    """
+    path = Path(file_path).resolve()
+    stat = path.stat()
+    schema = None if read_csv_kwargs else SOURCE_SCHEMAS.get(path.name)
+    key = (str(path), stat.st_mtime_ns, stat.st_size, repr(sorted(read_csv_kwargs.items())), schema is not None)
+
+    # Un verrou par fichier : deux tables qui lisent la même source en parallèle
+    # attendent la même analyse au lieu de la dupliquer
+    with _file_lock(key[:3]):
+        df = _cache.get(key)
+        if df is None:
+            df = _read_typed(path, stat, schema) if schema else pd.read_csv(path, **read_csv_kwargs)
+            with _cache_lock:
+                _cache[key] = df
+
+    return (df[columns] if columns else df).copy()
+
+
+def clear_cache():
+    """
+    Vide le cache des fichiers déjà lus
+    """
+    with _cache_lock:
+        _cache.clear()
+        _file_locks.clear()
@@ -0,0 +1,193 @@
+# =============================================================================
+# Script : etl_stream.py
+# Description :
+# Traitement par morceaux des fichiers sources (mémoire bornée).
+#
+# - Les fichiers SourceData sont lus par morceaux de N lignes (pd.read_csv chunksize),
+#   normalisés comme en lecture complète (etl_sources.normalize_table)
+# - Chaque morceau passe par la même transformation vectorisée que le mode normal
+# - Les lignes produites sont ajoutées au fur et à mesure aux sorties :
+#   CSV (si ETL_CSV_OUTPUT != 0), Parquet (un groupe de lignes par morceau)
+#   et PostgreSQL (COPY dans la table de staging de chaque base de ETL_DATABASE_URL)
+# - Les identifiants continuent d'un morceau à l'autre (ou reprennent ceux de
+#   la version précédente, voir etl_diff.py) : le résultat est identique à
+#   celui du traitement en une fois
+# - Fichiers écrits sous un nom temporaire puis renommés : en cas d'erreur,
+#   les sorties précédentes restent intactes
+#
+# Activation : ETL_CHUNK_SIZE=<nombre de lignes> ou `python run_etl.py --chunk-size N`.
+# La mémoire utilisée dépend de la taille des morceaux, pas de celle des fichiers,
+# à l'exception des empreintes de la version précédente (TableSnapshot : clé
+# naturelle, identifiant et empreintes de chaque ligne), proportionnelles au
+# nombre de lignes de la table produite.
+# =============================================================================
+
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from etl_dataset import DATASET_DIR, parquet_path, to_arrow
+from etl_diff import TableSnapshot, write_changes_report
+from etl_loader import TABLE_MAPPINGS, StagedLoad, csv_output_enabled, database_urls
+from etl_metrics import current_stage
+from etl_sources import SOURCE_SCHEMAS, normalize_table, source_layout
+
+
+def chunk_size():
+    """
+    Taille des morceaux demandée (ETL_CHUNK_SIZE), None si le mode flux est désactivé
+    """
+    value = int(os.getenv("ETL_CHUNK_SIZE", "0") or 0)
+    return value if value > 0 else None
+
+
+def iter_chunks(file_path, chunksize):
+    """
+    Lecture d'un fichier CSV par morceaux, limitée aux colonnes déclarées dans SOURCE_SCHEMAS
+    Chaque morceau est normalisé comme en lecture complète (etl_sources.normalize_table) :
+    espaces supprimés, cellules vides ou non numériques à NULL, types appliqués,
+    valeurs détaillées complétées depuis les chaînes "médiane[min–max]".
+    Args:
+        file_path (str | Path): Fichier source
+        chunksize (int): Nombre de lignes par morceau
+    Returns:
+        iterator: DataFrames de chunksize lignes au plus
+    """
+    schema = SOURCE_SCHEMAS.get(Path(file_path).name)
+    if not schema:
+        # Fichier sans schéma : lecture brute, noms de colonnes nettoyés
+        for chunk in pd.read_csv(file_path, chunksize=chunksize):
+            chunk.columns = chunk.columns.str.strip()
+            yield chunk
+        return
+
+    raw, ranges = source_layout(file_path, schema)
+    columns = list(schema) + ranges
+    # Tout est lu comme texte : la conversion a lieu après suppression des espaces
+    for chunk in pd.read_csv(file_path, chunksize=chunksize, usecols=[raw[column] for column in columns],
+                             dtype=str, keep_default_na=False):
+        chunk = chunk.rename(columns={raw[column]: column for column in columns})
+        table = pa.Table.from_pandas(chunk[columns], preserve_index=False)
+        yield normalize_table(table, schema, ranges)[0]
+
+
+class TableWriter:
+    """
+    Écriture incrémentale d'une table de DatasetClean (CSV, Parquet, PostgreSQL)
+    Les identifiants sont attribués à la volée : identifiant précédent pour une
+    clé naturelle déjà connue, sinon à la suite. Seules les lignes insérées ou
+    modifiées sont copiées dans les bases qui contiennent la version précédente.
+    """
+
+    def __init__(self, name, id_column, dataset_dir=DATASET_DIR):
+        self.name = name
+        self.id_column = id_column
+        self.rows = 0
+        self.csv_file = Path(dataset_dir) / TABLE_MAPPINGS[name]["file"] if csv_output_enabled() else None
+        self.parquet_file = parquet_path(name, dataset_dir)
+        self._parquet_writer = None
+        # Version précédente lue avant d'être remplacée
+        self.snapshot = TableSnapshot.load(name, dataset_dir)
+        # Une transaction par base cible
+        self._db_loads = [StagedLoad(name, conninfo, self.snapshot.changes) for conninfo in database_urls()]
+
+    def _tmp(self, path):
+        return path.with_name(path.name + '.tmp')
+
+    def __enter__(self):
+        self.parquet_file.parent.mkdir(parents=True, exist_ok=True)
+        for i, load in enumerate(self._db_loads):
+            try:
+                load.__enter__()
+            except Exception as e:
+                # Connexions déjà ouvertes annulées
+                for opened in self._db_loads[:i]:
+                    opened.__exit__(type(e), e, None)
+                raise
+        return self
+
+    def write(self, rows):
+        """
+        Ajout d'un morceau de lignes transformées (sans identifiant)
+        Args:
+            rows (DataFrame): Lignes produites par build_rows
+        """
+        if rows.empty:
+            return
+        rows = rows.reset_index(drop=True)
+        ids, changed = self.snapshot.match(rows)
+        rows.insert(0, self.id_column, ids)
+
+        if self.csv_file is not None:
+            rows.to_csv(self._tmp(self.csv_file), mode='w' if self.rows == 0 else 'a',
+                        header=self.rows == 0, index=False)
+
+        table = to_arrow(self.name, rows)
+        if self._parquet_writer is None:
+            self._parquet_writer = pq.ParquetWriter(self._tmp(self.parquet_file), table.schema,
+                                                    compression='zstd')
+        self._parquet_writer.write_table(table)
+
+        for load in self._db_loads:
+            load.write(rows, changed)
+        self.rows += len(rows)
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+        error = None
+        if exc_type is None and self.rows and pq.read_metadata(self._tmp(self.parquet_file)).num_rows != self.rows:
+            error = ValueError(f"Fichier Parquet incomplet pour {self.name}")
+        failed = exc_type is not None or error is not None
+        changes = self.snapshot.finish() if not failed else None
+
+        for load in self._db_loads:
+            try:
+                # Fusion dans la table cible (ou annulation) avant de publier les fichiers
+                load.__exit__(ValueError if failed else None, error, None)
+            except Exception as e:
+                failed, error = True, e
+
+        for path in (self.csv_file, self.parquet_file):
+            if path is None:
+                continue
+            if failed or not self.rows:
+                self._tmp(path).unlink(missing_ok=True)
+            else:
+                os.replace(self._tmp(path), path)
+
+        if error is not None:
+            raise error
+        if changes is not None and self.rows:
+            write_changes_report(changes)
+        return False
+
+
+def stream_table(name, id_column, blocks, chunksize):
+    """
+    Traitement complet d'une table par morceaux
+    Args:
+        name (str): Nom de la table (clé de TABLE_MAPPINGS)
+        id_column (str): Colonne identifiant
+        blocks (list): (fichier source, fonction morceau -> (lignes, erreurs)), dans l'ordre final
+        chunksize (int): Nombre de lignes sources par morceau
+    Returns:
+        tuple: (nombre de lignes écrites, nombre de lignes en erreur)
+    """
+    error_count = 0
+    metrics = current_stage()
+    with TableWriter(name, id_column) as writer:
+        for file_path, build in blocks:
+            for chunk in iter_chunks(file_path, chunksize):
+                rows, errors = build(chunk)
+                writer.write(rows)
+                error_count += errors
+                if metrics is not None:
+                    metrics.add(rows_in=len(chunk), rows_out=len(rows), rejected=len(chunk) - len(rows))
+        if writer.rows == 0:
+            raise ValueError("Aucune donnée valide après transformation")
+    return writer.rows, error_count
@@ -0,0 +1,644 @@
+# =============================================================================
+# Script : etl_synthetic.py
+# Description :
+# Génération de données synthétiques à grande échelle (tests de charge et
+# mesures de performance de l'ETL, de l'API et de l'entraînement).
+#
+# - Profil tiré des fichiers réels de SourceData : valeur de référence de chaque
+#   pays par colonne, rapports min/médiane et max/médiane observés, pays sans
+#   donnée, jetons "na" / "Nodata" / "No data", tiret des plages, largeur des cellules
+# - Fichiers au format SourceData : mêmes en-têtes, chaînes "médiane[min–max]",
+#   colonnes détaillées parfois vides (à reconstituer depuis la chaîne), cellules
+#   complétées par des espaces
+# - Tables au format DatasetClean : CSV et Parquet typés, mêmes règles que l'ETL
+#   (valeurs arrondies, lignes hors contraintes de backend/schemas.py écartées)
+# - Échelle : --scale N découpe chaque pays en N unités infranationales (le total
+#   du pays est réparti entre ses unités), --years étend la période des fichiers
+#   annuels, --monthly ajoute une ligne par mois (colonnes Month / mois)
+# - Génération par morceaux (mémoire bornée, dizaines de millions de lignes)
+#   et reproductible : même graine et mêmes options -> mêmes fichiers
+#
+# Utilisation :
+#   python etl_synthetic.py --scale 1000 --years 2000-2018 --seed 42 --output /tmp/synthetic
+#   (sorties dans <output>/SourceData et <output>/DatasetClean, résumé dans <output>/synthetic.json)
+# =============================================================================
+
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from etl_dataset import parquet_path, read_table, to_arrow, validate_table
+from etl_diff import id_column
+from etl_loader import TABLE_MAPPINGS
+from etl_transform import fill_from_ranges
+
+SOURCE_DIR = Path(__file__).resolve().parent.parent / 'SourceData'
+OUTPUT_DIR = Path(__file__).resolve().parent / 'synthetic'
+
+LIVING = 'no_of_people_living_with_hiv_by_country_clean.csv'
+DEATHS = 'no_of_deaths_by_country_clean.csv'
+PREVENTION = 'prevention_of_mother_to_child_transmission_by_country_clean.csv'
+ART = 'art_coverage_by_country_clean.csv'
+ART_PEDIATRIC = 'art_pediatric_coverage_by_country_clean.csv'
+CASES = 'no_of_cases_adults_15_to_49_by_country_clean.csv'
+
+# Ordre de génération : identifiants dans l'ordre des blocs des scripts ETL
+SOURCE_FILES = [LIVING, DEATHS, PREVENTION, ART, ART_PEDIATRIC, CASES]
+
+# Flux annuels répartis sur les mois en mode mensuel (les effectifs restent des stocks)
+FLOW_FILES = {DEATHS}
+
+REFERENCE_TABLES = ['unite', 'type_statistique', 'type_traitement']
+
+# Lignes DatasetClean produites par fichier source, dans l'ordre des scripts ETL :
+# colonne -> (colonne source, partie), 'annee', ou constante.
+# La première colonne source est obligatoire (ligne ignorée sinon) ;
+# "defaults" remplace une valeur absente au lieu d'écarter la ligne.
+DATASET_BLOCKS = {
+    LIVING: [
+        ('population_hiv', {'id_pays': 'id_pays', 'annee': 'annee', 'valeur': ('Count', 'median')}),
+        ('statistique', {'id_pays': 'id_pays', 'annee': 'annee', 'valeur': ('Count', 'median'),
+                         'id_unite': 2, 'id_type_statistique': 1}),
+    ],
+    DEATHS: [
+        ('mortalite', {'id_pays': 'id_pays', 'annee': 'annee', 'valeur': ('Count', 'median')}),
+        ('statistique', {'id_pays': 'id_pays', 'annee': 'annee', 'valeur': ('Count', 'median'),
+                         'id_unite': 2, 'id_type_statistique': 2}),
+    ],
+    PREVENTION: [
+        ('statistique', {'id_pays': 'id_pays', 'annee': 2018, 'valeur': ('Percentage Recieved', 'median'),
+                         'id_unite': 2, 'id_type_statistique': 3}),
+        ('transmission_mere_enfant', {
+            'id_pays': 'id_pays',
+            'besoin_arv_min': ('Needing antiretrovirals', 'min'),
+            'besoin_arv_median': ('Needing antiretrovirals', 'median'),
+            'besoin_arv_max': ('Needing antiretrovirals', 'max'),
+            'pourcentage_recu_min': ('Percentage Recieved', 'min'),
+            'pourcentage_recu_median': ('Percentage Recieved', 'median'),
+            'pourcentage_recu_max': ('Percentage Recieved', 'max'),
+            'defaults': {'pourcentage_recu_min': 0, 'pourcentage_recu_median': 0, 'pourcentage_recu_max': 0},
+        }),
+    ],
+    ART: [
+        ('traitement', {'id_pays': 'id_pays', 'id_type_traitement': 1,
+                        'couverture': ('Estimated ART coverage among people living with HIV (%)', 'median')}),
+    ],
+    ART_PEDIATRIC: [
+        ('traitement', {'id_pays': 'id_pays', 'id_type_traitement': 2,
+                        'couverture': ('Estimated ART coverage among children (%)', 'median')}),
+    ],
+}
+
+PARTS = ('median', 'min', 'max')
+
+# Part minimale des cellules "médiane[min–max]" écrites sans colonnes détaillées
+# (chemin de reconstitution de l'ETL toujours exercé, même si les fichiers réels n'en ont pas)
+BLANK_DETAIL_RATE = 0.01
+
+
+# ---------------------- 🟢 PROFIL DES DONNÉES RÉELLES ----------------------
+class ColumnProfile:
+    """
+    Distribution observée d'une colonne de valeurs d'un fichier source
+    """
+
+    def __init__(self, name, width, values, source, token, detail=None):
+        """
+        Args:
+            name (str): Nom de la colonne (sans espaces)
+            width (int): Largeur des cellules dans le fichier réel
+            values (DataFrame): country (position du pays), median, min, max
+                (valeurs reconstituées depuis la chaîne si besoin)
+            source (Series): Colonne d'origine ("médiane[min–max]" ou nombre), sans espaces
+            token (str): Jeton des cellules sans donnée
+            detail (Series): Colonne _median telle qu'écrite dans le fichier (colonnes à plage)
+        """
+        self.name = name
+        self.width = width
+        self.token = token
+        self.ranged = source.str.contains('[', regex=False).any()
+        self.percent = '(%)' in name or 'Percentage' in name
+        medians = values['median'].dropna()
+        self.decimals = 1 if (medians % 1 != 0).any() else 0
+        dashes = source.str.extract(r'\d\s*([-–—])\s*\d')[0].dropna()
+        self.dash = dashes.mode().iloc[0] if len(dashes) else '–'
+
+        # Valeur de référence de chaque pays (médiane des années disponibles)
+        self.base = values.groupby('country')['median'].median()
+        with_data = values['country'].isin(self.base.dropna().index)
+        self.missing_rate = float(values.loc[with_data, 'median'].isna().mean()) if with_data.any() else 0.0
+
+        # Rapports min/médiane et max/médiane observés, tirés ensuite ligne par ligne
+        complete = values.dropna(subset=list(PARTS))
+        complete = complete[complete['median'] > 0]
+        if len(complete):
+            self.ratios = np.column_stack([complete['min'] / complete['median'],
+                                           complete['max'] / complete['median']])
+        else:
+            self.ratios = np.array([[0.8, 1.2]])
+
+        # Cellules "médiane[min–max]" dont les colonnes détaillées sont vides
+        self.blank_detail_rate = 0.0
+        if detail is not None:
+            ranged = source.str.contains('[', regex=False)
+            observed = float((ranged & detail.isna()).sum() / max(int(ranged.sum()), 1))
+            self.blank_detail_rate = max(observed, BLANK_DETAIL_RATE)
+
+    def base_values(self, n_countries):
+        values = np.full(n_countries, np.nan)
+        values[self.base.index.to_numpy()] = self.base.to_numpy()
+        return values
+
+
+class SourceProfile:
+    """
+    Structure et distributions d'un fichier réel de SourceData
+    """
+
+    def __init__(self, file_name, header, df, countries):
+        self.file_name = file_name
+        self.header = header
+        self.widths = {column.strip(): len(column) for column in header}
+        self.years = sorted(df['Year'].astype(int).unique().tolist()) if 'Year' in df.columns else None
+
+        country = pd.Index(countries).get_indexer(df['Country'])
+        # Colonnes "médiane[min–max]" accompagnées de leurs colonnes _median/_min/_max
+        ranges = [column for column in df.columns if f"{column}_median" in df.columns]
+        numeric = df.copy()
+        for column in df.columns:
+            if column not in ('Country', 'WHO Region', 'Year') and column not in ranges:
+                numeric[column] = pd.to_numeric(df[column].replace('', None), errors='coerce')
+        fill_from_ranges(numeric, ranges)
+
+        details = {f"{column}_{part}" for column in ranges for part in PARTS}
+        self.columns = []
+        for column in df.columns:
+            if column in ('Country', 'WHO Region', 'Year') or column in details:
+                continue
+            source = df[column]
+            numbers = pd.to_numeric(source, errors='coerce')
+            tokens = source[numbers.isna() & ~source.str.contains(r'\d', regex=True)]
+            token = tokens[tokens != ''].mode().iloc[0] if (tokens != '').any() else 'Nodata'
+            if column in ranges:
+                values = pd.DataFrame({'country': country, **{part: numeric[f"{column}_{part}"] for part in PARTS}})
+                detail = pd.to_numeric(df[f"{column}_median"].replace('', None), errors='coerce')
+                self.columns.append(ColumnProfile(column, self.widths[column], values, source, token, detail))
+            else:
+                values = pd.DataFrame({'country': country, 'median': numbers, 'min': np.nan, 'max': np.nan})
+                self.columns.append(ColumnProfile(column, self.widths[column], values, source, token))
+
+
+def _read_raw(file_path):
+    """
+    Lecture brute d'un fichier source : en-têtes d'origine et cellules texte sans espaces
+    """
+    df = pd.read_csv(file_path, dtype=str, keep_default_na=False)
+    header = list(df.columns)
+    df.columns = df.columns.str.strip()
+    return header, df.apply(lambda column: column.str.strip())
+
+
+def load_profiles(source_dir=SOURCE_DIR):
+    """
+    Profil de chaque fichier réel de SourceData
+    Args:
+        source_dir (Path): Dossier des fichiers réels
+    Returns:
+        tuple: (noms des pays, régions OMS, {fichier: SourceProfile})
+    """
+    raw = {name: _read_raw(Path(source_dir) / name) for name in SOURCE_FILES}
+    countries = pd.concat([df[['Country', 'WHO Region']] for _, df in raw.values()], ignore_index=True)
+    countries = countries.drop_duplicates('Country').reset_index(drop=True)
+    names = countries['Country'].tolist()
+    profiles = {name: SourceProfile(name, header, df, names) for name, (header, df) in raw.items()}
+    return names, countries['WHO Region'].tolist(), profiles
+
+
+# ---------------------- 🟡 GÉNÉRATION ----------------------
+class Entities:
+    """
+    Pays ou unités infranationales générés (scale unités par pays)
+    """
+
+    def __init__(self, countries, regions, scale, seed):
+        self.countries = pa.array(countries, type=pa.string())
+        self.regions = pa.array(regions, type=pa.string())
+        self.scale = scale
+        self.country = np.repeat(np.arange(len(countries)), scale)
+        self.unit = np.tile(np.arange(scale), len(countries))
+        # Part de chaque unité dans le total du pays (tailles inégales)
+        shares = np.random.default_rng([seed, 0]).gamma(2.0, size=len(self.country)) if scale > 1 \
+            else np.ones(len(self.country))
+        self.share = shares / np.bincount(self.country, shares)[self.country]
+
+    def __len__(self):
+        return len(self.country)
+
+    def names(self, entities):
+        """
+        Noms des unités ("Kenya - R0042"), ou des pays sans découpage
+        """
+        names = self.countries.take(pa.array(self.country[entities]))
+        if self.scale == 1:
+            return names
+        digits = len(str(self.scale))
+        units = pc.utf8_lpad(pc.cast(pa.array(self.unit[entities] + 1), pa.string()), width=digits, padding='0')
+        return pc.binary_join_element_wise(names, pa.scalar(' - R'), units, '')
+
+    def region_names(self, entities):
+        return self.regions.take(pa.array(self.country[entities]))
+
+
+def _round_values(values, column):
+    """
+    Arrondi à la manière des estimations OMS : deux chiffres significatifs pour les
+    effectifs (7200, 11000), entier pour les pourcentages, décimale si la colonne en a
+    """
+    if column.decimals:
+        return np.maximum(np.round(values, column.decimals), 10.0 ** -column.decimals)
+    if column.percent:
+        return np.clip(np.rint(values), 0, 100)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = 10.0 ** np.maximum(np.floor(np.log10(np.maximum(values, 1))) - 1, 0)
+    return np.maximum(np.rint(values / factor) * factor, 1)
+
+
+def _number_text(values, decimals):
+    """
+    Nombres en texte ("7200", "0.1"), NULL pour les valeurs absentes
+    """
+    array = pa.array(values, from_pandas=True)
+    if not decimals:
+        array = pc.cast(array, pa.int64())
+    return pc.cast(array, pa.string())
+
+
+def _pad(array, width, left):
+    """
+    Cellules complétées par des espaces comme dans les fichiers réels (vide -> espaces)
+    """
+    array = pc.fill_null(array, '')
+    return pc.utf8_lpad(array, width=width) if left else pc.utf8_rpad(array, width=width)
+
+
+def generate_values(column, entities, rows, years, months, rng, params):
+    """
+    Valeurs d'une colonne pour un morceau de lignes
+    Args:
+        column (ColumnProfile): Profil de la colonne
+        entities (Entities): Unités générées
+        rows (dict): entity (position de l'unité), year, month par ligne
+        years (list): Années générées (None pour un fichier sans année)
+        months (int): 12 en mode mensuel, 1 sinon
+        rng (Generator): Générateur aléatoire du morceau
+        params (dict): Tendance et phase saisonnière de chaque pays
+    Returns:
+        dict: median, min, max (float, NaN si pas de donnée)
+    """
+    n = len(rows['entity'])
+    country = entities.country[rows['entity']]
+    base = params['base'][country]
+    missing = np.isnan(base) | (rng.random(n) < column.missing_rate)
+    base = np.where(np.isnan(base), 0.0, base)
+    elapsed = rows['year'] - (np.median(years) if years else 0)
+
+    if column.percent:
+        values = base + params['trend'][country] * 20 * elapsed + rng.normal(0, 3 if entities.scale == 1 else 6, n)
+        values = np.clip(values, 0, 100)
+    else:
+        values = base * entities.share[rows['entity']] * np.exp(params['trend'][country] * elapsed)
+        values = values * rng.lognormal(0, 0.1, n)
+        if months > 1 and params['flow']:
+            season = 1 + 0.15 * np.sin(2 * np.pi * (rows['month'] - 1) / 12 + params['phase'][country])
+            values = values / 12 * season
+
+    median = _round_values(values, column)
+    pick = rng.integers(len(column.ratios), size=n)
+    low = np.minimum(column.ratios[pick, 0], 1)
+    high = np.maximum(column.ratios[pick, 1], 1)
+    result = {
+        'median': median,
+        'min': np.minimum(_round_values(values * low, column), median),
+        'max': np.maximum(_round_values(values * high, column), median),
+    }
+    return {part: np.where(missing, np.nan, values) for part, values in result.items()}
+
+
+def source_table(profile, entities, rows, values, rng, monthly, padding):
+    """
+    Morceau de fichier au format SourceData (colonnes texte, en-têtes d'origine)
+    """
+    n = len(rows['entity'])
+    widths = profile.widths if padding else {}
+    last = profile.header[-1].strip()
+    columns = {}
+    for header in profile.header:
+        name = header.strip()
+        if name == 'Country':
+            array = entities.names(rows['entity'])
+        elif name == 'WHO Region':
+            array = entities.region_names(rows['entity'])
+        elif name == 'Year':
+            array = pc.cast(pa.array(rows['year']), pa.string())
+        else:
+            column = next((c for c in profile.columns if c.name == name), None)
+            if column is None:
+                # Colonne détaillée : écrite avec sa colonne d'origine
+                continue
+            generated = values[name]
+            median = _number_text(generated['median'], column.decimals)
+            text = median
+            if column.ranged:
+                text = pc.binary_join_element_wise(
+                    median, '[', _number_text(generated['min'], column.decimals),
+                    column.dash, _number_text(generated['max'], column.decimals), ']', '')
+            text = pc.fill_null(text, column.token)
+            columns[header] = text if name == last or not widths else _pad(text, widths[name], left=False)
+            if column.ranged:
+                # Colonnes détaillées parfois vides : valeur à reconstituer depuis la chaîne
+                blank = rng.random(n) < column.blank_detail_rate
+                for part in PARTS:
+                    detail = f"{name}_{part}"
+                    detail_header = next(h for h in profile.header if h.strip() == detail)
+                    array = _number_text(np.where(blank, np.nan, generated[part]), column.decimals)
+                    columns[detail_header] = _pad(array, widths[detail], left=True) if widths else array
+            continue
+        columns[header] = array if name == last or not widths else _pad(array, widths[name], left=False)
+        if name == 'Year' and monthly:
+            columns['Month'] = pc.cast(pa.array(rows['month']), pa.string())
+
+    ordered = [h for h in profile.header if h in columns]
+    if monthly and 'Month' in columns:
+        ordered.insert(ordered.index(next(h for h in profile.header if h.strip() == 'Year')) + 1, 'Month')
+    return pa.table({h: columns[h] for h in ordered})
+
+
+def dataset_rows(block, entities, rows, values):
+    """
+    Lignes DatasetClean d'un bloc (mêmes règles que build_rows : arrondi, ligne
+    ignorée si la valeur obligatoire manque, lignes hors contraintes écartées)
+    Returns:
+        DataFrame: Lignes sans identifiant
+    """
+    name, spec = block
+    spec = dict(spec)
+    defaults = spec.pop('defaults', {})
+    n = len(rows['entity'])
+    required = next(source for source in spec.values() if isinstance(source, tuple))
+    keep = ~np.isnan(values[required[0]][required[1]])
+    data = {}
+    for column, source in spec.items():
+        if source == 'id_pays':
+            data[column] = rows['entity'] + 1
+        elif source == 'annee':
+            data[column] = rows['year']
+        elif isinstance(source, tuple):
+            generated = values[source[0]][source[1]]
+            if column in defaults:
+                generated = np.where(np.isnan(generated), defaults[column], generated)
+            keep &= ~np.isnan(generated)
+            data[column] = np.rint(np.where(np.isnan(generated), 0, generated))
+        else:
+            data[column] = np.full(n, source)
+    df = pd.DataFrame({column: np.asarray(values_)[keep].astype(np.int64) for column, values_ in data.items()})
+    if 'month' in rows and spec.get('annee') == 'annee':
+        df['mois'] = rows['month'][keep].astype(np.int64)
+    valid = validate_table(name, df.drop(columns=['mois'], errors='ignore')).valid
+    return df[valid].reset_index(drop=True)
+
+
+# ---------------------- 🔵 ÉCRITURE ----------------------
+class CsvWriter:
+    """
+    Écriture CSV Arrow par lots, sans guillemets (en-têtes et valeurs comme les fichiers réels)
+    """
+
+    def __init__(self, path, schema):
+        self._file = open(path, 'wb')
+        self._file.write((','.join(schema.names) + '\n').encode('utf-8'))
+        self._writer = pa_csv.CSVWriter(self._file, schema, write_options=pa_csv.WriteOptions(
+            include_header=False, quoting_style='none'))
+
+    def write_table(self, table):
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+        self._file.close()
+
+
+class DatasetWriter:
+    """
+    Écriture par morceaux d'une table au format DatasetClean (CSV et Parquet typé)
+    Colonne mois (mode mensuel) ajoutée après les colonnes du schéma.
+    """
+
+    def __init__(self, name, dataset_dir, monthly=False):
+        self.name = name
+        self.id_column = id_column(name)
+        self.monthly = monthly and 'annee' in TABLE_MAPPINGS[name]["columns"]
+        self.csv_file = Path(dataset_dir) / TABLE_MAPPINGS[name]["file"]
+        self.parquet_file = parquet_path(name, dataset_dir)
+        self.rows = 0
+        self._csv = None
+        self._parquet = None
+
+    def write(self, rows):
+        if rows.empty:
+            return
+        if self.id_column not in rows.columns:
+            rows = rows.copy()
+            rows.insert(0, self.id_column, np.arange(self.rows + 1, self.rows + len(rows) + 1, dtype=np.int64))
+        months = rows.pop('mois') if 'mois' in rows.columns else None
+        table = to_arrow(self.name, rows)
+        if self.monthly:
+            mois = pa.array(months.to_numpy(), type=pa.int32()) if months is not None \
+                else pa.nulls(len(rows), pa.int32())
+            table = table.append_column(pa.field('mois', pa.int32()), mois)
+        if self._parquet is None:
+            self._parquet = pq.ParquetWriter(self.parquet_file, table.schema, compression='zstd')
+            self._csv = CsvWriter(self.csv_file, table.schema)
+        self._parquet.write_table(table)
+        self._csv.write_table(table)
+        self.rows += len(rows)
+
+    def close(self):
+        for writer in (self._parquet, self._csv):
+            if writer is not None:
+                writer.close()
+
+
+def _periods(profile, years, monthly):
+    """
+    (années, nombre de mois) d'un fichier : les fichiers sans année restent un instantané
+    """
+    if profile.years is None:
+        return None, 1
+    return (years or profile.years), (12 if monthly else 1)
+
+
+def generate(output_dir=OUTPUT_DIR, scale=1, years=None, monthly=False, seed=0, sources=True,
+             dataset=True, padding=True, chunk_rows=1_000_000, source_dir=SOURCE_DIR):
+    """
+    Génération des fichiers SourceData et des tables DatasetClean synthétiques
+    Args:
+        output_dir (Path): Dossier de sortie (SourceData/ et DatasetClean/ y sont créés)
+        scale (int): Unités infranationales par pays (1 = pays réels)
+        years (list): Années des fichiers annuels (années réelles par défaut)
+        monthly (bool): Une ligne par mois pour les fichiers annuels
+        seed (int): Graine du générateur aléatoire
+        sources (bool): Écriture des fichiers SourceData
+        dataset (bool): Écriture des tables DatasetClean
+        padding (bool): Cellules complétées par des espaces comme les fichiers réels
+        chunk_rows (int): Nombre de lignes générées par morceau
+        source_dir (Path): Fichiers réels servant de profil
+    Returns:
+        dict: Paramètres, lignes par fichier et par table, durée
+    """
+    start = time.perf_counter()
+    output_dir = Path(output_dir)
+    countries, regions, profiles = load_profiles(source_dir)
+    entities = Entities(countries, regions, scale, seed)
+    logging.info(f"🔄 Génération synthétique : {len(entities)} unités ({len(countries)} pays x {scale}), graine {seed}")
+
+    source_out = output_dir / 'SourceData'
+    dataset_out = output_dir / 'DatasetClean'
+    for directory, enabled in ((source_out, sources), (dataset_out, dataset)):
+        if enabled:
+            directory.mkdir(parents=True, exist_ok=True)
+
+    summary = {
+        "scale": scale, "years": years, "monthly": monthly, "seed": seed, "units": len(entities),
+        "sources": {}, "dataset": {},
+    }
+    writers = {}
+    if dataset:
+        for name in REFERENCE_TABLES:
+            writer = DatasetWriter(name, dataset_out)
+            writer.write(read_table(name))
+            writer.close()
+            summary["dataset"][name] = writer.rows
+        writers = {name: DatasetWriter(name, dataset_out, monthly)
+                   for blocks in DATASET_BLOCKS.values() for name, _ in blocks}
+
+        # Table pays : une ligne par unité (noms en minuscules, comme etl_table_pays)
+        pays = DatasetWriter('pays', dataset_out)
+        for first in range(0, len(entities), chunk_rows):
+            positions = np.arange(first, min(first + chunk_rows, len(entities)))
+            pays.write(pd.DataFrame({
+                'id_pays': positions + 1,
+                'pays': pc.utf8_lower(entities.names(positions)).to_pandas(),
+                'region_who': pc.utf8_lower(entities.region_names(positions)).to_pandas(),
+            }))
+        pays.close()
+        summary["dataset"]['pays'] = pays.rows
+
+    try:
+        for file_no, file_name in enumerate(SOURCE_FILES, start=1):
+            profile = profiles[file_name]
+            file_years, months = _periods(profile, years, monthly)
+            periods = len(file_years or [None]) * months
+            params_rng = np.random.default_rng([seed, file_no])
+            params = {
+                'trend': params_rng.normal(0.0, 0.03, len(countries)),
+                'phase': params_rng.uniform(0, 2 * np.pi, len(countries)),
+                'flow': file_name in FLOW_FILES,
+            }
+            bases = {column.name: column.base_values(len(countries)) for column in profile.columns}
+            source_csv = None
+            written = 0
+            per_chunk = max(1, chunk_rows // periods)
+            for chunk_no, first in enumerate(range(0, len(entities), per_chunk)):
+                rng = np.random.default_rng([seed, file_no, chunk_no])
+                positions = np.arange(first, min(first + per_chunk, len(entities)))
+                period = np.tile(np.arange(periods), len(positions))
+                rows = {
+                    'entity': np.repeat(positions, periods),
+                    'year': np.asarray(file_years)[period // months] if file_years else np.zeros(len(period), int),
+                    'month': period % months + 1,
+                }
+                values = {column.name: generate_values(column, entities, rows, file_years, months, rng,
+                                                       {**params, 'base': bases[column.name]})
+                          for column in profile.columns}
+
+                if sources:
+                    table = source_table(profile, entities, rows, values, rng, monthly and file_years is not None,
+                                         padding)
+                    if source_csv is None:
+                        source_csv = CsvWriter(source_out / file_name, table.schema)
+                    source_csv.write_table(table)
+                written += len(rows['entity'])
+
+                if dataset:
+                    if not monthly or file_years is None:
+                        rows.pop('month')
+                    for block in DATASET_BLOCKS.get(file_name, []):
+                        writers[block[0]].write(dataset_rows(block, entities, rows, values))
+            if source_csv is not None:
+                source_csv.close()
+            summary["sources"][file_name] = written
+            logging.info(f"✅ {file_name} : {written} lignes")
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for name, writer in writers.items():
+        summary["dataset"][name] = writer.rows
+    summary["duration_s"] = round(time.perf_counter() - start, 3)
+    with open(output_dir / 'synthetic.json', 'w', encoding='utf-8') as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    logging.info(f"✅ Données synthétiques écrites dans {output_dir} ({summary['duration_s']} s)")
+    return summary
+
+
+def parse_years(text):
+    """
+    Années demandées : "2000-2018" (intervalle) ou "2000,2010,2018"
+    """
+    if '-' in text:
+        first, last = (int(part) for part in text.split('-', 1))
+        years = list(range(first, last + 1))
+    else:
+        years = [int(part) for part in text.split(',') if part.strip()]
+    if not years or min(years) < 1900 or max(years) > 2100:
+        raise argparse.ArgumentTypeError("années attendues entre 1900 et 2100")
+    return years
+
+
+# ---------------------- 🚀 EXECUTION ----------------------
+def main():
+    """
+    Génération en ligne de commande
+    """
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Génération de données synthétiques (SourceData et DatasetClean)")
+    parser.add_argument("--output", type=Path, default=OUTPUT_DIR, help="Dossier de sortie")
+    parser.add_argument("--scale", type=int, default=1, help="Unités infranationales par pays")
+    parser.add_argument("--years", type=parse_years, default=None,
+                        help="Années des fichiers annuels : 2000-2018 ou 2000,2010,2018")
+    parser.add_argument("--monthly", action="store_true", help="Une ligne par mois")
+    parser.add_argument("--seed", type=int, default=0, help="Graine (génération reproductible)")
+    parser.add_argument("--chunk-rows", type=int, default=1_000_000, help="Lignes générées par morceau")
+    parser.add_argument("--sources-only", action="store_true", help="Fichiers SourceData uniquement")
+    parser.add_argument("--dataset-only", action="store_true", help="Tables DatasetClean uniquement")
+    parser.add_argument("--compact", action="store_true", help="Sans espaces de remplissage")
+    args = parser.parse_args()
+    if args.scale < 1:
+        parser.error("--scale doit être supérieur ou égal à 1")
+
+    generate(args.output, scale=args.scale, years=args.years, monthly=args.monthly, seed=args.seed,
+             sources=not args.dataset_only, dataset=not args.sources_only, padding=not args.compact,
+             chunk_rows=args.chunk_rows)
+
+
+if __name__ == "__main__":
+    main()
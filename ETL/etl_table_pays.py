@@ -22,12 +22,21 @@
 # CHARGEMENT :
 # - Fichier : pays_clean.csv
 # - Format : CSV (séparateur: ',', encodage: UTF-8)
+# - Format : Parquet typé (même nom, extension .parquet, schéma de backend/models.py)
+# - Index des pays : pays_index.parquet (clés normalisées et alias -> id_pays)
 # =============================================================================
 
 import pandas as pd
 import sys
 import logging
 from pathlib import Path
+from etl_countries import build_country_index, write_country_index
+from etl_dataset import write_parquet
+from etl_diff import diff_with_snapshot, write_changes_report
+from etl_loader import csv_output_enabled, database_url, load_dataframe
+from etl_metrics import stage
+from etl_sources import read_source
+from etl_stream import chunk_size, iter_chunks
 
 # Configuration du logging
 logging.basicConfig(
@@ -40,6 +49,26 @@ logging.basicConfig(
 )
 
 # ---------------------- 🟢 EXTRACTION (Extract) ----------------------
+def select_countries(df):
+    """
+    Sélection des couples (pays, région) distincts d'un fichier source ou d'un morceau
+    Args:
+        df (DataFrame): Lignes du fichier source
+    Returns:
+        DataFrame: Colonnes pays (et region_who si présente), ou None sans colonne 'Country'
+    """
+    # Vérification des colonnes nécessaires
+    country_col = next((col for col in df.columns if "Country" in col), None)
+    region_col = next((col for col in df.columns if "WHO Region" in col), None)
+    
+    if not country_col:
+        return None
+    df = df.rename(columns={country_col: "pays"})
+    if region_col:
+        df = df.rename(columns={region_col: "region_who"})
+        return df[["pays", "region_who"]].drop_duplicates()
+    return df[["pays"]].drop_duplicates()
+
 def extract_data():
     """
     EXTRACTION : Lecture des fichiers sources
@@ -64,22 +93,21 @@ def extract_data():
             if not path.exists():
                 raise FileNotFoundError(f"Fichier introuvable : {file_path}")
                 
-            df = pd.read_csv(file_path)
-            if df.empty:
-                logging.warning(f"⚠️ Le fichier {file_path} est vide")
-                continue
-                
-            # Vérification des colonnes nécessaires
-            country_col = next((col for col in df.columns if "Country" in col), None)
-            region_col = next((col for col in df.columns if "WHO Region" in col), None)
+            chunksize = chunk_size()
+            if chunksize:
+                # Mode flux : seuls les couples (pays, région) distincts restent en mémoire
+                chunks = [select_countries(chunk) for chunk in iter_chunks(file_path, chunksize)]
+                chunks = [chunk for chunk in chunks if chunk is not None]
+                df = pd.concat(chunks, ignore_index=True).drop_duplicates() if chunks else None
+            else:
+                # Seules les colonnes pays et région sont lues
+                df = read_source(file_path, columns=['Country', 'WHO Region'])
+                if df.empty:
+                    logging.warning(f"⚠️ Le fichier {file_path} est vide")
+                    continue
+                df = select_countries(df)
             
-            if country_col:
-                df.rename(columns={country_col: "pays"}, inplace=True)
-                if region_col:
-                    df.rename(columns={region_col: "region_who"}, inplace=True)
-                    df = df[["pays", "region_who"]].drop_duplicates()
-                else:
-                    df = df[["pays"]].drop_duplicates()
+            if df is not None:
                 dataframes.append(df)
             else:
                 logging.warning(f"⚠️ Aucune colonne 'Country' trouvée dans {file_path}")
@@ -166,30 +194,52 @@ def load_data(df):
         
         output_file = Path('../DatasetClean/pays_clean.csv')
         
-        # 1. Préparation du dossier de sortie
-        try:
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
+        # 1. Comparaison avec la version précédente de DatasetClean
+        #    (identifiants conservés, lignes insérées / modifiées / supprimées)
+        df, changes = diff_with_snapshot('pays', df)
+        
+        # 2. Chargement direct dans PostgreSQL (seules les différences sont appliquées)
+        #    avant d'écrire les fichiers : après un échec, le prochain diff repart
+        #    de la version encore présente dans les bases
+        if database_url():
+            copied = load_dataframe('pays', df, changes=changes)
+            logging.info(f"✅ {copied} lignes chargées dans PostgreSQL")
+
+        if csv_output_enabled():
+            # 3. Préparation du dossier de sortie
+            try:
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
             
-        # 2. Sauvegarde des données
-        try:
-            df.to_csv(output_file, index=False)
-        except Exception as e:
-            raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
+            # 4. Sauvegarde des données
+            try:
+                df.to_csv(output_file, index=False)
+            except Exception as e:
+                raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
             
-        # 3. Vérification
-        if not output_file.exists():
-            raise FileNotFoundError("Le fichier n'a pas été créé")
+            # 5. Vérification
+            if not output_file.exists():
+                raise FileNotFoundError("Le fichier n'a pas été créé")
             
-        # 4. Validation des données sauvegardées
-        try:
-            verification_df = pd.read_csv(output_file)
-            if verification_df.empty or len(verification_df) != len(df):
-                raise ValueError("Les données sauvegardées sont incomplètes")
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la vérification : {str(e)}")
+            # 6. Validation des données sauvegardées
+            try:
+                verification_df = pd.read_csv(output_file)
+                if verification_df.empty or len(verification_df) != len(df):
+                    raise ValueError("Les données sauvegardées sont incomplètes")
+            except Exception as e:
+                raise ValueError(f"Erreur lors de la vérification : {str(e)}")
             
+
+        # 7. Sauvegarde Parquet typée (schéma dérivé de backend/models.py)
+        parquet_file = write_parquet('pays', df)
+        logging.info(f"✅ Fichier Parquet écrit : {parquet_file.name}")
+
+        # 8. Index canonique des pays (noms normalisés et alias -> id_pays)
+        index_file = write_country_index(build_country_index(df))
+        logging.info(f"✅ Index des pays écrit : {index_file.name}")
+
+        write_changes_report(changes)
         logging.info(f"✅ Chargement réussi - {len(df)} pays enregistrés")
         return True
         
@@ -209,18 +259,26 @@ def main():
         logging.info("🚀 Début du processus ETL pour pays")
         
         # EXTRACTION
-        dataframes = extract_data()
-        if dataframes is None:
-            raise Exception("Échec de l'extraction des données")
+        with stage("pays", "extract") as metrics:
+            dataframes = extract_data()
+            if dataframes is None:
+                raise Exception("Échec de l'extraction des données")
+            metrics.rows_out = sum(len(df) for df in dataframes)
             
         # TRANSFORMATION
-        transformed_df = transform_data(dataframes)
-        if transformed_df is None:
-            raise Exception("Échec de la transformation des données")
+        with stage("pays", "transform") as metrics:
+            metrics.rows_in = sum(len(df) for df in dataframes)
+            transformed_df = transform_data(dataframes)
+            if transformed_df is None:
+                raise Exception("Échec de la transformation des données")
+            metrics.rows_out = len(transformed_df)
             
         # CHARGEMENT
-        if not load_data(transformed_df):
-            raise Exception("Échec du chargement des données")
+        with stage("pays", "load") as metrics:
+            metrics.rows_in = len(transformed_df)
+            if not load_data(transformed_df):
+                raise Exception("Échec du chargement des données")
+            metrics.rows_out = len(transformed_df)
             
         logging.info("✅ Processus ETL terminé avec succès")
         
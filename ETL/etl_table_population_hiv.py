@@ -9,14 +9,15 @@
 # - Période : 2000-2018
 # 
 # TRANSFORMATION :
-# - Standardisation des noms de pays (minuscules, sans espaces)
-# - Liaison avec la table pays pour obtenir les id_pays
+# - Liaison avec l'index des pays (pays_index.parquet, noms normalisés et alias)
+#   pour obtenir les id_pays ; noms non reconnus dans pays_non_reconnus.json
 # - Conversion des valeurs en nombres entiers
 # - Structure : id_pays, annee, population (min/median/max), id_unite
 # 
 # CHARGEMENT :
 # - Fichier : table_population_hiv.csv
 # - Format : CSV (séparateur: ',', encodage: UTF-8)
+# - Format : Parquet typé (même nom, extension .parquet, schéma de backend/models.py)
 # =============================================================================
 
 import pandas as pd
@@ -24,6 +25,14 @@ import numpy as np
 import sys
 import logging
 from pathlib import Path
+from etl_countries import INDEX_FILE, attach_country_ids, read_country_index, write_unmatched_report
+from etl_dataset import write_parquet
+from etl_diff import diff_with_snapshot, write_changes_report
+from etl_loader import csv_output_enabled, database_url, load_dataframe
+from etl_metrics import stage
+from etl_sources import read_source
+from etl_stream import chunk_size, stream_table
+from etl_transform import build_rows, assign_ids
 
 # Configuration du logging
 logging.basicConfig(
@@ -46,7 +55,7 @@ def extract_data():
         
         # Vérification des fichiers sources
         files_to_check = {
-            'pays': Path('../DatasetClean/pays_clean.csv'),
+            'pays': INDEX_FILE,
             'population': Path('../SourceData/no_of_people_living_with_hiv_by_country_clean.csv')
         }
         
@@ -56,16 +65,16 @@ def extract_data():
                 raise FileNotFoundError(f"Fichier {name} introuvable : {file_path}")
         
         # Lecture des données avec vérification
-        pays_df = pd.read_csv(files_to_check['pays'])
-        if pays_df.empty:
-            raise ValueError("Le fichier pays est vide")
+        pays_index = read_country_index()
+        if pays_index.empty:
+            raise ValueError("L'index des pays est vide")
             
-        population_df = pd.read_csv(files_to_check['population'])
+        population_df = read_source(files_to_check['population'])
         if population_df.empty:
             raise ValueError("Le fichier population est vide")
             
         logging.info("✅ Extraction réussie")
-        return pays_df, population_df
+        return pays_index, population_df
         
     except FileNotFoundError as e:
         logging.error(f"❌ Erreur d'accès fichier : {str(e)}")
@@ -77,11 +86,56 @@ def extract_data():
         logging.error(f"❌ Erreur inattendue lors de l'extraction : {str(e)}")
         return None, None
 
-def transform_data(pays_df, population_df):
+def build_block(pays_index, population_df):
+    """
+    Transformation d'un bloc de lignes sources (fichier complet ou morceau)
+    Args:
+        pays_index (DataFrame): Index des pays (etl_countries)
+        population_df (DataFrame): Lignes du fichier population
+    Returns:
+        tuple: (DataFrame sans identifiant, nombre de lignes en erreur)
+    """
+    # 1. Nettoyage des colonnes
+    try:
+        population_df.columns = population_df.columns.str.strip()
+        required_columns = ['Country', 'Year', 'Count_min', 'Count_median', 'Count_max']
+        if not all(col in population_df.columns for col in required_columns):
+            raise ValueError("Colonnes manquantes dans le fichier source")
+    except Exception as e:
+        raise ValueError(f"Erreur lors du nettoyage des colonnes : {str(e)}")
+
+    # 2. Correspondance avec l'index des pays (codes catégoriels, noms non reconnus comptés)
+    try:
+        merged_df = attach_country_ids(population_df, pays_index, 'population_hiv')
+    except Exception as e:
+        raise ValueError(f"Erreur lors de la correspondance des pays : {str(e)}")
+
+    # 3. Conversion des données numériques
+    try:
+        numeric_columns = ['Count_min', 'Count_median', 'Count_max']
+        for col in numeric_columns:
+            merged_df[col] = pd.to_numeric(merged_df[col], errors='coerce')
+    except Exception as e:
+        raise ValueError(f"Erreur lors de la conversion numérique : {str(e)}")
+
+    # 4. Construction du DataFrame final (vectorisée)
+    return build_rows(
+        merged_df,
+        required=['Count_median', 'id_pays'],
+        columns={
+            'id_pays': ('id_pays', 'int'),
+            'annee': ('Year', 'int'),
+            'valeur': ('Count_median', 'round')
+        },
+        table='population_hiv'
+    )
+
+
+def transform_data(pays_index, population_df):
     """
     TRANSFORMATION : Nettoyage et structuration des données
     Args:
-        pays_df (DataFrame): DataFrame des pays
+        pays_index (DataFrame): Index des pays (etl_countries)
         population_df (DataFrame): DataFrame des données population
     Returns:
         DataFrame: Données transformées ou None en cas d'erreur
@@ -89,61 +143,13 @@ def transform_data(pays_df, population_df):
     try:
         logging.info("🔄 Début de la transformation...")
         
-        # 1. Nettoyage des colonnes
-        try:
-            population_df.columns = population_df.columns.str.strip()
-            required_columns = ['Country', 'Year', 'Count_min', 'Count_median', 'Count_max']
-            if not all(col in population_df.columns for col in required_columns):
-                raise ValueError("Colonnes manquantes dans le fichier source")
-        except Exception as e:
-            raise ValueError(f"Erreur lors du nettoyage des colonnes : {str(e)}")
-            
-        # 2. Standardisation des pays
-        try:
-            population_df['Country'] = population_df['Country'].str.strip().str.lower()
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la standardisation des pays : {str(e)}")
-            
-        # 3. Fusion avec la table pays
-        try:
-            merged_df = pd.merge(population_df, pays_df, 
-                               left_on='Country', 
-                               right_on='pays', 
-                               how='inner')
-            if merged_df.empty:
-                raise ValueError("Aucune correspondance trouvée après la fusion")
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la fusion : {str(e)}")
-            
-        # 4. Conversion des données numériques
-        try:
-            numeric_columns = ['Count_min', 'Count_median', 'Count_max']
-            for col in numeric_columns:
-                merged_df[col] = pd.to_numeric(merged_df[col], errors='coerce')
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la conversion numérique : {str(e)}")
-            
-        # 5. Construction du DataFrame final
-        population_data = []
-        error_count = 0
-        for _, row in merged_df.iterrows():
-            try:
-                if pd.notna(row['Count_median']) and pd.notna(row['id_pays']):
-                    population_data.append({
-                        'id': len(population_data) + 1,
-                        'id_pays': int(row['id_pays']),
-                        'annee': int(row['Year']),
-                        'valeur': int(round(float(row['Count_median'])))
-                    })
-            except ValueError as e:
-                error_count += 1
-                logging.warning(f"⚠️ Ligne ignorée - Pays: {row['Country']}, Année: {row['Year']}")
-                continue
+        population_df, error_count = build_block(pays_index, population_df)
                 
         if error_count > 0:
             logging.warning(f"⚠️ {error_count} lignes ignorées pendant la transformation")
+        write_unmatched_report('population_hiv')
             
-        result_df = pd.DataFrame(population_data)
+        result_df = assign_ids([population_df], 'id')
         if result_df.empty:
             raise ValueError("Aucune donnée valide après transformation")
             
@@ -170,30 +176,48 @@ def load_data(df):
         
         output_file = Path('../DatasetClean/table_population_hiv.csv')
         
-        # 1. Préparation du dossier de sortie
-        try:
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
+        # 1. Comparaison avec la version précédente de DatasetClean
+        #    (identifiants conservés, lignes insérées / modifiées / supprimées)
+        df, changes = diff_with_snapshot('population_hiv', df)
+        
+        # 2. Chargement direct dans PostgreSQL (seules les différences sont appliquées)
+        #    avant d'écrire les fichiers : après un échec, le prochain diff repart
+        #    de la version encore présente dans les bases
+        if database_url():
+            copied = load_dataframe('population_hiv', df, changes=changes)
+            logging.info(f"✅ {copied} lignes chargées dans PostgreSQL")
+
+        if csv_output_enabled():
+            # 3. Préparation du dossier de sortie
+            try:
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
             
-        # 2. Sauvegarde des données
-        try:
-            df.to_csv(output_file, index=False)
-        except Exception as e:
-            raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
+            # 4. Sauvegarde des données
+            try:
+                df.to_csv(output_file, index=False)
+            except Exception as e:
+                raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
             
-        # 3. Vérification
-        if not output_file.exists():
-            raise FileNotFoundError("Le fichier n'a pas été créé")
+            # 5. Vérification
+            if not output_file.exists():
+                raise FileNotFoundError("Le fichier n'a pas été créé")
             
-        # 4. Validation des données sauvegardées
-        try:
-            verification_df = pd.read_csv(output_file)
-            if verification_df.empty or len(verification_df) != len(df):
-                raise ValueError("Les données sauvegardées sont incomplètes")
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la vérification : {str(e)}")
+            # 6. Validation des données sauvegardées
+            try:
+                verification_df = pd.read_csv(output_file)
+                if verification_df.empty or len(verification_df) != len(df):
+                    raise ValueError("Les données sauvegardées sont incomplètes")
+            except Exception as e:
+                raise ValueError(f"Erreur lors de la vérification : {str(e)}")
             
+
+        # 7. Sauvegarde Parquet typée (schéma dérivé de backend/models.py)
+        parquet_file = write_parquet('population_hiv', df)
+        logging.info(f"✅ Fichier Parquet écrit : {parquet_file.name}")
+
+        write_changes_report(changes)
         logging.info(f"✅ Chargement réussi - {len(df)} lignes sauvegardées")
         return True
         
@@ -204,6 +228,41 @@ def load_data(df):
         logging.error(f"❌ Erreur inattendue lors du chargement : {str(e)}")
         return False
 
+def stream_data(chunksize):
+    """
+    EXTRACTION, TRANSFORMATION et CHARGEMENT par morceaux (mémoire bornée)
+    Args:
+        chunksize (int): Nombre de lignes sources par morceau
+    Returns:
+        bool: True si succès, False sinon
+    """
+    try:
+        logging.info(f"🔄 Traitement par morceaux de {chunksize} lignes...")
+        
+        source_file = Path('../SourceData/no_of_people_living_with_hiv_by_country_clean.csv')
+        if not source_file.exists():
+            raise FileNotFoundError(f"Fichier population introuvable : {source_file}")
+        pays_index = read_country_index()
+        
+        rows, error_count = stream_table(
+            'population_hiv', 'id',
+            [(source_file, lambda chunk: build_block(pays_index, chunk))],
+            chunksize
+        )
+        
+        if error_count > 0:
+            logging.warning(f"⚠️ {error_count} lignes ignorées pendant la transformation")
+        write_unmatched_report('population_hiv')
+        logging.info(f"✅ Chargement réussi - {rows} lignes sauvegardées")
+        return True
+        
+    except (IOError, FileNotFoundError, ValueError) as e:
+        logging.error(f"❌ Erreur du traitement par morceaux : {str(e)}")
+        return False
+    except Exception as e:
+        logging.error(f"❌ Erreur inattendue du traitement par morceaux : {str(e)}")
+        return False
+
 def main():
     """
     Fonction principale : Orchestration du processus ETL
@@ -211,19 +270,36 @@ def main():
     try:
         logging.info("🚀 Début du processus ETL pour population_hiv")
         
+        # Mode flux (ETL_CHUNK_SIZE) : mémoire bornée quelle que soit la taille des sources
+        chunksize = chunk_size()
+        if chunksize:
+            with stage("population_hiv", "stream"):
+                if not stream_data(chunksize):
+                    raise Exception("Échec du traitement par morceaux")
+            logging.info("✅ Processus ETL terminé avec succès")
+            return
+            
         # EXTRACTION
-        pays_df, population_df = extract_data()
-        if pays_df is None or population_df is None:
-            raise Exception("Échec de l'extraction des données")
+        with stage("population_hiv", "extract") as metrics:
+            pays_index, population_df = extract_data()
+            if pays_index is None or population_df is None:
+                raise Exception("Échec de l'extraction des données")
+            metrics.rows_out = len(population_df)
             
         # TRANSFORMATION
-        transformed_df = transform_data(pays_df, population_df)
-        if transformed_df is None:
-            raise Exception("Échec de la transformation des données")
+        with stage("population_hiv", "transform") as metrics:
+            metrics.rows_in = len(population_df)
+            transformed_df = transform_data(pays_index, population_df)
+            if transformed_df is None:
+                raise Exception("Échec de la transformation des données")
+            metrics.rows_out = len(transformed_df)
             
         # CHARGEMENT
-        if not load_data(transformed_df):
-            raise Exception("Échec du chargement des données")
+        with stage("population_hiv", "load") as metrics:
+            metrics.rows_in = len(transformed_df)
+            if not load_data(transformed_df):
+                raise Exception("Échec du chargement des données")
+            metrics.rows_out = len(transformed_df)
             
         logging.info("✅ Processus ETL terminé avec succès")
         
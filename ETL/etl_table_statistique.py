@@ -12,14 +12,15 @@
 # - Période : 2000-2018
 # 
 # TRANSFORMATION :
-# - Standardisation des noms de pays (minuscules, sans espaces)
-# - Liaison avec la table pays pour obtenir les id_pays
+# - Liaison avec l'index des pays (pays_index.parquet, noms normalisés et alias)
+#   pour obtenir les id_pays ; noms non reconnus dans pays_non_reconnus.json
 # - Calcul des taux et pourcentages
 # - Structure : id_statistique, id_pays, annee, id_type_statistique, valeur, id_unite
 # 
 # CHARGEMENT :
 # - Fichier : table_statistique.csv
 # - Format : CSV (séparateur: ',', encodage: UTF-8)
+# - Format : Parquet typé (même nom, extension .parquet, schéma de backend/models.py)
 # =============================================================================
 
 import pandas as pd
@@ -27,6 +28,14 @@ import numpy as np
 import sys
 import logging
 from pathlib import Path
+from etl_countries import INDEX_FILE, attach_country_ids, read_country_index, write_unmatched_report
+from etl_dataset import write_parquet
+from etl_diff import diff_with_snapshot, write_changes_report
+from etl_loader import csv_output_enabled, database_url, load_dataframe
+from etl_metrics import stage
+from etl_sources import read_source
+from etl_stream import chunk_size, stream_table
+from etl_transform import build_rows, assign_ids
 
 # Configuration du logging
 logging.basicConfig(
@@ -51,7 +60,7 @@ def extract_data():
         
         # Vérification des fichiers sources
         files_to_check = {
-            'pays': Path('../DatasetClean/pays_clean.csv'),
+            'pays': INDEX_FILE,
             'population': Path('../SourceData/no_of_people_living_with_hiv_by_country_clean.csv'),
             'mortalite': Path('../SourceData/no_of_deaths_by_country_clean.csv'),
             'prevention': Path('../SourceData/prevention_of_mother_to_child_transmission_by_country_clean.csv')
@@ -63,24 +72,24 @@ def extract_data():
                 raise FileNotFoundError(f"Fichier {name} introuvable : {file_path}")
         
         # Lecture des données avec vérification
-        pays_df = pd.read_csv(files_to_check['pays'])
-        if pays_df.empty:
-            raise ValueError("Le fichier pays est vide")
+        pays_index = read_country_index()
+        if pays_index.empty:
+            raise ValueError("L'index des pays est vide")
             
-        population_df = pd.read_csv(files_to_check['population'])
+        population_df = read_source(files_to_check['population'])
         if population_df.empty:
             raise ValueError("Le fichier population est vide")
             
-        mortalite_df = pd.read_csv(files_to_check['mortalite'])
+        mortalite_df = read_source(files_to_check['mortalite'])
         if mortalite_df.empty:
             raise ValueError("Le fichier mortalité est vide")
             
-        prevention_df = pd.read_csv(files_to_check['prevention'])
+        prevention_df = read_source(files_to_check['prevention'])
         if prevention_df.empty:
             raise ValueError("Le fichier prévention est vide")
             
         logging.info("✅ Extraction réussie")
-        return pays_df, population_df, mortalite_df, prevention_df
+        return pays_index, population_df, mortalite_df, prevention_df
         
     except FileNotFoundError as e:
         logging.error(f"❌ Erreur d'accès fichier : {str(e)}")
@@ -93,11 +102,83 @@ def extract_data():
         return None, None, None, None
 
 # ---------------------- 🟡 TRANSFORMATION (Transform) ----------------------
-def transform_data(pays_df, population_df, mortalite_df, prevention_df):
+# Blocs de la table, dans l'ordre des identifiants (id_unite = 2 : pourcentage)
+STAT_BLOCKS = {
+    # 1 = taux de prévalence
+    'population': {
+        'file': '../SourceData/no_of_people_living_with_hiv_by_country_clean.csv',
+        'label': 'population',
+        'valeur': 'Count_median',
+        'annee': ('Year', 'int'),
+        'id_type_statistique': 1
+    },
+    # 2 = taux de mortalité
+    'mortalite': {
+        'file': '../SourceData/no_of_deaths_by_country_clean.csv',
+        'label': 'mortalité',
+        'valeur': 'Count_median',
+        'annee': ('Year', 'int'),
+        'id_type_statistique': 2
+    },
+    # 3 = taux de transmission mère-enfant, année de référence 2018
+    'prevention': {
+        'file': '../SourceData/prevention_of_mother_to_child_transmission_by_country_clean.csv',
+        'label': 'prévention',
+        'valeur': 'Percentage Recieved_median',
+        'annee': 2018,
+        'id_type_statistique': 3
+    }
+}
+
+def build_block(pays_index, source_df, block):
+    """
+    Transformation d'un bloc de lignes sources (fichier complet ou morceau)
+    Args:
+        pays_index (DataFrame): Index des pays (etl_countries)
+        source_df (DataFrame): Lignes du fichier source du bloc
+        block (str): Nom du bloc (clé de STAT_BLOCKS)
+    Returns:
+        tuple: (DataFrame sans identifiant, nombre de lignes en erreur)
+    """
+    spec = STAT_BLOCKS[block]
+
+    # 1. Nettoyage des colonnes
+    try:
+        source_df.columns = source_df.columns.str.strip()
+        required_columns = ['Country', spec['valeur']]
+        if isinstance(spec['annee'], tuple):
+            required_columns.append(spec['annee'][0])
+        if not all(col in source_df.columns for col in required_columns):
+            raise ValueError(f"Colonnes manquantes dans le fichier {spec['label']}")
+    except Exception as e:
+        raise ValueError(f"Erreur lors du nettoyage des colonnes : {str(e)}")
+
+    # 2. Correspondance avec l'index des pays (codes catégoriels, noms non reconnus comptés)
+    try:
+        merged_df = attach_country_ids(source_df, pays_index, 'statistique')
+    except Exception as e:
+        raise ValueError(f"Erreur lors de la correspondance des pays : {str(e)}")
+
+    # 3. Construction des lignes (vectorisée)
+    return build_rows(
+        merged_df,
+        required=[spec['valeur'], 'id_pays'],
+        columns={
+            'id_pays': ('id_pays', 'int'),
+            'annee': spec['annee'],
+            'valeur': (spec['valeur'], 'round'),
+            'id_unite': 2,
+            'id_type_statistique': spec['id_type_statistique']
+        },
+        table='statistique'
+    )
+
+
+def transform_data(pays_index, population_df, mortalite_df, prevention_df):
     """
     TRANSFORMATION : Nettoyage et structuration des données
     Args:
-        pays_df (DataFrame): DataFrame des pays
+        pays_index (DataFrame): Index des pays (etl_countries)
         population_df (DataFrame): DataFrame des données population
         mortalite_df (DataFrame): DataFrame des données mortalité
         prevention_df (DataFrame): DataFrame des données prévention
@@ -107,107 +188,18 @@ def transform_data(pays_df, population_df, mortalite_df, prevention_df):
     try:
         logging.info("🔄 Début de la transformation...")
         
-        # 1. Nettoyage des colonnes
-        try:
-            population_df.columns = population_df.columns.str.strip()
-            mortalite_df.columns = mortalite_df.columns.str.strip()
-            prevention_df.columns = prevention_df.columns.str.strip()
-            
-            # Vérification des colonnes requises
-            required_columns_pop = ['Country', 'Year', 'Count_median']
-            required_columns_mort = ['Country', 'Year', 'Count_median']
-            required_columns_prev = ['Country', 'Percentage Recieved_median']
-            
-            if not all(col in population_df.columns for col in required_columns_pop):
-                raise ValueError("Colonnes manquantes dans le fichier population")
-            if not all(col in mortalite_df.columns for col in required_columns_mort):
-                raise ValueError("Colonnes manquantes dans le fichier mortalité")
-            if not all(col in prevention_df.columns for col in required_columns_prev):
-                raise ValueError("Colonnes manquantes dans le fichier prévention")
-                
-        except Exception as e:
-            raise ValueError(f"Erreur lors du nettoyage des colonnes : {str(e)}")
-            
-        # 2. Standardisation des pays
-        try:
-            population_df['Country'] = population_df['Country'].str.strip().str.lower()
-            mortalite_df['Country'] = mortalite_df['Country'].str.strip().str.lower()
-            prevention_df['Country'] = prevention_df['Country'].str.strip().str.lower()
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la standardisation des pays : {str(e)}")
-            
-        # 3. Fusion avec la table pays
-        try:
-            population_df = pd.merge(population_df, pays_df, 
-                                   left_on='Country', 
-                                   right_on='pays', 
-                                   how='inner')
-            mortalite_df = pd.merge(mortalite_df, pays_df, 
-                                   left_on='Country', 
-                                   right_on='pays', 
-                                   how='inner')
-            prevention_df = pd.merge(prevention_df, pays_df, 
-                                   left_on='Country', 
-                                   right_on='pays', 
-                                   how='inner')
-            
-            if population_df.empty and mortalite_df.empty and prevention_df.empty:
-                raise ValueError("Aucune correspondance trouvée après la fusion")
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la fusion : {str(e)}")
-            
-        # 4. Construction du DataFrame final
-        statistique_data = []
-        error_count = 0
-        for _, row in population_df.iterrows():
-            try:
-                if pd.notna(row['Count_median']) and pd.notna(row['id_pays']):
-                    statistique_data.append({
-                        'id': len(statistique_data) + 1,
-                        'id_pays': int(row['id_pays']),
-                        'annee': int(row['Year']),
-                        'valeur': int(round(float(row['Count_median']))),
-                        'id_unite': 2,  # 2 = pourcentage
-                        'id_type_statistique': 1  # 1 = taux de prévalence
-                    })
-            except ValueError:
-                error_count += 1
-                continue  # Silencieusement ignorer les erreurs de conversion
-        
-        for _, row in mortalite_df.iterrows():
-            try:
-                if pd.notna(row['Count_median']) and pd.notna(row['id_pays']):
-                    statistique_data.append({
-                        'id': len(statistique_data) + 1,
-                        'id_pays': int(row['id_pays']),
-                        'annee': int(row['Year']),
-                        'valeur': int(round(float(row['Count_median']))),
-                        'id_unite': 2,  # 2 = pourcentage
-                        'id_type_statistique': 2  # 2 = taux de mortalité
-                    })
-            except ValueError:
-                error_count += 1
-                continue  # Silencieusement ignorer les erreurs de conversion
-        
-        for _, row in prevention_df.iterrows():
-            try:
-                if pd.notna(row['Percentage Recieved_median']) and pd.notna(row['id_pays']):
-                    statistique_data.append({
-                        'id': len(statistique_data) + 1,
-                        'id_pays': int(row['id_pays']),
-                        'annee': 2018,  # Année de référence
-                        'valeur': int(round(float(row['Percentage Recieved_median']))),
-                        'id_unite': 2,  # 2 = pourcentage
-                        'id_type_statistique': 3  # 3 = taux de transmission mère-enfant
-                    })
-            except ValueError:
-                error_count += 1
-                continue  # Silencieusement ignorer les erreurs de conversion
+        sources = {'population': population_df, 'mortalite': mortalite_df, 'prevention': prevention_df}
+        blocks, error_count = [], 0
+        for block in STAT_BLOCKS:
+            rows, errors = build_block(pays_index, sources[block], block)
+            blocks.append(rows)
+            error_count += errors
                 
         if error_count > 0:
             logging.warning(f"⚠️ {error_count} lignes ignorées pendant la transformation")
+        write_unmatched_report('statistique')
             
-        result_df = pd.DataFrame(statistique_data)
+        result_df = assign_ids(blocks, 'id')
         if result_df.empty:
             raise ValueError("Aucune donnée valide après transformation")
             
@@ -235,30 +227,48 @@ def load_data(df):
         
         output_file = Path('../DatasetClean/table_statistique.csv')
         
-        # 1. Préparation du dossier de sortie
-        try:
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
+        # 1. Comparaison avec la version précédente de DatasetClean
+        #    (identifiants conservés, lignes insérées / modifiées / supprimées)
+        df, changes = diff_with_snapshot('statistique', df)
+        
+        # 2. Chargement direct dans PostgreSQL (seules les différences sont appliquées)
+        #    avant d'écrire les fichiers : après un échec, le prochain diff repart
+        #    de la version encore présente dans les bases
+        if database_url():
+            copied = load_dataframe('statistique', df, changes=changes)
+            logging.info(f"✅ {copied} lignes chargées dans PostgreSQL")
+
+        if csv_output_enabled():
+            # 3. Préparation du dossier de sortie
+            try:
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
             
-        # 2. Sauvegarde des données
-        try:
-            df.to_csv(output_file, index=False)
-        except Exception as e:
-            raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
+            # 4. Sauvegarde des données
+            try:
+                df.to_csv(output_file, index=False)
+            except Exception as e:
+                raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
             
-        # 3. Vérification
-        if not output_file.exists():
-            raise FileNotFoundError("Le fichier n'a pas été créé")
+            # 5. Vérification
+            if not output_file.exists():
+                raise FileNotFoundError("Le fichier n'a pas été créé")
             
-        # 4. Validation des données sauvegardées
-        try:
-            verification_df = pd.read_csv(output_file)
-            if verification_df.empty or len(verification_df) != len(df):
-                raise ValueError("Les données sauvegardées sont incomplètes")
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la vérification : {str(e)}")
+            # 6. Validation des données sauvegardées
+            try:
+                verification_df = pd.read_csv(output_file)
+                if verification_df.empty or len(verification_df) != len(df):
+                    raise ValueError("Les données sauvegardées sont incomplètes")
+            except Exception as e:
+                raise ValueError(f"Erreur lors de la vérification : {str(e)}")
             
+
+        # 7. Sauvegarde Parquet typée (schéma dérivé de backend/models.py)
+        parquet_file = write_parquet('statistique', df)
+        logging.info(f"✅ Fichier Parquet écrit : {parquet_file.name}")
+
+        write_changes_report(changes)
         logging.info(f"✅ Chargement réussi - {len(df)} lignes sauvegardées")
         logging.info("\nTypes de statistiques inclus :")
         logging.info("1. Taux de prévalence du VIH")
@@ -273,6 +283,44 @@ def load_data(df):
         logging.error(f"❌ Erreur inattendue lors du chargement : {str(e)}")
         return False
 
+# ---------------------- 🟣 TRAITEMENT PAR MORCEAUX (Stream) ----------------------
+def stream_data(chunksize):
+    """
+    EXTRACTION, TRANSFORMATION et CHARGEMENT par morceaux (mémoire bornée)
+    Args:
+        chunksize (int): Nombre de lignes sources par morceau
+    Returns:
+        bool: True si succès, False sinon
+    """
+    try:
+        logging.info(f"🔄 Traitement par morceaux de {chunksize} lignes...")
+        
+        for block, spec in STAT_BLOCKS.items():
+            if not Path(spec['file']).exists():
+                raise FileNotFoundError(f"Fichier {block} introuvable : {spec['file']}")
+        pays_index = read_country_index()
+        
+        # Les blocs sont traités l'un après l'autre : un seul morceau en mémoire à la fois
+        rows, error_count = stream_table(
+            'statistique', 'id',
+            [(Path(spec['file']), lambda chunk, block=block: build_block(pays_index, chunk, block))
+             for block, spec in STAT_BLOCKS.items()],
+            chunksize
+        )
+        
+        if error_count > 0:
+            logging.warning(f"⚠️ {error_count} lignes ignorées pendant la transformation")
+        write_unmatched_report('statistique')
+        logging.info(f"✅ Chargement réussi - {rows} lignes sauvegardées")
+        return True
+        
+    except (IOError, FileNotFoundError, ValueError) as e:
+        logging.error(f"❌ Erreur du traitement par morceaux : {str(e)}")
+        return False
+    except Exception as e:
+        logging.error(f"❌ Erreur inattendue du traitement par morceaux : {str(e)}")
+        return False
+
 # ---------------------- 🚀 EXECUTION ----------------------
 def main():
     """
@@ -281,19 +329,36 @@ def main():
     try:
         logging.info("🚀 Début du processus ETL pour statistique")
         
+        # Mode flux (ETL_CHUNK_SIZE) : mémoire bornée quelle que soit la taille des sources
+        chunksize = chunk_size()
+        if chunksize:
+            with stage("statistique", "stream"):
+                if not stream_data(chunksize):
+                    raise Exception("Échec du traitement par morceaux")
+            logging.info("✅ Processus ETL terminé avec succès")
+            return
+            
         # EXTRACTION
-        pays_df, population_df, mortalite_df, prevention_df = extract_data()
-        if pays_df is None or population_df is None or mortalite_df is None or prevention_df is None:
-            raise Exception("Échec de l'extraction des données")
+        with stage("statistique", "extract") as metrics:
+            pays_index, population_df, mortalite_df, prevention_df = extract_data()
+            if pays_index is None or population_df is None or mortalite_df is None or prevention_df is None:
+                raise Exception("Échec de l'extraction des données")
+            metrics.rows_out = len(population_df) + len(mortalite_df) + len(prevention_df)
             
         # TRANSFORMATION
-        transformed_df = transform_data(pays_df, population_df, mortalite_df, prevention_df)
-        if transformed_df is None:
-            raise Exception("Échec de la transformation des données")
+        with stage("statistique", "transform") as metrics:
+            metrics.rows_in = len(population_df) + len(mortalite_df) + len(prevention_df)
+            transformed_df = transform_data(pays_index, population_df, mortalite_df, prevention_df)
+            if transformed_df is None:
+                raise Exception("Échec de la transformation des données")
+            metrics.rows_out = len(transformed_df)
             
         # CHARGEMENT
-        if not load_data(transformed_df):
-            raise Exception("Échec du chargement des données")
+        with stage("statistique", "load") as metrics:
+            metrics.rows_in = len(transformed_df)
+            if not load_data(transformed_df):
+                raise Exception("Échec du chargement des données")
+            metrics.rows_out = len(transformed_df)
             
         logging.info("✅ Processus ETL terminé avec succès")
         
@@ -11,14 +11,15 @@
 # - Période : 2018
 # 
 # TRANSFORMATION :
-# - Standardisation des noms de pays (minuscules, sans espaces)
-# - Liaison avec la table pays pour obtenir les id_pays
+# - Liaison avec l'index des pays (pays_index.parquet, noms normalisés et alias)
+#   pour obtenir les id_pays ; noms non reconnus dans pays_non_reconnus.json
 # - Conversion des valeurs en pourcentages
 # - Structure : id_traitement, id_pays, id_type_traitement, couverture
 # 
 # CHARGEMENT :
 # - Fichier : table_traitement.csv
 # - Format : CSV (séparateur: ',', encodage: UTF-8)
+# - Format : Parquet typé (même nom, extension .parquet, schéma de backend/models.py)
 # =============================================================================
 
 import pandas as pd
@@ -26,6 +27,14 @@ import numpy as np
 import sys
 import logging
 from pathlib import Path
+from etl_countries import INDEX_FILE, attach_country_ids, read_country_index, write_unmatched_report
+from etl_dataset import write_parquet
+from etl_diff import diff_with_snapshot, write_changes_report
+from etl_loader import csv_output_enabled, database_url, load_dataframe
+from etl_metrics import stage
+from etl_sources import read_source
+from etl_stream import chunk_size, stream_table
+from etl_transform import build_rows, assign_ids
 
 # Configuration du logging
 logging.basicConfig(
@@ -49,7 +58,7 @@ def extract_data():
         
         # Vérification des fichiers sources
         files_to_check = {
-            'pays': Path('../DatasetClean/pays_clean.csv'),
+            'pays': INDEX_FILE,
             'art_coverage': Path('../SourceData/art_coverage_by_country_clean.csv'),
             'art_pediatric': Path('../SourceData/art_pediatric_coverage_by_country_clean.csv')
         }
@@ -60,20 +69,20 @@ def extract_data():
                 raise FileNotFoundError(f"Fichier {name} introuvable : {file_path}")
         
         # Lecture des données avec vérification
-        pays_df = pd.read_csv(files_to_check['pays'])
-        if pays_df.empty:
-            raise ValueError("Le fichier pays est vide")
+        pays_index = read_country_index()
+        if pays_index.empty:
+            raise ValueError("L'index des pays est vide")
             
-        art_coverage_df = pd.read_csv(files_to_check['art_coverage'])
+        art_coverage_df = read_source(files_to_check['art_coverage'])
         if art_coverage_df.empty:
             raise ValueError("Le fichier art_coverage est vide")
             
-        art_pediatric_df = pd.read_csv(files_to_check['art_pediatric'])
+        art_pediatric_df = read_source(files_to_check['art_pediatric'])
         if art_pediatric_df.empty:
             raise ValueError("Le fichier art_pediatric est vide")
             
         logging.info("✅ Extraction réussie")
-        return pays_df, art_coverage_df, art_pediatric_df
+        return pays_index, art_coverage_df, art_pediatric_df
         
     except FileNotFoundError as e:
         logging.error(f"❌ Erreur d'accès fichier : {str(e)}")
@@ -86,11 +95,68 @@ def extract_data():
         return None, None, None
 
 # ---------------------- 🟡 TRANSFORMATION (Transform) ----------------------
-def transform_data(pays_df, art_coverage_df, art_pediatric_df):
+# Blocs de la table, dans l'ordre des identifiants
+TRAITEMENT_BLOCKS = {
+    # Traitement des adultes (type_traitement = 1)
+    'art_coverage': {
+        'file': '../SourceData/art_coverage_by_country_clean.csv',
+        'couverture': 'Estimated ART coverage among people living with HIV (%)_median',
+        'id_type_traitement': 1
+    },
+    # Traitement des enfants (type_traitement = 2)
+    'art_pediatric': {
+        'file': '../SourceData/art_pediatric_coverage_by_country_clean.csv',
+        'couverture': 'Estimated ART coverage among children (%)_median',
+        'id_type_traitement': 2
+    }
+}
+
+def build_block(pays_index, source_df, block):
+    """
+    Transformation d'un bloc de lignes sources (fichier complet ou morceau)
+    Args:
+        pays_index (DataFrame): Index des pays (etl_countries)
+        source_df (DataFrame): Lignes du fichier source du bloc
+        block (str): Nom du bloc (clé de TRAITEMENT_BLOCKS)
+    Returns:
+        tuple: (DataFrame sans identifiant, nombre de lignes en erreur)
+    """
+    spec = TRAITEMENT_BLOCKS[block]
+    coverage_col = spec['couverture']
+
+    # 1. Nettoyage des colonnes
+    try:
+        source_df.columns = source_df.columns.str.strip()
+        if not all(col in source_df.columns for col in ['Country', coverage_col]):
+            raise ValueError(f"Colonnes manquantes dans le fichier {block}")
+    except Exception as e:
+        raise ValueError(f"Erreur lors du nettoyage des colonnes : {str(e)}")
+
+    # 2. Correspondance avec l'index des pays (codes catégoriels, noms non reconnus comptés)
+    try:
+        merged_df = attach_country_ids(source_df, pays_index, 'traitement')
+    except Exception as e:
+        raise ValueError(f"Erreur lors de la correspondance des pays : {str(e)}")
+
+    # 3. Construction des lignes (vectorisée)
+    merged_df[coverage_col] = pd.to_numeric(merged_df[coverage_col], errors='coerce')
+    return build_rows(
+        merged_df,
+        required=[coverage_col, 'id_pays'],
+        columns={
+            'id_pays': ('id_pays', 'int'),
+            'id_type_traitement': spec['id_type_traitement'],
+            'couverture': (coverage_col, 'round')
+        },
+        table='traitement'
+    )
+
+
+def transform_data(pays_index, art_coverage_df, art_pediatric_df):
     """
     TRANSFORMATION : Nettoyage et structuration des données
     Args:
-        pays_df (DataFrame): DataFrame des pays
+        pays_index (DataFrame): Index des pays (etl_countries)
         art_coverage_df (DataFrame): DataFrame des données de couverture adultes
         art_pediatric_df (DataFrame): DataFrame des données de couverture enfants
     Returns:
@@ -99,91 +165,15 @@ def transform_data(pays_df, art_coverage_df, art_pediatric_df):
     try:
         logging.info("🔄 Début de la transformation...")
         
-        # 1. Nettoyage des colonnes
-        try:
-            art_coverage_df.columns = art_coverage_df.columns.str.strip()
-            art_pediatric_df.columns = art_pediatric_df.columns.str.strip()
-            
-            # Vérification des colonnes requises
-            required_columns_adult = ['Country', 'Estimated ART coverage among people living with HIV (%)_median']
-            required_columns_pediatric = ['Country', 'Estimated ART coverage among children (%)_median']
-            
-            if not all(col in art_coverage_df.columns for col in required_columns_adult):
-                raise ValueError("Colonnes manquantes dans le fichier art_coverage")
-            if not all(col in art_pediatric_df.columns for col in required_columns_pediatric):
-                raise ValueError("Colonnes manquantes dans le fichier art_pediatric")
-                
-        except Exception as e:
-            raise ValueError(f"Erreur lors du nettoyage des colonnes : {str(e)}")
-            
-        # 2. Standardisation des pays
-        try:
-            art_coverage_df['Country'] = art_coverage_df['Country'].str.strip().str.lower()
-            art_pediatric_df['Country'] = art_pediatric_df['Country'].str.strip().str.lower()
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la standardisation des pays : {str(e)}")
-            
-        # 3. Fusion avec la table pays
-        try:
-            art_coverage_df = pd.merge(art_coverage_df, pays_df, 
-                                     left_on='Country', 
-                                     right_on='pays', 
-                                     how='inner')
-            art_pediatric_df = pd.merge(art_pediatric_df, pays_df, 
-                                      left_on='Country', 
-                                      right_on='pays', 
-                                      how='inner')
-            
-            if art_coverage_df.empty and art_pediatric_df.empty:
-                raise ValueError("Aucune correspondance trouvée après la fusion")
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la fusion : {str(e)}")
-            
-        # 4. Construction du DataFrame final
-        traitement_data = []
-        id_traitement = 1
-        error_count = 0
-        
-        # Traitement des données pour les adultes (type_traitement = 1)
-        for _, row in art_coverage_df.iterrows():
-            try:
-                coverage = pd.to_numeric(row['Estimated ART coverage among people living with HIV (%)_median'], 
-                                      errors='coerce')
-                if pd.notna(coverage) and pd.notna(row['id_pays']):
-                    traitement_data.append({
-                        'id_traitement': id_traitement,
-                        'id_pays': int(row['id_pays']),
-                        'id_type_traitement': 1,
-                        'couverture': int(round(coverage))
-                    })
-                    id_traitement += 1
-            except ValueError as e:
-                error_count += 1
-                logging.warning(f"⚠️ Ligne adulte ignorée - Pays: {row['Country']}")
-                continue
-        
-        # Traitement des données pour les enfants (type_traitement = 2)
-        for _, row in art_pediatric_df.iterrows():
-            try:
-                coverage = pd.to_numeric(row['Estimated ART coverage among children (%)_median'], 
-                                      errors='coerce')
-                if pd.notna(coverage) and pd.notna(row['id_pays']):
-                    traitement_data.append({
-                        'id_traitement': id_traitement,
-                        'id_pays': int(row['id_pays']),
-                        'id_type_traitement': 2,
-                        'couverture': int(round(coverage))
-                    })
-                    id_traitement += 1
-            except ValueError as e:
-                error_count += 1
-                logging.warning(f"⚠️ Ligne enfant ignorée - Pays: {row['Country']}")
-                continue
+        adulte_df, adulte_errors = build_block(pays_index, art_coverage_df, 'art_coverage')
+        enfant_df, enfant_errors = build_block(pays_index, art_pediatric_df, 'art_pediatric')
+        error_count = adulte_errors + enfant_errors
                 
         if error_count > 0:
             logging.warning(f"⚠️ {error_count} lignes ignorées pendant la transformation")
+        write_unmatched_report('traitement')
             
-        result_df = pd.DataFrame(traitement_data)
+        result_df = assign_ids([adulte_df, enfant_df], 'id_traitement')
         if result_df.empty:
             raise ValueError("Aucune donnée valide après transformation")
             
@@ -211,30 +201,48 @@ def load_data(df):
         
         output_file = Path('../DatasetClean/table_traitement.csv')
         
-        # 1. Préparation du dossier de sortie
-        try:
-            output_file.parent.mkdir(parents=True, exist_ok=True)
-        except Exception as e:
-            raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
+        # 1. Comparaison avec la version précédente de DatasetClean
+        #    (identifiants conservés, lignes insérées / modifiées / supprimées)
+        df, changes = diff_with_snapshot('traitement', df)
+        
+        # 2. Chargement direct dans PostgreSQL (seules les différences sont appliquées)
+        #    avant d'écrire les fichiers : après un échec, le prochain diff repart
+        #    de la version encore présente dans les bases
+        if database_url():
+            copied = load_dataframe('traitement', df, changes=changes)
+            logging.info(f"✅ {copied} lignes chargées dans PostgreSQL")
+
+        if csv_output_enabled():
+            # 3. Préparation du dossier de sortie
+            try:
+                output_file.parent.mkdir(parents=True, exist_ok=True)
+            except Exception as e:
+                raise IOError(f"Impossible de créer le dossier de sortie : {str(e)}")
             
-        # 2. Sauvegarde des données
-        try:
-            df.to_csv(output_file, index=False)
-        except Exception as e:
-            raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
+            # 4. Sauvegarde des données
+            try:
+                df.to_csv(output_file, index=False)
+            except Exception as e:
+                raise IOError(f"Erreur lors de la sauvegarde : {str(e)}")
             
-        # 3. Vérification
-        if not output_file.exists():
-            raise FileNotFoundError("Le fichier n'a pas été créé")
+            # 5. Vérification
+            if not output_file.exists():
+                raise FileNotFoundError("Le fichier n'a pas été créé")
             
-        # 4. Validation des données sauvegardées
-        try:
-            verification_df = pd.read_csv(output_file)
-            if verification_df.empty or len(verification_df) != len(df):
-                raise ValueError("Les données sauvegardées sont incomplètes")
-        except Exception as e:
-            raise ValueError(f"Erreur lors de la vérification : {str(e)}")
+            # 6. Validation des données sauvegardées
+            try:
+                verification_df = pd.read_csv(output_file)
+                if verification_df.empty or len(verification_df) != len(df):
+                    raise ValueError("Les données sauvegardées sont incomplètes")
+            except Exception as e:
+                raise ValueError(f"Erreur lors de la vérification : {str(e)}")
             
+
+        # 7. Sauvegarde Parquet typée (schéma dérivé de backend/models.py)
+        parquet_file = write_parquet('traitement', df)
+        logging.info(f"✅ Fichier Parquet écrit : {parquet_file.name}")
+
+        write_changes_report(changes)
         logging.info(f"✅ Chargement réussi - {len(df)} lignes sauvegardées")
         return True
         
@@ -245,6 +253,43 @@ def load_data(df):
         logging.error(f"❌ Erreur inattendue lors du chargement : {str(e)}")
         return False
 
+# ---------------------- 🟣 TRAITEMENT PAR MORCEAUX (Stream) ----------------------
+def stream_data(chunksize):
+    """
+    EXTRACTION, TRANSFORMATION et CHARGEMENT par morceaux (mémoire bornée)
+    Args:
+        chunksize (int): Nombre de lignes sources par morceau
+    Returns:
+        bool: True si succès, False sinon
+    """
+    try:
+        logging.info(f"🔄 Traitement par morceaux de {chunksize} lignes...")
+        
+        for block, spec in TRAITEMENT_BLOCKS.items():
+            if not Path(spec['file']).exists():
+                raise FileNotFoundError(f"Fichier {block} introuvable : {spec['file']}")
+        pays_index = read_country_index()
+        
+        rows, error_count = stream_table(
+            'traitement', 'id_traitement',
+            [(Path(spec['file']), lambda chunk, block=block: build_block(pays_index, chunk, block))
+             for block, spec in TRAITEMENT_BLOCKS.items()],
+            chunksize
+        )
+        
+        if error_count > 0:
+            logging.warning(f"⚠️ {error_count} lignes ignorées pendant la transformation")
+        write_unmatched_report('traitement')
+        logging.info(f"✅ Chargement réussi - {rows} lignes sauvegardées")
+        return True
+        
+    except (IOError, FileNotFoundError, ValueError) as e:
+        logging.error(f"❌ Erreur du traitement par morceaux : {str(e)}")
+        return False
+    except Exception as e:
+        logging.error(f"❌ Erreur inattendue du traitement par morceaux : {str(e)}")
+        return False
+
 # ---------------------- 🚀 EXECUTION ----------------------
 def main():
     """
@@ -253,19 +298,36 @@ def main():
     try:
         logging.info("🚀 Début du processus ETL pour traitement")
         
+        # Mode flux (ETL_CHUNK_SIZE) : mémoire bornée quelle que soit la taille des sources
+        chunksize = chunk_size()
+        if chunksize:
+            with stage("traitement", "stream"):
+                if not stream_data(chunksize):
+                    raise Exception("Échec du traitement par morceaux")
+            logging.info("✅ Processus ETL terminé avec succès")
+            return
+            
         # EXTRACTION
-        pays_df, art_coverage_df, art_pediatric_df = extract_data()
-        if pays_df is None or art_coverage_df is None or art_pediatric_df is None:
-            raise Exception("Échec de l'extraction des données")
+        with stage("traitement", "extract") as metrics:
+            pays_index, art_coverage_df, art_pediatric_df = extract_data()
+            if pays_index is None or art_coverage_df is None or art_pediatric_df is None:
+                raise Exception("Échec de l'extraction des données")
+            metrics.rows_out = len(art_coverage_df) + len(art_pediatric_df)
             
         # TRANSFORMATION
-        transformed_df = transform_data(pays_df, art_coverage_df, art_pediatric_df)
-        if transformed_df is None:
-            raise Exception("Échec de la transformation des données")
+        with stage("traitement", "transform") as metrics:
+            metrics.rows_in = len(art_coverage_df) + len(art_pediatric_df)
+            transformed_df = transform_data(pays_index, art_coverage_df, art_pediatric_df)
+            if transformed_df is None:
+                raise Exception("Échec de la transformation des données")
+            metrics.rows_out = len(transformed_df)
             
         # CHARGEMENT
-        if not load_data(transformed_df):
-            raise Exception("Échec du chargement des données")
+        with stage("traitement", "load") as metrics:
+            metrics.rows_in = len(transformed_df)
+            if not load_data(transformed_df):
+                raise Exception("Échec du chargement des données")
+            metrics.rows_out = len(transformed_df)
             
         logging.info("✅ Processus ETL terminé avec succès")
         
@@ -0,0 +1,175 @@
+# =============================================================================
+# Script : etl_transform.py
+# Description :
+# Bibliothèque partagée de transformation vectorisée pour les tables de faits.
+#
+# Remplace les boucles `for _, row in df.iterrows()` des scripts ETL par des
+# opérations colonne par colonne (pandas / NumPy), avec le même résultat :
+# - Lignes ignorées silencieusement si une colonne obligatoire est vide
+# - Arrondi identique à int(round(float(x))) (arrondi au pair le plus proche)
+# - Lignes dont une conversion échoue comptées comme erreurs et écartées
+# - Lignes hors des contraintes de backend/schemas.py (annee 1900–2100,
+#   valeur > 0 ou 0–100...) comptées comme erreurs et écartées (masques vectorisés)
+# - Identifiants séquentiels 1..n dans l'ordre des lignes conservées
+# - Analyse des chaînes "médiane[min–max]" des sources (ex. "7200[4100–11000]")
+#   pour compléter les colonnes _median/_min/_max vides
+# =============================================================================
+
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from etl_dataset import validate_table
+
+# Séparateurs des bornes rencontrés dans les sources : tiret, demi-cadratin, cadratin,
+# tiret numérique et signe moins
+RANGE_DASHES = '-\u2013\u2014\u2012\u2212'
+
+# Nombre avec séparateur de milliers éventuel ("1 200") et décimales
+_NUMBER = r'\d[\d ]*(?:\.\d+)?'
+
+# "médiane", "médiane[min–max]" ; tout le reste ("na", "Nodata", "No data", vide) -> NaN
+RANGE_PATTERN = (
+    rf'^\s*(?P<median>{_NUMBER})\s*'
+    rf'(?:\[\s*(?P<min>{_NUMBER})\s*[{RANGE_DASHES}]\s*(?P<max>{_NUMBER})\s*\])?\s*$'
+)
+
+RANGE_PARTS = ('median', 'min', 'max')
+
+
+def round_column(df, column):
+    """
+    Équivalent vectorisé de int(round(float(valeur)))
+    Args:
+        df (DataFrame): Données sources
+        column (str): Colonne à convertir
+    Returns:
+        tuple: (valeurs float arrondies, masque des valeurs convertibles)
+    """
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+    valid = np.isfinite(values)
+    return np.rint(np.where(valid, values, 0.0)), valid
+
+
+def int_column(df, column):
+    """
+    Équivalent vectorisé de int(valeur) (troncature)
+    Args:
+        df (DataFrame): Données sources
+        column (str): Colonne à convertir
+    Returns:
+        tuple: (valeurs float tronquées, masque des valeurs convertibles)
+    """
+    values = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+    valid = np.isfinite(values)
+    return np.trunc(np.where(valid, values, 0.0)), valid
+
+
+def build_rows(df, required, columns, defaults=None, table=None):
+    """
+    Construction vectorisée des lignes d'une table de faits
+    Args:
+        df (DataFrame): Données fusionnées avec la table pays
+        required (list): Colonnes qui doivent être renseignées (sinon ligne ignorée sans erreur)
+        columns (dict): Colonne de sortie -> (colonne source, "round" ou "int") ou constante
+        defaults (dict): Colonne de sortie -> valeur utilisée si la source est vide
+        table (str): Nom de la table (clé de TABLE_MAPPINGS) : lignes hors des contraintes
+            de son schéma pydantic écartées et comptées comme erreurs
+    Returns:
+        tuple: (DataFrame sans identifiant, nombre de lignes en erreur)
+    """
+    defaults = defaults or {}
+    keep = np.ones(len(df), dtype=bool)
+    for column in required:
+        keep &= df[column].notna().to_numpy()
+
+    converters = {"round": round_column, "int": int_column}
+    data = {}
+    valid = np.ones(len(df), dtype=bool)
+    for name, spec in columns.items():
+        if not isinstance(spec, tuple):
+            data[name] = np.full(len(df), spec, dtype=np.int64)
+            continue
+        source, mode = spec
+        values, ok = converters[mode](df, source)
+        if name in defaults:
+            # Valeur de repli au lieu d'une erreur (ex. pourcentage absent -> 0)
+            values = np.where(ok, values, defaults[name])
+            ok = np.ones(len(df), dtype=bool)
+        data[name] = values
+        valid &= ok
+
+    error_count = int((keep & ~valid).sum())
+    keep &= valid
+    result = pd.DataFrame({name: values[keep].astype(np.int64) for name, values in data.items()})
+
+    if table is not None and len(result):
+        checked = validate_table(table, result)
+        if not checked.ok:
+            logging.warning(f"⚠️ {table} : {checked.invalid_count} lignes hors contraintes ({checked.summary()})")
+            error_count += checked.invalid_count
+            result = result[checked.valid].reset_index(drop=True)
+    return result, error_count
+
+
+def assign_ids(blocks, id_column):
+    """
+    Concaténation de blocs de lignes et attribution des identifiants séquentiels
+    Args:
+        blocks (list): DataFrames produits par build_rows, dans l'ordre final
+        id_column (str): Nom de la colonne identifiant
+    Returns:
+        DataFrame: Lignes concaténées avec l'identifiant en première colonne
+    """
+    result = pd.concat(blocks, ignore_index=True) if blocks else pd.DataFrame()
+    result.insert(0, id_column, np.arange(1, len(result) + 1, dtype=np.int64))
+    return result
+
+
+def parse_range_column(values):
+    """
+    Analyse vectorisée (expression régulière Arrow sur toute la colonne) des chaînes "médiane[min–max]"
+    Args:
+        values (Series): Colonne texte de la source
+    Returns:
+        DataFrame: Colonnes median, min, max (float, NaN si absentes ou sans donnée)
+    """
+    array = pa.array(values.astype(object), type=pa.string(), from_pandas=True)
+    parts = pc.extract_regex(array, RANGE_PATTERN)
+    result = {}
+    for part in RANGE_PARTS:
+        text = pc.replace_substring(pc.struct_field(parts, part), ' ', '')
+        # Groupe optionnel absent ("7200" sans bornes) : chaîne vide -> NULL
+        text = pc.if_else(pc.equal(text, ''), pa.scalar(None, pa.string()), text)
+        result[part] = pc.cast(text, pa.float64()).to_numpy(zero_copy_only=False)
+    return pd.DataFrame(result, index=values.index)
+
+
+def fill_from_ranges(df, range_columns):
+    """
+    Complète les colonnes <colonne>_median/_min/_max vides à partir de la chaîne "médiane[min–max]"
+    (les lignes dont seule la valeur détaillée manque ne sont plus écartées)
+    Args:
+        df (DataFrame): Données sources, noms de colonnes sans espaces (modifié en place)
+        range_columns (list): Colonnes texte à analyser (ex. ['Count'])
+    Returns:
+        int: Nombre de valeurs complétées
+    """
+    recovered = 0
+    for column in range_columns:
+        if column not in df.columns:
+            continue
+        parsed = parse_range_column(df[column])
+        for part in RANGE_PARTS:
+            target = f"{column}_{part}"
+            if target not in df.columns:
+                continue
+            current = pd.to_numeric(df[target], errors='coerce')
+            missing = current.isna() & parsed[part].notna()
+            if missing.any():
+                df[target] = current.where(~missing, parsed[part])
+                recovered += int(missing.sum())
+    return recovered
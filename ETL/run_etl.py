@@ -0,0 +1,305 @@
+# =============================================================================
+# Script : run_etl.py
+# Description :
+# Orchestrateur ETL en un seul processus Python.
+#
+# - Les scripts etl_table_* sont déclarés comme tâches avec leurs dépendances :
+#   1. Tables de référence (unite, type_statistique, type_traitement) et pays
+#   2. Tables principales, dès que pays et leurs tables de référence sont prêtes
+# - pandas n'est importé qu'une fois et chaque fichier source n'est analysé
+#   qu'une fois (cache partagé de etl_sources.py).
+# - Les tâches indépendantes s'exécutent en parallèle (threads).
+# - Exécution incrémentale : une tâche dont les entrées, le script et les
+#   sorties sont inchangés depuis la dernière exécution est ignorée, sauf si
+#   les bases cibles (ETL_DATABASE_URL) ont changé
+#   (manifeste DatasetClean/etl_manifest.json, voir etl_manifest.py).
+# - Chaque script reste exécutable seul via son propre main().
+#
+# Utilisation :
+#   python run_etl.py                 # tout le pipeline
+#   python run_etl.py --workers 1     # exécution séquentielle
+#   python run_etl.py mortalite       # une table et ses dépendances
+#   python run_etl.py --force         # reconstruit tout, même les tables à jour
+#   python run_etl.py --chunk-size 100000   # sources lues par morceaux (mémoire bornée)
+#
+# Chaque exécution produit un rapport JSON (ETL/reports/etl_run_*.json) :
+# durée, temps CPU, lignes en entrée / sortie / rejetées et pic mémoire
+# par étape, comparé au rapport précédent (voir etl_metrics.py).
+# =============================================================================
+
+import argparse
+import importlib
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from pathlib import Path
+
+from etl_loader import database_urls
+from etl_manifest import is_up_to_date, load_manifest, make_entry, save_manifest, task_state
+from etl_metrics import (collected_stages, compare_reports, list_reports, load_report, log_findings,
+                         peak_rss_mb, write_report)
+
+ETL_DIR = Path(__file__).resolve().parent
+
+SOURCE = '../SourceData/'
+CLEAN = '../DatasetClean/'
+
+# Tâche -> module, dépendances, fichiers lus et fichiers produits
+TASKS = {
+    "unite": {
+        "module": "etl_table_unite", "deps": [],
+        "inputs": [], "outputs": [CLEAN + "unite_clean.csv", CLEAN + "unite_clean.parquet"],
+    },
+    "type_statistique": {
+        "module": "etl_table_type_statistique", "deps": [],
+        "inputs": [], "outputs": [CLEAN + "type_statistique_clean.csv", CLEAN + "type_statistique_clean.parquet"],
+    },
+    "type_traitement": {
+        "module": "etl_table_type_traitement", "deps": [],
+        "inputs": [], "outputs": [CLEAN + "type_traitement_clean.csv", CLEAN + "type_traitement_clean.parquet"],
+    },
+    "pays": {
+        "module": "etl_table_pays", "deps": [],
+        "inputs": [
+            SOURCE + "art_coverage_by_country_clean.csv",
+            SOURCE + "art_pediatric_coverage_by_country_clean.csv",
+            SOURCE + "no_of_cases_adults_15_to_49_by_country_clean.csv",
+            SOURCE + "no_of_deaths_by_country_clean.csv",
+            SOURCE + "no_of_people_living_with_hiv_by_country_clean.csv",
+            SOURCE + "prevention_of_mother_to_child_transmission_by_country_clean.csv",
+        ],
+        "outputs": [CLEAN + "pays_clean.csv", CLEAN + "pays_clean.parquet", CLEAN + "pays_index.parquet"],
+    },
+    "population_hiv": {
+        "module": "etl_table_population_hiv", "deps": ["pays"],
+        "inputs": [CLEAN + "pays_index.parquet", SOURCE + "no_of_people_living_with_hiv_by_country_clean.csv"],
+        "outputs": [CLEAN + "table_population_hiv.csv", CLEAN + "table_population_hiv.parquet"],
+    },
+    "mortalite": {
+        "module": "etl_table_mortalite", "deps": ["pays"],
+        "inputs": [CLEAN + "pays_index.parquet", SOURCE + "no_of_deaths_by_country_clean.csv"],
+        "outputs": [CLEAN + "table_mortalite.csv", CLEAN + "table_mortalite.parquet"],
+    },
+    "transmission_mere_enfant": {
+        "module": "etl_table_transmission_mere_enfant", "deps": ["pays", "unite"],
+        "inputs": [CLEAN + "pays_index.parquet", SOURCE + "prevention_of_mother_to_child_transmission_by_country_clean.csv"],
+        "outputs": [CLEAN + "table_transmission_mere_enfant.csv", CLEAN + "table_transmission_mere_enfant.parquet"],
+    },
+    "traitement": {
+        "module": "etl_table_traitement", "deps": ["pays", "type_traitement"],
+        "inputs": [
+            CLEAN + "pays_index.parquet",
+            SOURCE + "art_coverage_by_country_clean.csv",
+            SOURCE + "art_pediatric_coverage_by_country_clean.csv",
+        ],
+        "outputs": [CLEAN + "table_traitement.csv", CLEAN + "table_traitement.parquet"],
+    },
+    "statistique": {
+        "module": "etl_table_statistique", "deps": ["pays", "unite", "type_statistique"],
+        "inputs": [
+            CLEAN + "pays_index.parquet",
+            SOURCE + "no_of_people_living_with_hiv_by_country_clean.csv",
+            SOURCE + "no_of_deaths_by_country_clean.csv",
+            SOURCE + "prevention_of_mother_to_child_transmission_by_country_clean.csv",
+        ],
+        "outputs": [CLEAN + "table_statistique.csv", CLEAN + "table_statistique.parquet"],
+    },
+}
+
+
+def resolve_tasks(targets=None):
+    """
+    Sélection des tâches à exécuter (cibles demandées et toutes leurs dépendances)
+    Args:
+        targets (list): Noms des tâches demandées, None pour toutes
+    Returns:
+        list: Noms des tâches, dans l'ordre de déclaration
+    """
+    if not targets:
+        return list(TASKS)
+
+    selected = set()
+    stack = list(targets)
+    while stack:
+        name = stack.pop()
+        if name not in TASKS:
+            raise ValueError(f"Tâche inconnue : {name}")
+        if name not in selected:
+            selected.add(name)
+            stack.extend(TASKS[name]["deps"])
+    return [name for name in TASKS if name in selected]
+
+
+def run_task(name, manifest, force=False):
+    """
+    Exécution du main() d'un script ETL, sauf si ses entrées n'ont pas changé
+    Args:
+        name (str): Nom de la tâche
+        manifest (dict): Manifeste de la dernière exécution
+        force (bool): Reconstruit même si la tâche est à jour
+    Returns:
+        tuple: (nom, statut, durée en secondes, entrée du manifeste ou None)
+    """
+    start = time.perf_counter()
+    task = TASKS[name]
+    state = task_state(task["module"] + ".py", task["inputs"], database_urls())
+    if not force and is_up_to_date(manifest.get(name), state, task["outputs"]):
+        return name, "à jour", time.perf_counter() - start, manifest[name]
+
+    module = importlib.import_module(task["module"])
+    try:
+        module.main()
+        success = True
+    except SystemExit as e:
+        # Les scripts signalent un échec par sys.exit(1)
+        success = not e.code
+    except Exception as e:
+        logging.error(f"❌ Erreur inattendue dans {name} : {str(e)}")
+        success = False
+
+    entry = make_entry(state, task["outputs"]) if success else None
+    return name, "ok" if success else "erreur", time.perf_counter() - start, entry
+
+
+def run_pipeline(targets=None, workers=None, force=False):
+    """
+    Exécution du graphe de tâches : chaque tâche démarre dès que ses dépendances ont réussi
+    Args:
+        targets (list): Tâches demandées, None pour tout le pipeline
+        workers (int): Nombre de tâches simultanées
+        force (bool): Reconstruit toutes les tâches, même à jour
+    Returns:
+        tuple: (statut de chaque tâche ("ok", "à jour", "erreur" ou "ignorée"), durée de chaque tâche exécutée)
+    """
+    names = resolve_tasks(targets)
+    manifest = load_manifest()
+    status = {}
+    durations = {}
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=workers or min(len(names), os.cpu_count() or 1)) as executor:
+        while len(status) < len(names):
+            for name in names:
+                if name in status or name in running.values():
+                    continue
+                deps = TASKS[name]["deps"]
+                if any(status.get(dep) in ("erreur", "ignorée") for dep in deps):
+                    status[name] = "ignorée"
+                    logging.warning(f"⚠️ {name} ignorée : une dépendance a échoué")
+                elif all(status.get(dep) in ("ok", "à jour") for dep in deps):
+                    logging.info(f"⏳ Exécution de {name}...")
+                    running[executor.submit(run_task, name, manifest, force)] = name
+
+            if not running:
+                continue
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                name, state, elapsed, entry = future.result()
+                status[name] = state
+                durations[name] = round(elapsed, 4)
+                if state == "à jour":
+                    logging.info(f"⏭️ {name} à jour, étape ignorée")
+                elif state == "ok":
+                    logging.info(f"✅ {name} terminé avec succès ({elapsed:.2f}s)")
+                else:
+                    logging.error(f"❌ Erreur lors de l'exécution de {name}")
+
+                if entry is not None:
+                    manifest[name] = entry
+                else:
+                    manifest.pop(name, None)
+                save_manifest(manifest)
+
+    return status, durations
+
+
+def write_run_report(args, status, durations, started_at, wall_s, cpu_s):
+    """
+    Rapport JSON de l'exécution, comparé au rapport précédent de même mode
+    Les régressions sont signalées dans le journal sans faire échouer l'exécution.
+    Returns:
+        Path: Rapport écrit
+    """
+    previous = list_reports()
+    report = {
+        "started_at": started_at.isoformat(timespec='seconds'),
+        "wall_s": round(wall_s, 4),
+        "cpu_s": round(cpu_s, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "options": {
+            "targets": args.targets,
+            "workers": args.workers,
+            "force": args.force,
+            "chunk_size": args.chunk_size,
+        },
+        "tasks": {name: {"status": state, "wall_s": durations.get(name)} for name, state in status.items()},
+        "stages": collected_stages(),
+    }
+    report_file = write_report(report)
+    logging.info(f"📊 Rapport d'exécution : {report_file}")
+
+    # Référence : dernier rapport obtenu avec le même mode de lecture (complet ou par morceaux)
+    for path in reversed(previous):
+        reference = load_report(path)
+        if path != report_file and reference.get("options", {}).get("chunk_size") == args.chunk_size:
+            if log_findings(compare_reports(reference, report)):
+                logging.warning(f"⚠️ Régressions par rapport à {path.name}")
+            break
+    return report_file
+
+
+def main():
+    """
+    Fonction principale : exécution du pipeline ETL complet
+    """
+    parser = argparse.ArgumentParser(description="Orchestrateur ETL MSPR")
+    parser.add_argument("targets", nargs="*", help="Tables à produire (toutes par défaut)")
+    parser.add_argument("--workers", type=int, default=None, help="Nombre de tâches simultanées")
+    parser.add_argument("--force", action="store_true", help="Reconstruit toutes les tables, même à jour")
+    parser.add_argument("--chunk-size", type=int, default=None,
+                        help="Traitement par morceaux de N lignes sources (mémoire bornée)")
+    args = parser.parse_args()
+    if args.chunk_size:
+        # Lu par etl_stream.chunk_size() dans chaque script
+        os.environ["ETL_CHUNK_SIZE"] = str(args.chunk_size)
+
+    # Les scripts utilisent des chemins relatifs au dossier ETL
+    os.chdir(ETL_DIR)
+    sys.path.insert(0, str(ETL_DIR))
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('../ETL/etl.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+    logging.info("🚀 Début du processus ETL global")
+    started_at = datetime.now()
+    start, start_cpu = time.perf_counter(), time.process_time()
+    try:
+        status, durations = run_pipeline(args.targets, args.workers, args.force)
+    except ValueError as e:
+        logging.error(f"❌ {str(e)}")
+        sys.exit(1)
+
+    try:
+        write_run_report(args, status, durations, started_at,
+                         time.perf_counter() - start, time.process_time() - start_cpu)
+    except OSError as e:
+        logging.warning(f"⚠️ Rapport d'exécution non écrit : {str(e)}")
+
+    if any(state not in ("ok", "à jour") for state in status.values()):
+        logging.error(f"❌ Processus ETL global en échec : {status}")
+        sys.exit(1)
+    logging.info(f"✨ Processus ETL global terminé avec succès ({time.perf_counter() - start:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+from joblib import Parallel, delayed
+from sklearn.base import clone
+
+import feature_store
+from forecasting import FORECAST_METHODS, build_series_matrix, forecast_matrix
+from prediction import create_voting_regressor, preprocess_features
+
+
+# Colonnes descriptives retirées des caractéristiques (même liste que prepare_data_generic)
+EXCLUDED_FEATURES = ["region", "nom_pays", "sous_region", "id_unite"]
+
+
+def rolling_origins(years, min_train_years=3, horizon=1):
+    """
+    Liste des années de coupure d'une évaluation à fenêtre croissante.
+    Chaque coupure entraîne sur les années <= origine et évalue les `horizon` suivantes.
+    Args:
+        years (array-like): Années disponibles.
+        min_train_years (int): Nombre minimal d'années dans la fenêtre d'entraînement.
+        horizon (int): Nombre d'années évaluées après chaque coupure.
+
+    Returns:
+        list: Années de coupure, dans l'ordre chronologique.
+    """
+    years = np.unique(np.asarray(years, dtype=np.int64))
+    if min_train_years < 1 or horizon < 1:
+        raise ValueError("min_train_years et horizon doivent être supérieurs ou égaux à 1")
+    # La dernière coupure doit laisser au moins une année à évaluer
+    return [int(y) for y in years[min_train_years - 1:len(years) - 1]]
+
+
+def _forecast_fold(Y, years, ids, origin, horizon, methods, alpha, beta):
+    """
+    Évalue les méthodes de prévision de base sur une coupure, toutes séries à la fois.
+    """
+    train = years <= origin
+    test_idx = np.flatnonzero((years > origin) & (years <= origin + horizon))
+    frames = []
+    for method in methods:
+        future_years, forecasts = forecast_matrix(Y[:, train], years[train], horizon,
+                                                  method=method, alpha=alpha, beta=beta)
+        # Alignement des années prévues sur les colonnes réellement observées
+        cols = np.searchsorted(future_years, years[test_idx])
+        actual = Y[:, test_idx]
+        predicted = forecasts[:, cols]
+        frames.append(pd.DataFrame({
+            "id_pays": np.repeat(ids, len(test_idx)),
+            "origine": origin,
+            "annee": np.tile(years[test_idx], len(ids)),
+            "methode": method,
+            "reel": actual.ravel(),
+            "prevision": predicted.ravel(),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def backtest_forecasts(df, methods=FORECAST_METHODS, min_train_years=3, horizon=1,
+                       alpha=0.5, beta=0.3, n_jobs=-1):
+    """
+    Backtest à origine glissante des prévisions de base (tendance, lissages) sur toutes les séries.
+    Args:
+        df (pd.DataFrame): Données « longues » avec id_pays, annee et valeur.
+        methods (iterable): Méthodes de forecasting.FORECAST_METHODS à comparer.
+        min_train_years (int): Taille minimale de la fenêtre d'entraînement.
+        horizon (int): Nombre d'années évaluées après chaque coupure.
+        n_jobs (int): Nombre de processus pour les coupures (-1 = tous les cœurs).
+
+    Returns:
+        pd.DataFrame: Prévisions et valeurs réelles par (pays, coupure, année, méthode).
+    """
+    ids, years, Y = build_series_matrix(df)
+    origins = rolling_origins(years, min_train_years, horizon)
+    if not origins:
+        return pd.DataFrame(columns=["id_pays", "origine", "annee", "methode", "reel", "prevision"])
+
+    folds = Parallel(n_jobs=n_jobs)(
+        delayed(_forecast_fold)(Y, years, ids, origin, horizon, list(methods), alpha, beta)
+        for origin in origins
+    )
+    predictions = pd.concat(folds, ignore_index=True)
+    return predictions.dropna(subset=["reel"]).reset_index(drop=True)
+
+
+def _model_fold(estimator, X, y, annee, id_pays, origin, horizon):
+    """
+    Entraîne une copie de l'estimateur sur les années <= origine et prédit les suivantes.
+    X et y sont partagés entre les coupures : seuls les masques changent.
+    """
+    train = annee <= origin
+    test = (annee > origin) & (annee <= origin + horizon)
+    if not train.any() or not test.any():
+        return None
+
+    model = clone(estimator)
+    model.fit(X[train], y[train])
+    return pd.DataFrame({
+        "id_pays": id_pays[test],
+        "origine": origin,
+        "annee": annee[test],
+        "methode": type(estimator).__name__,
+        "reel": y[test],
+        "prevision": model.predict(X[test]),
+    })
+
+
+def backtest_model(df, target_column, estimator=None, min_train_years=3, horizon=1, n_jobs=-1,
+                   use_feature_store=False, table=None, filters=None):
+    """
+    Backtest à origine glissante d'un estimateur scikit-learn sur un DataFrame croisé.
+    Les caractéristiques sont prétraitées une seule fois puis réutilisées par toutes les coupures.
+    Args:
+        df (pd.DataFrame): DataFrame croisé (comme celui renvoyé par /dataframe/).
+        target_column (str): Colonne cible.
+        estimator: Estimateur non entraîné (VotingRegressor par défaut).
+        min_train_years (int): Taille minimale de la fenêtre d'entraînement.
+        horizon (int): Nombre d'années évaluées après chaque coupure.
+        n_jobs (int): Nombre de processus pour les coupures (-1 = tous les cœurs).
+        use_feature_store (bool): Lit/écrit la matrice prétraitée dans le feature store.
+        table (str): Table source, pour la clé du feature store.
+        filters (dict): Filtres appliqués, pour la clé du feature store.
+
+    Returns:
+        pd.DataFrame: Prévisions et valeurs réelles par (pays, coupure, année).
+    """
+    if "annee" not in df.columns or target_column not in df.columns:
+        raise ValueError("Les colonnes 'annee' et la colonne cible sont requises pour le backtest")
+
+    df = df.dropna(subset=[target_column, "annee"]).reset_index(drop=True)
+    estimator = estimator if estimator is not None else create_voting_regressor()
+
+    def build_features():
+        features = preprocess_features(df.drop(columns=[target_column] + EXCLUDED_FEATURES, errors="ignore"))
+        return features, df[target_column]
+
+    if use_feature_store:
+        # Même clé que /train_model/ : l'entraînement et le backtest partagent la matrice
+        key = feature_store.make_key(table=table, filters=filters, target=target_column,
+                                     fingerprint=feature_store.dataframe_fingerprint(df))
+        features, _ = feature_store.load_or_build(key, build_features)
+    else:
+        features, _ = build_features()
+    X = features.to_numpy(dtype=np.float64)
+    y = df[target_column].to_numpy(dtype=np.float64)
+    annee = df["annee"].to_numpy(dtype=np.int64)
+    id_pays = df["id_pays"].to_numpy() if "id_pays" in df.columns else np.zeros(len(df), dtype=np.int64)
+
+    origins = rolling_origins(annee, min_train_years, horizon)
+    folds = Parallel(n_jobs=n_jobs)(
+        delayed(_model_fold)(estimator, X, y, annee, id_pays, origin, horizon)
+        for origin in origins
+    )
+    folds = [fold for fold in folds if fold is not None]
+    if not folds:
+        return pd.DataFrame(columns=["id_pays", "origine", "annee", "methode", "reel", "prevision"])
+    return pd.concat(folds, ignore_index=True)
+
+
+def error_table(predictions):
+    """
+    Table d'erreurs par pays et par méthode à partir des prévisions d'un backtest.
+    Returns:
+        pd.DataFrame: id_pays, methode, n, mae, rmse, mape (en %).
+    """
+    errors = predictions.dropna(subset=["reel", "prevision"]).copy()
+    errors["erreur"] = errors["prevision"] - errors["reel"]
+    errors["erreur_abs"] = errors["erreur"].abs()
+    errors["erreur_carre"] = errors["erreur"] ** 2
+    # MAPE indéfinie pour une valeur réelle nulle
+    errors["erreur_pct"] = (errors["erreur_abs"] / errors["reel"].abs().replace(0, np.nan)) * 100
+
+    table = errors.groupby(["id_pays", "methode"]).agg(
+        n=("erreur", "size"),
+        mae=("erreur_abs", "mean"),
+        rmse=("erreur_carre", "mean"),
+        mape=("erreur_pct", "mean"),
+    ).reset_index()
+    table["rmse"] = np.sqrt(table["rmse"])
+    return table
+
+
+def compare_methods(table):
+    """
+    Résumé global de la table d'erreurs : une ligne par méthode, triée par RMSE moyen.
+    """
+    return (
+        table.groupby("methode")[["mae", "rmse", "mape"]]
+        .mean()
+        .sort_values("rmse")
+        .reset_index()
+    )
@@ -0,0 +1,128 @@
+import asyncio
+import os
+
+import numpy as np
+import pandas as pd
+
+import offload
+
+
+# Fenêtre de regroupement (ms) et taille maximale d'un lot, configurables par variables d'environnement
+BATCH_WINDOW_MS = float(os.getenv("PREDICT_BATCH_WINDOW_MS", "3"))
+BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "256"))
+
+
+class MicroBatcher:
+    """
+    Regroupe les prédictions concurrentes d'un même modèle en un seul appel vectorisé.
+    - La première requête d'un lot ouvre une fenêtre de `window_ms` millisecondes :
+      c'est la latence maximale ajoutée à une requête.
+    - Le lot part dès que `max_batch_size` lignes sont en attente, sans attendre la fenêtre.
+    - Les prédictions sont redécoupées et renvoyées à chaque appelant dans l'ordre de ses lignes.
+    - Si le lot échoue, chaque requête est reprise seule : une requête invalide n'entraîne
+      pas l'échec des requêtes regroupées avec elle.
+    - Le calcul du lot passe par `run(route, fn, *args)` (offload.run_cpu, catégorie "predict") :
+      la boucle d'événements n'exécute pas `model.predict`. Une erreur de l'exécuteur
+      (file pleine, délai dépassé) est renvoyée à toutes les requêtes du lot.
+    """
+
+    def __init__(self, model, window_ms=BATCH_WINDOW_MS, max_batch_size=BATCH_MAX_SIZE, run=offload.run_cpu):
+        if window_ms < 0 or max_batch_size < 1:
+            raise ValueError("window_ms doit être positif et max_batch_size supérieur ou égal à 1")
+        self.model = model
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self.run = run
+        self._pending = []
+        self._pending_rows = 0
+        self._timer = None
+        # Lots en cours de calcul (référence gardée jusqu'à leur fin)
+        self._tasks = set()
+
+    async def predict(self, X):
+        """
+        Soumet un DataFrame de caractéristiques et attend ses prédictions.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((X, future))
+        self._pending_rows += len(X)
+
+        if self._pending_rows >= self.max_batch_size or self.window == 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._pending_rows = self._pending, [], 0
+        if not batch:
+            return
+
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _dispatch(self, batch):
+        try:
+            results = await self.run("predict", self._predict_batch, [frame for frame, _ in batch])
+        except Exception as e:
+            # Lot non exécuté (exécuteur saturé, délai dépassé) : même erreur pour chaque requête
+            for _, future in batch:
+                self._resolve(future, error=e)
+            return
+        for (_, future), (result, error) in zip(batch, results):
+            self._resolve(future, result, error)
+
+    def _predict_batch(self, frames):
+        """
+        Prédictions d'un lot, dans un fil de l'exécuteur.
+        Returns:
+            list: (prédictions, erreur) de chaque requête, dans l'ordre du lot
+        """
+        try:
+            X = pd.concat(frames, ignore_index=True)
+            predictions = np.asarray(self.model.predict(X))
+        except Exception as e:
+            # Lot en échec : chaque requête est reprise seule, l'erreur ne touche que la sienne
+            if len(frames) == 1:
+                return [(None, e)]
+            results = []
+            for frame in frames:
+                try:
+                    results.append((np.asarray(self.model.predict(frame)), None))
+                except Exception as error:
+                    results.append((None, error))
+            return results
+
+        # Redécoupage des prédictions selon la taille de chaque requête
+        bounds = np.cumsum([len(frame) for frame in frames])[:-1]
+        return [(part, None) for part in np.split(predictions, bounds)]
+
+    @staticmethod
+    def _resolve(future, result=None, error=None):
+        # Appelant parti (requête annulée) : future déjà terminée
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+_batchers = {}
+
+
+def batcher_for(model, **kwargs):
+    """
+    MicroBatcher associé à un modèle : un seul par modèle chargé dans le processus.
+    Un nouveau modèle (réentraînement) obtient un nouveau batcher.
+    """
+    batcher = _batchers.get(id(model))
+    if batcher is None or batcher.model is not model:
+        _batchers.clear()
+        batcher = _batchers[id(model)] = MicroBatcher(model, **kwargs)
+    return batcher
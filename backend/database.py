@@ -1,37 +1,65 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import StaticPool
+from pathlib import Path
 import os
 from dotenv import load_dotenv
 
-# Charge les variables d'environnement depuis .env
-load_dotenv(dotenv_path="C:/Users/gaels/OneDrive/Documents/ECOLE-EPSI/Mspr/API/.env")
-
-# Récupération des variables d'environnement
-POSTGRES_USER = os.getenv("POSTGRES_USER")
-POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
-POSTGRES_HOST = os.getenv("POSTGRES_HOST")
-POSTGRES_PORT = os.getenv("POSTGRES_PORT")
-POSTGRES_DB = os.getenv("POSTGRES_DB")
-print(f"User: {POSTGRES_USER}, Password: {POSTGRES_PASSWORD}, Host: {POSTGRES_HOST}, Port: {POSTGRES_PORT}, DB: {POSTGRES_DB}")
-# Vérification des variables d'environnement
-if not all(
-    [POSTGRES_USER,POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB]
-):
-    raise ValueError(
-        "❌ Erreur : Certaines variables d'environnement ne sont pas chargées. Vérifie ton fichier .env !"
-    )
-
-# Construction sécurisée de l'URL de la base de données
-DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
-print(f"✅ Connexion à la base de données : {DATABASE_URL}")
+# Charge les variables d'environnement depuis .env (ENV_FILE, sinon backend/.env) ;
+# les variables déjà définies sont prioritaires
+load_dotenv(dotenv_path=os.getenv("ENV_FILE", Path(__file__).resolve().parent / ".env"))
+
+
+def database_url():
+    """
+    URL SQLAlchemy asynchrone de la base.
+    - DATABASE_URL si défini (ex. sqlite+aiosqlite:///./mspr.db, base locale de local_db.py)
+    - sinon PostgreSQL à partir des variables POSTGRES_*
+    """
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
+
+    # Récupération des variables d'environnement
+    POSTGRES_USER = os.getenv("POSTGRES_USER")
+    POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
+    POSTGRES_HOST = os.getenv("POSTGRES_HOST")
+    POSTGRES_PORT = os.getenv("POSTGRES_PORT")
+    POSTGRES_DB = os.getenv("POSTGRES_DB")
+    # Vérification des variables d'environnement
+    if not all(
+        [POSTGRES_USER,POSTGRES_PASSWORD, POSTGRES_HOST, POSTGRES_PORT, POSTGRES_DB]
+    ):
+        raise ValueError(
+            "❌ Erreur : Certaines variables d'environnement ne sont pas chargées. Vérifie ton fichier .env "
+            "(ou définis DATABASE_URL) !"
+        )
+
+    # Construction sécurisée de l'URL de la base de données
+    return f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+
+def engine_options(url):
+    """
+    Options du moteur selon la base : pool de connexions pour PostgreSQL,
+    connexion unique partagée pour une base SQLite en mémoire.
+    SQL_ECHO=0 désactive les logs SQL.
+    """
+    options = {"echo": os.getenv("SQL_ECHO", "1") != "0"}
+    if make_url(url).get_backend_name() == "sqlite":
+        if make_url(url).database in (None, "", ":memory:"):
+            options.update(poolclass=StaticPool, connect_args={"check_same_thread": False})
+        return options
+    options.update(pool_size=10, max_overflow=20)
+    return options
+
+
+DATABASE_URL = database_url()
+print(f"✅ Connexion à la base de données : {make_url(DATABASE_URL).render_as_string(hide_password=True)}")
 
 # Création du moteur SQLAlchemy asynchrone avec optimisation des connexions
-engine = create_async_engine(
-    DATABASE_URL,
-    echo=True,  # Active les logs SQL pour le débogage
-    pool_size=10,  # Nombre max de connexions en pool
-    max_overflow=20,  # Nombre max de connexions excédentaires
-)
+engine = create_async_engine(DATABASE_URL, **engine_options(DATABASE_URL))
 
 # Création de la session asynchrone
 SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
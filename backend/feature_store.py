@@ -0,0 +1,189 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Version du pipeline de préparation (prepare_data_generic + preprocess_features).
+# À incrémenter dès que la préparation des caractéristiques change : les anciennes entrées sont ignorées.
+PIPELINE_VERSION = 1
+
+STORE_DIR = Path(os.getenv("FEATURE_STORE_DIR", Path(__file__).resolve().parent / "feature_store"))
+
+# Taille maximale du store (Mo) et nombre maximal d'entrées : au-delà, les entrées
+# les moins récemment utilisées sont supprimées (chaque nouveau DataFrame crée une entrée)
+MAX_SIZE_MB = float(os.getenv("FEATURE_STORE_MAX_MB", "512"))
+MAX_ENTRIES = int(os.getenv("FEATURE_STORE_MAX_ENTRIES", "64"))
+
+
+def dataframe_fingerprint(df):
+    """
+    Empreinte du contenu d'un DataFrame (hachage vectorisé pandas, sans sérialisation).
+    """
+    hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(hashes.tobytes())
+    digest.update(",".join(map(str, df.columns)).encode())
+    return digest.hexdigest()[:16]
+
+
+def make_key(table=None, filters=None, target=None, fingerprint=None):
+    """
+    Clé d'une entrée du store : table, filtres, cible, version du pipeline et empreinte des données.
+    Args:
+        table (str): Table source (ex. "mortalite").
+        filters (dict): Filtres appliqués (région, pays...).
+        target (str): Colonne cible.
+        fingerprint (str): Empreinte des données (voir dataframe_fingerprint).
+
+    Returns:
+        str: Clé hexadécimale stable.
+    """
+    parts = {
+        "table": table,
+        "filters": filters or {},
+        "target": target,
+        "pipeline_version": PIPELINE_VERSION,
+        "fingerprint": fingerprint,
+    }
+    raw = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def _entry_dir(key, root=None):
+    return Path(root or STORE_DIR) / key
+
+
+def save(key, X, y=None, root=None):
+    """
+    Enregistre une matrice de caractéristiques (et sa cible) au format .npy.
+    L'écriture passe par un dossier temporaire renommé à la fin : un lecteur concurrent
+    ne voit jamais une entrée incomplète.
+    """
+    entry = _entry_dir(key, root)
+    tmp = entry.with_name(f".{key}.tmp-{os.getpid()}")
+    tmp.mkdir(parents=True, exist_ok=True)
+
+    np.save(tmp / "X.npy", np.ascontiguousarray(X.to_numpy(dtype=np.float64)))
+    if y is not None:
+        np.save(tmp / "y.npy", np.ascontiguousarray(pd.Series(y).to_numpy(dtype=np.float64)))
+    meta = {
+        "columns": [str(c) for c in X.columns],
+        "target": getattr(y, "name", None),
+        "pipeline_version": PIPELINE_VERSION,
+    }
+    (tmp / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    try:
+        os.replace(tmp, entry)
+    except OSError:
+        # Entrée déjà écrite par un autre processus : on garde la sienne
+        shutil.rmtree(tmp, ignore_errors=True)
+    return entry
+
+
+def load(key, root=None):
+    """
+    Charge une entrée du store en mémoire mappée, en lecture seule.
+    Les processus qui chargent la même entrée partagent les pages du cache système.
+    Returns:
+        tuple: (X DataFrame, y Series ou None), ou None si l'entrée n'existe pas.
+    """
+    entry = _entry_dir(key, root)
+    if not (entry / "meta.json").exists():
+        return None
+
+    try:
+        meta = json.loads((entry / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("pipeline_version") != PIPELINE_VERSION:
+            return None
+
+        X_values = np.load(entry / "X.npy", mmap_mode="r")
+        y_values = np.load(entry / "y.npy", mmap_mode="r") if (entry / "y.npy").exists() else None
+        # Date d'utilisation : l'entrée redevient la plus récente pour l'éviction
+        os.utime(entry)
+    except FileNotFoundError:
+        # Entrée supprimée entre-temps par l'éviction d'un autre processus
+        return None
+
+    X = pd.DataFrame(X_values, columns=meta["columns"], copy=False)
+    y = None
+    if y_values is not None:
+        y = pd.Series(y_values, name=meta.get("target"), copy=False)
+    return X, y
+
+
+def load_or_build(key, build, root=None):
+    """
+    Renvoie l'entrée `key` du store, en la construisant avec `build()` si elle est absente.
+    Args:
+        key (str): Clé (voir make_key).
+        build (callable): Fonction renvoyant (X, y) prétraités.
+
+    Returns:
+        tuple: (X, y) chargés en mémoire mappée depuis le store.
+    """
+    cached = load(key, root)
+    if cached is not None:
+        return cached
+
+    X, y = build()
+    save(key, X, y, root)
+    evict(keep=key, root=root)
+    # Entrée relue en mémoire mappée (ou valeurs construites si elle vient d'être évincée ailleurs)
+    return load(key, root) or (X, y)
+
+
+def _entry_size(entry):
+    return sum(f.stat().st_size for f in entry.iterdir() if f.is_file())
+
+
+def evict(max_size_mb=MAX_SIZE_MB, max_entries=MAX_ENTRIES, keep=None, root=None):
+    """
+    Supprime les entrées les moins récemment utilisées (date de modification du dossier,
+    mise à jour à chaque chargement) jusqu'à respecter la taille et le nombre maximal d'entrées.
+    Les pages déjà mappées par un lecteur restent valides après la suppression des fichiers.
+    Args:
+        keep (str): Clé jamais supprimée (entrée qui vient d'être écrite).
+
+    Returns:
+        list: Clés supprimées.
+    """
+    store = Path(root or STORE_DIR)
+    if not store.exists():
+        return []
+
+    entries = []
+    for entry in store.iterdir():
+        # Dossiers temporaires d'une écriture en cours ignorés
+        if not entry.is_dir() or entry.name.startswith("."):
+            continue
+        try:
+            entries.append((entry.stat().st_mtime, entry, _entry_size(entry)))
+        except FileNotFoundError:
+            continue
+    entries.sort(key=lambda e: e[0])
+
+    total = sum(size for _, _, size in entries)
+    count = len(entries)
+    removed = []
+    for _, entry, size in entries:
+        if total <= max_size_mb * 1024 ** 2 and count <= max_entries:
+            break
+        if entry.name == keep:
+            continue
+        shutil.rmtree(entry, ignore_errors=True)
+        total -= size
+        count -= 1
+        removed.append(entry.name)
+    return removed
+
+
+def clear(root=None):
+    """
+    Supprime toutes les entrées du store.
+    """
+    shutil.rmtree(Path(root or STORE_DIR), ignore_errors=True)
@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+
+# Méthodes de prévision exposées par l'API
+FORECAST_METHODS = ("trend", "ses", "holt")
+
+
+class DuplicateSeriesError(ValueError):
+    """
+    Plusieurs valeurs pour une même (série, année) : la matrice des séries serait ambiguë.
+    """
+
+
+def build_series_matrix(df, id_column="id_pays", year_column="annee", value_column="valeur"):
+    """
+    Construit la matrice pays × années à partir d'un DataFrame « long ».
+    - Une ligne par série (pays), une colonne par année.
+    - Les années absentes pour un pays sont laissées à NaN.
+    - Une seule valeur par (série, année) : des doublons (ex. plusieurs types de statistique
+      mélangés) lèvent une DuplicateSeriesError au lieu d'être écrasés silencieusement.
+    Args:
+        df (pd.DataFrame): Données contenant l'identifiant, l'année et la valeur.
+        id_column (str): Colonne identifiant la série.
+        year_column (str): Colonne de l'année.
+        value_column (str): Colonne de la valeur à prévoir.
+
+    Returns:
+        ids (np.ndarray): Identifiants des séries (ordre des lignes).
+        years (np.ndarray): Années observées (ordre des colonnes).
+        Y (np.ndarray): Matrice float64 de forme (n_series, n_years).
+    """
+    if df.empty:
+        return np.array([], dtype=np.int64), np.array([], dtype=np.int64), np.empty((0, 0))
+
+    ids, id_codes = np.unique(df[id_column].to_numpy(), return_inverse=True)
+    years, year_codes = np.unique(df[year_column].to_numpy(dtype=np.int64), return_inverse=True)
+
+    cells = id_codes.astype(np.int64) * len(years) + year_codes
+    if len(np.unique(cells)) != len(cells):
+        duplicates = df.loc[df.duplicated([id_column, year_column], keep=False), [id_column, year_column]]
+        raise DuplicateSeriesError(
+            f"{len(duplicates)} lignes en double sur ({id_column}, {year_column}), "
+            f"ex. {duplicates.iloc[0].to_dict()}"
+        )
+
+    # Remplissage direct par indices : pas de pivot ni de boucle par pays
+    Y = np.full((len(ids), len(years)), np.nan)
+    Y[id_codes, year_codes] = df[value_column].to_numpy(dtype=np.float64)
+    return ids, years, Y
+
+
+def fit_linear_trend(Y, years):
+    """
+    Ajuste une tendance linéaire (moindres carrés) sur chaque série en une seule passe.
+    Les valeurs manquantes sont ignorées série par série via un masque.
+    Args:
+        Y (np.ndarray): Matrice (n_series, n_years).
+        years (np.ndarray): Années correspondant aux colonnes.
+
+    Returns:
+        intercept (np.ndarray): Valeur de la tendance à l'année moyenne.
+        slope (np.ndarray): Pente annuelle de chaque série.
+        x_mean (float): Année moyenne utilisée pour centrer les années.
+    """
+    x_mean = float(np.mean(years)) if len(years) else 0.0
+    x = np.asarray(years, dtype=np.float64) - x_mean
+
+    mask = ~np.isnan(Y)
+    Yz = np.where(mask, Y, 0.0)
+    n = mask.sum(axis=1)
+    sx = mask @ x
+    sxx = mask @ (x * x)
+    sy = Yz.sum(axis=1)
+    sxy = Yz @ x
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        denom = n * sxx - sx * sx
+        # Une seule année observée : pente nulle, la tendance est la moyenne
+        slope = np.where(denom > 0, (n * sxy - sx * sy) / np.where(denom > 0, denom, 1.0), 0.0)
+        intercept = (sy - slope * sx) / n
+
+    intercept[n == 0] = np.nan
+    slope[n == 0] = np.nan
+    return intercept, slope, x_mean
+
+
+def fit_exponential_smoothing(Y, alpha=0.5, beta=None):
+    """
+    Lissage exponentiel simple (beta=None) ou de Holt (tendance additive).
+    La récursion avance année par année mais traite toutes les séries à la fois.
+    Une année manquante reprend la prévision à un pas au lieu de l'observation.
+    Args:
+        Y (np.ndarray): Matrice (n_series, n_years).
+        alpha (float): Coefficient de lissage du niveau (0 < alpha <= 1).
+        beta (float): Coefficient de lissage de la tendance, None pour le lissage simple.
+
+    Returns:
+        level (np.ndarray): Niveau final de chaque série.
+        trend (np.ndarray): Tendance finale (zéros pour le lissage simple).
+    """
+    if not 0 < alpha <= 1:
+        raise ValueError("alpha doit être compris dans ]0, 1]")
+    if beta is not None and not 0 < beta <= 1:
+        raise ValueError("beta doit être compris dans ]0, 1]")
+
+    n_series, n_years = Y.shape
+    holt = beta is not None
+    level = np.full(n_series, np.nan)
+    trend = np.zeros(n_series)
+    # Holt : la tendance est initialisée sur la deuxième observation de la série
+    trend_ready = np.zeros(n_series, dtype=bool) if holt else np.ones(n_series, dtype=bool)
+
+    for t in range(n_years):
+        y = Y[:, t]
+        observed = ~np.isnan(y)
+        started = ~np.isnan(level)
+
+        first = observed & ~started
+        init_trend = observed & started & ~trend_ready
+        smooth = observed & started & trend_ready
+        gap = ~observed & started
+
+        expected = level + trend
+        new_level = alpha * y + (1 - alpha) * expected
+
+        if holt:
+            trend = np.where(init_trend, y - level, trend)
+            trend = np.where(smooth, beta * (new_level - level) + (1 - beta) * trend, trend)
+            trend_ready |= init_trend
+
+        level = np.where(first | init_trend, y, level)
+        level = np.where(smooth, new_level, level)
+        level = np.where(gap, expected, level)
+
+    return level, trend
+
+
+def forecast_matrix(Y, years, horizon, method="holt", alpha=0.5, beta=0.3):
+    """
+    Prévoit `horizon` années pour toutes les séries de la matrice.
+    Args:
+        Y (np.ndarray): Matrice (n_series, n_years).
+        years (np.ndarray): Années observées.
+        horizon (int): Nombre d'années à prévoir.
+        method (str): "trend", "ses" ou "holt".
+        alpha (float): Coefficient de lissage du niveau.
+        beta (float): Coefficient de lissage de la tendance (Holt uniquement).
+
+    Returns:
+        future_years (np.ndarray): Années prévues.
+        forecasts (np.ndarray): Matrice (n_series, horizon).
+    """
+    if method not in FORECAST_METHODS:
+        raise ValueError(f"Méthode de prévision inconnue : {method}")
+    if horizon < 1:
+        raise ValueError("L'horizon doit être supérieur ou égal à 1")
+
+    years = np.asarray(years, dtype=np.int64)
+    last_year = int(years.max()) if len(years) else 0
+    future_years = np.arange(last_year + 1, last_year + 1 + horizon)
+    steps = np.arange(1, horizon + 1, dtype=np.float64)
+
+    if method == "trend":
+        intercept, slope, x_mean = fit_linear_trend(Y, years)
+        x_future = future_years.astype(np.float64) - x_mean
+        forecasts = intercept[:, None] + slope[:, None] * x_future[None, :]
+    else:
+        level, trend = fit_exponential_smoothing(Y, alpha=alpha, beta=beta if method == "holt" else None)
+        forecasts = level[:, None] + trend[:, None] * steps[None, :]
+
+    return future_years, forecasts
+
+
+def forecast_dataframe(df, horizon, method="holt", alpha=0.5, beta=0.3,
+                       id_column="id_pays", year_column="annee", value_column="valeur"):
+    """
+    Prévision multi-séries à partir d'un DataFrame « long ».
+    Returns:
+        pd.DataFrame: Une ligne par (série, année prévue) avec la colonne `prevision`.
+    """
+    ids, years, Y = build_series_matrix(df, id_column, year_column, value_column)
+    if Y.size == 0:
+        return pd.DataFrame(columns=[id_column, year_column, "prevision"])
+
+    future_years, forecasts = forecast_matrix(Y, years, horizon, method=method, alpha=alpha, beta=beta)
+    return pd.DataFrame({
+        id_column: np.repeat(ids, len(future_years)),
+        year_column: np.tile(future_years, len(ids)),
+        "prevision": forecasts.ravel(),
+    })
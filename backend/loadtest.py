@@ -0,0 +1,450 @@
+"""
+Tests de charge de l'API et comparaison des latences à une référence.
+
+L'application FastAPI de main.py est pilotée soit dans le processus (client httpx sur
+transport ASGI, sans serveur), soit à travers un serveur uvicorn local (--url). Chaque
+route de l'API a un scénario : les requêtes sont envoyées avec une concurrence
+configurable et, pour chaque scénario, sont relevés les latences p50 / p95 / p99,
+le débit (requêtes par seconde) et le nombre d'erreurs.
+
+La référence est enregistrée dans benchmarks/loadtest_baseline.json ; une hausse de latence
+ou une baisse de débit au-delà du seuil donne un code de sortie 1 et le tableau des écarts.
+Les scénarios d'écriture (POST, PUT, DELETE, insertion en masse) ajoutent des lignes :
+à lancer sur une base de test fraîchement chargée depuis DatasetClean (--local : mesures
+comparables d'une exécution à l'autre), ou avec --lecture-seule.
+
+Utilisation :
+    python loadtest.py                                 # dans le processus, base de database.py
+    python loadtest.py --local sqlite                  # base SQLite neuve remplie depuis DatasetClean
+    python loadtest.py --requests 500 --concurrency 20
+    python loadtest.py --url http://localhost:8084     # serveur uvicorn local
+    python loadtest.py --routes /us/mortalite/ /dataframe/
+    python loadtest.py --update-baseline
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+
+BACKEND_DIR = Path(__file__).resolve().parent
+BENCH_DIR = BACKEND_DIR / "benchmarks"
+RESULTS_DIR = BENCH_DIR / "results"
+BASELINE_FILE = BENCH_DIR / "loadtest_baseline.json"
+
+# Hausse relative tolérée et écart minimal (ms) pour signaler une régression de latence
+REGRESSION_THRESHOLD = 0.2
+MIN_LATENCY_DELTA_MS = 10.0
+# Latences comparées (p99 affiché seulement : une ou deux requêtes sur une centaine)
+COMPARED_LATENCIES = ("p50_ms", "p95_ms")
+# Requêtes d'échauffement non mesurées (scénarios sans écriture)
+WARMUP_REQUESTS = 3
+
+# Taille des pages de /us/mortalite/ et des lots de /bulk/
+PAGE_SIZE = 100
+BULK_ROWS = 100
+TRAIN_TABLE = "mortalite"
+
+
+class Scenario:
+    """
+    Requêtes d'une route : méthode, chemin déclaré (couverture) et construction de la requête n°i.
+    - build(context, i) renvoie les arguments de httpx (url, json, params)
+    - weight : part du nombre de requêtes demandé (routes coûteuses : entraînement, backtest)
+    - writes : le scénario modifie la base
+    """
+
+    def __init__(self, name, method, route, build=None, weight=1.0, writes=False):
+        self.name = name
+        self.method = method
+        self.route = route
+        self.build = build or (lambda context, i: {"url": route})
+        self.weight = weight
+        self.writes = writes
+
+    def requests_for(self, requests):
+        return max(1, int(round(requests * self.weight)))
+
+
+def _pays_id(context, i):
+    return context["pays_ids"][i % len(context["pays_ids"])]
+
+
+def _fact_row(context, i, **extra):
+    return {"id_pays": _pays_id(context, i), "annee": 2000 + i % 19, "valeur": 1.0 + i, **extra}
+
+
+def _created_pays(context, i):
+    return context["created_pays"][i % len(context["created_pays"])]
+
+
+def _us_page(context, i):
+    pages = max(1, -(-context["mortalite_count"] // PAGE_SIZE))
+    return {"url": "/us/mortalite/", "params": {"offset": (i % pages) * PAGE_SIZE, "limit": PAGE_SIZE}}
+
+
+def _dataframe_payload(context, i):
+    return {"url": "/dataframe/", "json": {"region": context["region"], "table": TRAIN_TABLE}}
+
+
+def _training_payload(context, i, url):
+    return {"url": url, "json": {"dataframe": context["dataframe"], "target_column": "valeur",
+                                 "table": TRAIN_TABLE, "region": context["region"]}}
+
+
+# Un scénario par route, dans l'ordre d'exécution (/train_model/ avant /predict/,
+# POST /pays/ avant PUT et DELETE qui modifient les pays créés)
+SCENARIOS = [
+    Scenario("OPTIONS /{path}", "OPTIONS", "/{path}", lambda c, i: {"url": "/pays/"}),
+    Scenario("GET /", "GET", "/"),
+    Scenario("GET /payslist/", "GET", "/payslist/"),
+    Scenario("GET /pays/", "GET", "/pays/"),
+    Scenario("GET /population_hiv/", "GET", "/population_hiv/", weight=0.2),
+    Scenario("GET /mortalite/", "GET", "/mortalite/", weight=0.2),
+    Scenario("GET /transmission/", "GET", "/transmission/", weight=0.2),
+    Scenario("GET /statistiques/", "GET", "/statistiques/", weight=0.2),
+    Scenario("GET /tables/", "GET", "/tables/"),
+    Scenario("GET /columns/{table_name}", "GET", "/columns/{table_name}",
+             lambda c, i: {"url": f"/columns/{['mortalite', 'statistique', 'traitement'][i % 3]}"}),
+    Scenario("GET /us/mortalite/", "GET", "/us/mortalite/", _us_page),
+    Scenario("GET /us/mortalite/count/", "GET", "/us/mortalite/count/",
+             lambda c, i: {"url": "/us/mortalite/count/", "params": {"year": 2000 + i % 19}}),
+    Scenario("GET /forecast/", "GET", "/forecast/",
+             lambda c, i: {"url": "/forecast/", "params": {"table": "mortalite", "horizon": 5}}, weight=0.2),
+    Scenario("POST /dataframe/", "POST", "/dataframe/", _dataframe_payload, weight=0.2),
+    Scenario("POST /train_model/", "POST", "/train_model/",
+             lambda c, i: _training_payload(c, i, "/train_model/"), weight=0.02),
+    Scenario("POST /predict/", "POST", "/predict/",
+             lambda c, i: {"url": "/predict/", "json": {"rows": c["predict_rows"]}}),
+    Scenario("POST /backtest/", "POST", "/backtest/",
+             lambda c, i: _training_payload(c, i, "/backtest/"), weight=0.02),
+    Scenario("POST /pays/", "POST", "/pays/",
+             lambda c, i: {"url": "/pays/", "json": {"nom_pays": f"Charge {i}", "region": "Test de charge"}},
+             writes=True),
+    Scenario("PUT /pays/{pays_id}/", "PUT", "/pays/{pays_id}/",
+             lambda c, i: {"url": f"/pays/{_created_pays(c, i)}/",
+                           "json": {"nom_pays": f"Charge {i} modifié", "region": "Test de charge"}},
+             writes=True),
+    Scenario("DELETE /pays/{pays_id}/", "DELETE", "/pays/{pays_id}/",
+             lambda c, i: {"url": f"/pays/{c['created_pays'][i]}/"}, writes=True),
+    Scenario("POST /population_hiv/", "POST", "/population_hiv/",
+             lambda c, i: {"url": "/population_hiv/", "json": _fact_row(c, i)}, writes=True),
+    Scenario("POST /mortalite/", "POST", "/mortalite/",
+             lambda c, i: {"url": "/mortalite/", "json": _fact_row(c, i)}, writes=True),
+    Scenario("POST /transmission/", "POST", "/transmission/",
+             lambda c, i: {"url": "/transmission/", "json": {"id_pays": _pays_id(c, i), "valeur": i % 100}},
+             writes=True),
+    Scenario("POST /statistiques/", "POST", "/statistiques/",
+             lambda c, i: {"url": "/statistiques/",
+                           "json": _fact_row(c, i, id_type_statistique=c["id_type_statistique"])},
+             writes=True),
+    Scenario("POST /bulk/{table_name}/", "POST", "/bulk/{table_name}/",
+             lambda c, i: {"url": "/bulk/mortalite/",
+                           "json": {"rows": [_fact_row(c, i * BULK_ROWS + k) for k in range(BULK_ROWS)]}},
+             weight=0.2, writes=True),
+]
+
+
+# ---------------------- 🟢 PRÉPARATION ----------------------
+async def asgi_client(local=None):
+    """
+    Client httpx relié à l'application dans le processus (transport ASGI, sans serveur).
+    Le modèle entraîné et le feature store sont écrits dans un dossier temporaire,
+    sauf si MODEL_PATH / FEATURE_STORE_DIR sont déjà définis.
+    Args:
+        local (str): "sqlite" ou "postgres" : base locale neuve remplie depuis DatasetClean
+            (local_db.py), sinon base configurée dans database.py.
+    """
+    workdir = Path(tempfile.mkdtemp(prefix="loadtest_"))
+    os.environ.setdefault("MODEL_PATH", str(workdir / "voting_regressor.pkl"))
+    os.environ.setdefault("FEATURE_STORE_DIR", str(workdir / "feature_store"))
+    # Journal SQL désactivé : la sortie console n'est pas mesurée
+    os.environ.setdefault("SQL_ECHO", "0")
+
+    if local:
+        import local_db
+
+        url = local_db.local_url(local, workdir / ("pgdata" if local == "postgres" else "loadtest.db"))
+        os.environ["DATABASE_URL"] = url
+        await local_db.setup_database(url)
+
+    import main
+
+    await main.startup()
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://loadtest", timeout=None)
+
+
+async def declared_routes(client):
+    """
+    Routes déclarées par l'API (schéma OpenAPI) : (méthode, chemin)
+    """
+    response = await client.get("/openapi.json")
+    response.raise_for_status()
+    return {(method.upper(), path)
+            for path, operations in response.json()["paths"].items()
+            for method in operations}
+
+
+async def build_context(client, with_writes):
+    """
+    Données réelles utilisées par les scénarios (pays, région, DataFrame d'entraînement),
+    lues par l'API avant les mesures.
+    """
+    pays = (await client.get("/payslist/")).json()
+    if not pays:
+        raise ValueError("La base ne contient aucun pays : charger DatasetClean avant le test de charge")
+    regions = {}
+    for p in pays:
+        if p["region"]:
+            regions[p["region"]] = regions.get(p["region"], 0) + 1
+    context = {
+        "pays_ids": [p["id"] for p in pays],
+        "region": max(regions, key=regions.get) if regions else None,
+        "mortalite_count": (await client.get("/us/mortalite/count/")).json()["count"],
+        "created_pays": [],
+    }
+
+    response = await client.post("/dataframe/", json=_dataframe_payload(context, 0)["json"])
+    response.raise_for_status()
+    context["dataframe"] = response.json()["dataframe"]
+    rows = [dict(zip(context["dataframe"], values))
+            for values in zip(*(column.values() for column in context["dataframe"].values()))]
+    context["predict_rows"] = [{k: v for k, v in row.items() if k != "valeur"} for row in rows[:20]]
+
+    if with_writes:
+        statistiques = (await client.get("/statistiques/")).json()
+        context["id_type_statistique"] = statistiques[0]["id_type_statistique"] if statistiques else 1
+    return context
+
+
+# ---------------------- 🟡 MESURES ----------------------
+async def run_scenario(client, scenario, context, requests, concurrency):
+    """
+    Envoi des requêtes d'un scénario, `concurrency` requêtes en vol au maximum
+    Returns:
+        dict: Latences (ms), débit et erreurs
+    """
+    if not scenario.writes:
+        for i in range(min(WARMUP_REQUESTS, requests)):
+            await client.request(scenario.method, **scenario.build(context, i))
+
+    indexes = itertools.count()
+    latencies = []
+    errors = {}
+
+    async def worker():
+        while (i := next(indexes)) < requests:
+            arguments = scenario.build(context, i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, **arguments)
+                status = response.status_code
+            except httpx.HTTPError as e:
+                response, status = None, type(e).__name__
+            latencies.append((time.perf_counter() - start) * 1000)
+            if response is None or status >= 400:
+                errors[str(status)] = errors.get(str(status), 0) + 1
+            elif scenario.name == "POST /pays/":
+                context["created_pays"].append(response.json()["id_pays"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    wall = time.perf_counter() - start
+
+    values = np.array(latencies)
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "scenario": scenario.name,
+        "requests": requests,
+        "concurrency": min(concurrency, requests),
+        "errors": sum(errors.values()),
+        "statuses": errors,
+        "p50_ms": round(float(p50), 2),
+        "p95_ms": round(float(p95), 2),
+        "p99_ms": round(float(p99), 2),
+        "max_ms": round(float(values.max()), 2),
+        "rps": round(requests / wall, 1),
+    }
+
+
+@contextlib.contextmanager
+def _muted(quiet=True):
+    """
+    Sorties console de l'API (messages d'entraînement de prediction.py) écartées pendant la mesure
+    """
+    if not quiet:
+        yield
+        return
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+async def run_load_test(client, requests=100, concurrency=10, routes=None, with_writes=True, quiet=True):
+    """
+    Exécution de tous les scénarios (ou de ceux des routes choisies)
+    Returns:
+        tuple: (mesures par scénario, routes de l'API sans scénario)
+    """
+    declared = await declared_routes(client)
+    covered = {(s.method, s.route) for s in SCENARIOS}
+    uncovered = sorted(declared - covered)
+
+    with _muted(quiet):
+        context = await build_context(client, with_writes)
+    results = []
+    for scenario in SCENARIOS:
+        if (routes and scenario.route not in routes) or (scenario.writes and not with_writes):
+            continue
+        # DELETE supprime chaque pays créé par POST une seule fois
+        count = (len(context["created_pays"]) if scenario.method == "DELETE"
+                 else scenario.requests_for(requests))
+        if count == 0 or (scenario.method == "PUT" and not context["created_pays"]):
+            continue
+        with _muted(quiet):
+            result = await run_scenario(client, scenario, context, count, concurrency)
+        print(f"⏱️ {result['scenario']:<28} {result['requests']:>5} req  p50 {result['p50_ms']:>9.2f} ms  "
+              f"p95 {result['p95_ms']:>9.2f} ms  p99 {result['p99_ms']:>9.2f} ms  {result['rps']:>8.1f} req/s"
+              + (f"  ❌ {result['statuses']}" if result["errors"] else ""))
+        results.append(result)
+    return results, uncovered
+
+
+# ---------------------- 🔵 COMPARAISON ----------------------
+def compare_results(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Comparaison de deux séries de mesures, scénario par scénario
+    Args:
+        baseline (dict): Mesures de référence
+        current (dict): Nouvelles mesures
+        threshold (float): Variation relative tolérée (0.2 = +20 % de latence, -20 % de débit)
+    Returns:
+        list: Écarts détectés {scenario, metric, before, after}
+    """
+    before = {s["scenario"]: s for s in baseline.get("scenarios", [])}
+    findings = []
+    for after in current.get("scenarios", []):
+        ref = before.get(after["scenario"])
+        if ref is None:
+            continue
+        for metric in COMPARED_LATENCIES:
+            old, new = ref[metric], after[metric]
+            if new - old > MIN_LATENCY_DELTA_MS and new > old * (1 + threshold):
+                findings.append({"scenario": after["scenario"], "metric": metric, "before": old, "after": new})
+        if after["rps"] < ref["rps"] * (1 - threshold) and ref["p50_ms"] + MIN_LATENCY_DELTA_MS < after["p50_ms"]:
+            findings.append({"scenario": after["scenario"], "metric": "rps", "before": ref["rps"], "after": after["rps"]})
+        if after["errors"] > ref["errors"]:
+            findings.append({"scenario": after["scenario"], "metric": "errors",
+                             "before": ref["errors"], "after": after["errors"]})
+    return findings
+
+
+def diff_table(baseline, current, findings):
+    """
+    Tableau des écarts : latence p95 et débit avant / après pour chaque scénario
+    """
+    before = {s["scenario"]: s for s in baseline.get("scenarios", [])}
+    flagged = {f["scenario"] for f in findings}
+    lines = [f"{'scénario':<28} {'p95 réf.':>10} {'p95':>10} {'écart':>7} {'req/s réf.':>11} {'req/s':>9}"]
+    for after in current["scenarios"]:
+        ref = before.get(after["scenario"], {})
+        old = ref.get("p95_ms")
+        change = f"{(after['p95_ms'] - old) / old:+.0%}" if old else "-"
+        mark = "🐢" if after["scenario"] in flagged else ""
+        lines.append(f"{after['scenario']:<28} {old or '-':>10} {after['p95_ms']:>10} {change:>7} "
+                     f"{ref.get('rps') or '-':>11} {after['rps']:>9} {mark}")
+    return lines
+
+
+def write_json(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+# ---------------------- 🚀 EXECUTION ----------------------
+async def main_async(args):
+    client = httpx.AsyncClient(base_url=args.url, timeout=None) if args.url else await asgi_client(args.local)
+    async with client:
+        scenarios, uncovered = await run_load_test(
+            client, args.requests, args.concurrency, args.routes, not args.lecture_seule, not args.verbose
+        )
+    return {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpu_count": os.cpu_count()},
+        "options": {"target": args.url or "asgi", "database": args.local or "database.py",
+                    "requests": args.requests, "concurrency": args.concurrency},
+        "uncovered_routes": [f"{method} {path}" for method, path in uncovered],
+        "scenarios": scenarios,
+    }
+
+
+def main():
+    """
+    Test de charge, enregistrement des mesures et comparaison à la référence
+    """
+    parser = argparse.ArgumentParser(description="Tests de charge de l'API MSPR")
+    parser.add_argument("--url", default=None, help="Serveur à tester (par défaut : application dans le processus)")
+    parser.add_argument("--local", choices=["sqlite", "postgres"], default=None,
+                        help="Base locale neuve remplie depuis DatasetClean (SQLite ou PostgreSQL embarqué)")
+    parser.add_argument("--requests", type=int, default=100, help="Requêtes par scénario (avant pondération)")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requêtes en vol simultanément")
+    parser.add_argument("--routes", nargs="*", default=None, help="Routes testées (chemins déclarés)")
+    parser.add_argument("--lecture-seule", action="store_true", help="Ignore les scénarios qui modifient la base")
+    parser.add_argument("--seuil", type=float, default=REGRESSION_THRESHOLD, help="Variation relative tolérée")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE, help="Fichier de référence")
+    parser.add_argument("--update-baseline", action="store_true", help="Enregistre les mesures comme référence")
+    parser.add_argument("--verbose", action="store_true", help="Affiche les sorties console de l'API")
+    args = parser.parse_args()
+
+    try:
+        report = asyncio.run(main_async(args))
+    except (ValueError, httpx.HTTPError) as e:
+        print(f"❌ {str(e)}")
+        sys.exit(1)
+
+    result_file = RESULTS_DIR / f"loadtest_{datetime.now():%Y%m%d_%H%M%S}.json"
+    write_json(result_file, report)
+    print(f"📊 Mesures : {result_file}")
+    if report["uncovered_routes"]:
+        print(f"⚠️ Routes sans scénario : {', '.join(report['uncovered_routes'])}")
+
+    if args.update_baseline:
+        write_json(args.baseline, report)
+        print(f"✅ Référence enregistrée : {args.baseline}")
+        return
+    if not args.baseline.exists():
+        print(f"⚠️ Aucune référence ({args.baseline.name}) : lancer avec --update-baseline pour l'enregistrer")
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("options") != report["options"]:
+        print(f"⚠️ Options différentes de la référence : {baseline.get('options')} / {report['options']}")
+    findings = compare_results(baseline, report, args.seuil)
+    print("\n".join(diff_table(baseline, report, findings)))
+    for f in findings:
+        print(f"🐢 {f['scenario']} {f['metric']} : {f['before']} → {f['after']}")
+    if report["uncovered_routes"]:
+        print("❌ Chaque route de l'API doit avoir un scénario (SCENARIOS)")
+        sys.exit(1)
+    if findings:
+        print(f"❌ {len(findings)} régressions au-delà de {args.seuil:.0%} par rapport à {args.baseline.name}")
+        sys.exit(1)
+    print(f"✅ Aucune régression par rapport à {args.baseline.name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Base de données locale pour le développement, les tests de charge et les mesures de performance.
+
+Deux bases autonomes, sans serveur PostgreSQL installé :
+- SQLite (aiosqlite) : fichier local ou base en mémoire
+- PostgreSQL embarqué (pgserver, optionnel) : serveur éphémère dont les données sont
+  dans un dossier local, joignable par socket Unix
+
+Le schéma est créé depuis models.Base puis les tables sont remplies directement depuis
+DatasetClean (Parquet typé, CSV à défaut), avec la correspondance de colonnes de l'ETL
+(ETL/etl_loader.py). L'API utilise ensuite cette base via DATABASE_URL (database.py).
+
+Utilisation :
+    python local_db.py sqlite --path /tmp/mspr.db        # affiche l'URL de la base remplie
+    python local_db.py postgres --path /tmp/mspr_pg
+    DATABASE_URL=$(python local_db.py sqlite --path /tmp/mspr.db) uvicorn main:app --port 8084
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import sys
+from pathlib import Path
+
+from sqlalchemy import insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+
+BACKEND_DIR = Path(__file__).resolve().parent
+ETL_DIR = BACKEND_DIR.parent / "ETL"
+DATASET_DIR = BACKEND_DIR.parent / "DatasetClean"
+POSTGRES_DATABASE = "bdd_mspr"
+
+# Lignes par INSERT exécuté en lot
+INSERT_BATCH = 5_000
+
+
+def sqlite_url(path=None):
+    """
+    URL d'une base SQLite (en mémoire si aucun fichier n'est donné)
+    """
+    return f"sqlite+aiosqlite:///{Path(path).resolve()}" if path else "sqlite+aiosqlite:///:memory:"
+
+
+def embedded_postgres_url(data_dir, database=POSTGRES_DATABASE, persistent=False):
+    """
+    Démarrage (ou réutilisation) d'un serveur PostgreSQL embarqué et création de la base.
+    Args:
+        data_dir (str | Path): Dossier des données du serveur (créé au besoin).
+        database (str): Base à créer si elle n'existe pas.
+        persistent (bool): Serveur laissé en marche à la fin du processus
+            (URL utilisée par un autre processus, ex. uvicorn).
+
+    Returns:
+        str: URL SQLAlchemy asynchrone (asyncpg, socket Unix du serveur).
+    """
+    try:
+        import pgserver
+    except ImportError:
+        raise RuntimeError("PostgreSQL embarqué indisponible : pip install pgserver")
+
+    data_dir = Path(data_dir).resolve()
+    server = pgserver.get_server(data_dir, cleanup_mode=None if persistent else "stop")
+    if database not in server.psql("SELECT datname FROM pg_database;"):
+        server.psql(f"CREATE DATABASE {database};")
+    return f"postgresql+asyncpg://postgres:@/{database}?host={data_dir}"
+
+
+def dataset_frames(dataset_dir=DATASET_DIR):
+    """
+    Tables de DatasetClean converties vers les colonnes SQL, dans l'ordre des clés étrangères
+    Returns:
+        dict: Table SQL -> DataFrame
+    """
+    if str(ETL_DIR) not in sys.path:
+        sys.path.append(str(ETL_DIR))
+    from etl_loader import LOAD_ORDER, TABLE_MAPPINGS, read_dataset_clean, to_db_frame
+
+    frames = read_dataset_clean(dataset_dir)
+    return {TABLE_MAPPINGS[name]["table"]: to_db_frame(name, frames[name]) for name in LOAD_ORDER if name in frames}
+
+
+def _records(df):
+    """
+    Lignes d'un DataFrame en dictionnaires de valeurs Python (None pour les valeurs absentes)
+    """
+    columns = {column: df[column].astype(object).where(df[column].notna(), None).tolist() for column in df.columns}
+    return [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+
+async def create_schema(engine, drop=True):
+    """
+    Création des tables depuis models.Base (supprimées au préalable par défaut : base vide)
+    """
+    import models
+
+    async with engine.begin() as conn:
+        if drop:
+            await conn.run_sync(models.Base.metadata.drop_all)
+        await conn.run_sync(models.Base.metadata.create_all)
+
+
+async def load_fixtures(engine, dataset_dir=DATASET_DIR):
+    """
+    Chargement de DatasetClean dans des tables vides, en une transaction.
+    Les séquences PostgreSQL sont recalées sur les identifiants chargés.
+    Returns:
+        dict: Table SQL -> nombre de lignes chargées
+    """
+    import models
+
+    frames = dataset_frames(dataset_dir)
+    counts = {}
+    async with engine.begin() as conn:
+        for name, df in frames.items():
+            table = models.Base.metadata.tables[name]
+            records = _records(df[[column for column in df.columns if column in table.columns]])
+            for start in range(0, len(records), INSERT_BATCH):
+                await conn.execute(insert(table), records[start:start + INSERT_BATCH])
+            counts[name] = len(records)
+
+            if conn.dialect.name == "postgresql" and records:
+                key = list(table.primary_key.columns)[0].name
+                await conn.execute(text(
+                    f"SELECT setval(pg_get_serial_sequence('{name}', '{key}'), (SELECT MAX({key}) FROM {name}))"
+                ))
+    return counts
+
+
+async def setup_database(url, fixtures=True, dataset_dir=DATASET_DIR):
+    """
+    Base prête pour l'API : schéma recréé et, par défaut, tables remplies depuis DatasetClean.
+    Args:
+        url (str): URL SQLAlchemy asynchrone (sqlite_url, embedded_postgres_url ou autre).
+
+    Returns:
+        dict: Table SQL -> nombre de lignes chargées (vide sans données).
+    """
+    # models.py importe database.py, qui lit DATABASE_URL
+    os.environ.setdefault("DATABASE_URL", url)
+    import database
+
+    engine = create_async_engine(url, **database.engine_options(url) | {"echo": False})
+    try:
+        await create_schema(engine)
+        return await load_fixtures(engine, dataset_dir) if fixtures else {}
+    finally:
+        await engine.dispose()
+
+
+def local_url(backend="sqlite", path=None, persistent=False):
+    """
+    URL d'une base locale (le serveur PostgreSQL embarqué est démarré au besoin)
+    Args:
+        backend (str): "sqlite" ou "postgres".
+        path (str | Path): Fichier SQLite ou dossier du serveur PostgreSQL.
+
+    Returns:
+        str: URL SQLAlchemy asynchrone.
+    """
+    if path is None:
+        # Base en mémoire : propre à un moteur, non partagée entre processus ni entre moteurs
+        raise ValueError("Fichier SQLite ou dossier du serveur PostgreSQL embarqué requis")
+    if backend == "postgres":
+        return embedded_postgres_url(path, persistent=persistent)
+    if backend == "sqlite":
+        return sqlite_url(path)
+    raise ValueError(f"Base locale inconnue : {backend}")
+
+
+def local_database(backend="sqlite", path=None, fixtures=True, persistent=False):
+    """
+    Création d'une base locale remplie (SQLite ou PostgreSQL embarqué)
+    Returns:
+        tuple: (URL de la base, nombre de lignes chargées par table)
+    """
+    url = local_url(backend, path, persistent)
+    return url, asyncio.run(setup_database(url, fixtures))
+
+
+def main():
+    """
+    Création d'une base locale remplie depuis DatasetClean ; l'URL est affichée sur la sortie standard
+    """
+    parser = argparse.ArgumentParser(description="Base de données locale de l'API")
+    parser.add_argument("backend", choices=["sqlite", "postgres"], help="SQLite (aiosqlite) ou PostgreSQL embarqué")
+    parser.add_argument("--path", required=True, help="Fichier SQLite ou dossier du serveur PostgreSQL")
+    parser.add_argument("--vide", action="store_true", help="Schéma seul, sans les données de DatasetClean")
+    args = parser.parse_args()
+
+    try:
+        # Seule l'URL est écrite sur la sortie standard (DATABASE_URL=$(python local_db.py ...))
+        with contextlib.redirect_stdout(sys.stderr):
+            url, counts = local_database(args.backend, args.path, fixtures=not args.vide, persistent=True)
+    except (RuntimeError, ValueError) as e:
+        print(f"❌ {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    for name, count in counts.items():
+        print(f"✅ {name} : {count} lignes chargées", file=sys.stderr)
+    print(url)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,6 @@
-from fastapi import FastAPI, Depends, HTTPException
-import joblib
+from fastapi import FastAPI, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete
+from sqlalchemy import select, update, delete, insert
 from fastapi.middleware.cors import CORSMiddleware
 from typing import List
 import models, schemas
@@ -9,7 +8,19 @@ from database import engine, get_db
 import sys
 import os
 
+import matplotlib
+
+# Serveur sans affichage : pyplot ne doit pas ouvrir de fenêtre depuis les fils de offload.py
+matplotlib.use("Agg")
+
 from prediction import create_voting_regressor, prepare_data_generic, preprocess_features, train_voting_regressor
+from forecasting import FORECAST_METHODS, DuplicateSeriesError, forecast_dataframe
+import feature_store
+import validation
+import model_store
+from batching import batcher_for
+import offload
+from backtesting import backtest_forecasts, backtest_model, compare_methods, error_table
 import pandas as pd
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
@@ -88,6 +99,76 @@ TRANSLATIONS = {
         "fr": "Modèle entraîné avec succès",
         "en": "Model trained successfully",
         "de": "Modell erfolgreich trainiert"
+    },
+    "model_not_found": {
+        "fr": "Aucun modèle entraîné disponible",
+        "en": "No trained model available",
+        "de": "Kein trainiertes Modell verfügbar"
+    },
+    "missing_rows": {
+        "fr": "Les lignes à prédire sont manquantes",
+        "en": "Rows to predict are missing",
+        "de": "Zu prognostizierende Zeilen fehlen"
+    },
+    "invalid_forecast_table": {
+        "fr": "Table non disponible pour la prévision (colonne annee requise)",
+        "en": "Table not available for forecasting (annee column required)",
+        "de": "Tabelle für die Prognose nicht verfügbar (Spalte annee erforderlich)"
+    },
+    "backtest_columns_required": {
+        "fr": "Les colonnes id_pays, annee et la colonne cible sont requises pour le backtest",
+        "en": "Columns id_pays, annee and the target column are required for backtesting",
+        "de": "Die Spalten id_pays, annee und die Zielspalte sind für das Backtesting erforderlich"
+    },
+    "bulk_rows_required": {
+        "fr": "La liste des lignes à insérer est manquante",
+        "en": "The list of rows to insert is missing",
+        "de": "Die Liste der einzufügenden Zeilen fehlt"
+    },
+    "bulk_invalid_rows": {
+        "fr": "{count} lignes ne respectent pas les contraintes du schéma",
+        "en": "{count} rows do not satisfy the schema constraints",
+        "de": "{count} Zeilen erfüllen die Schema-Bedingungen nicht"
+    },
+    "invalid_forecast_method": {
+        "fr": "Méthode de prévision inconnue. Méthodes disponibles : {methods}",
+        "en": "Unknown forecasting method. Available methods: {methods}",
+        "de": "Unbekannte Prognosemethode. Verfügbare Methoden: {methods}"
+    },
+    "statistic_type_required": {
+        "fr": "id_type_statistique est requis pour la table statistique (une série par type)",
+        "en": "id_type_statistique is required for the statistique table (one series per type)",
+        "de": "id_type_statistique ist für die Tabelle statistique erforderlich (eine Reihe pro Typ)"
+    },
+    "duplicate_series": {
+        "fr": "Plusieurs valeurs pour un même pays et une même année : {error}",
+        "en": "Several values for the same country and year: {error}",
+        "de": "Mehrere Werte für dasselbe Land und Jahr: {error}"
+    },
+    "invalid_backtest_parameter": {
+        "fr": "{name} doit être un entier supérieur ou égal à 1",
+        "en": "{name} must be an integer greater than or equal to 1",
+        "de": "{name} muss eine ganze Zahl größer oder gleich 1 sein"
+    },
+    "missing_features": {
+        "fr": "Caractéristiques manquantes pour le modèle : {columns}",
+        "en": "Features missing for the model: {columns}",
+        "de": "Fehlende Merkmale für das Modell: {columns}"
+    },
+    "invalid_feature_values": {
+        "fr": "Valeurs absentes ou non numériques dans les colonnes : {columns}",
+        "en": "Missing or non-numeric values in columns: {columns}",
+        "de": "Fehlende oder nicht numerische Werte in den Spalten: {columns}"
+    },
+    "server_busy": {
+        "fr": "Serveur occupé, réessayez dans un instant",
+        "en": "Server busy, please retry shortly",
+        "de": "Server ausgelastet, bitte gleich erneut versuchen"
+    },
+    "processing_timeout": {
+        "fr": "Le traitement a dépassé le délai autorisé",
+        "en": "Processing exceeded the allowed time",
+        "de": "Die Verarbeitung hat die zulässige Zeit überschritten"
     }
 }
 
@@ -120,6 +201,26 @@ async def init_db():
 @app.on_event("startup")
 async def startup():
     await init_db()
+    # Chargement du modèle en mémoire mappée : quasi instantané, pages partagées entre workers
+    model_store.load_model()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    offload.executor.shutdown()
+
+
+async def run_cpu(route, fn, *args, **kwargs):
+    """
+    Travail CPU (pandas, scikit-learn) exécuté hors de la boucle d'événements (offload.py) :
+    file d'attente pleine -> 503, délai de la route dépassé -> 504.
+    """
+    try:
+        return await offload.run_cpu(route, fn, *args, **kwargs)
+    except offload.ExecutorSaturated:
+        raise HTTPException(status_code=503, detail=tr("server_busy"))
+    except offload.ExecutorTimeout:
+        raise HTTPException(status_code=504, detail=tr("processing_timeout"))
 
 
 # ========================
@@ -268,6 +369,60 @@ async def create_statistique(
     return new_data
 
 
+# ========================
+# Endpoint INSERTION EN MASSE
+# ========================
+
+# Table SQL -> modèle (schéma de validation dans validation.TABLE_SCHEMAS)
+BULK_MODELS = {
+    "pays": models.Pays,
+    "unite": models.Unite,
+    "type_statistique": models.TypeStatistique,
+    "type_traitement": models.TypeTraitement,
+    "population_hiv": models.PopulationHIV,
+    "mortalite": models.Mortalite,
+    "statistique": models.Statistique,
+    "traitement": models.Traitement,
+    "transmission_mere_enfant": models.TransmissionMereEnfant,
+}
+
+
+@app.post("/bulk/{table_name}/")
+async def bulk_insert(table_name: str, payload: dict, db: AsyncSession = Depends(get_db)):
+    """
+    Insertion en masse : {"rows": [{...}, ...]}.
+    Les contraintes du schéma pydantic sont vérifiées par masques vectorisés sur toutes
+    les lignes à la fois (validation.py, sans instance pydantic par ligne).
+    Tout ou rien : une seule ligne non conforme et rien n'est inséré (422 avec le détail).
+    """
+    model = BULK_MODELS.get(table_name)
+    if not model:
+        raise HTTPException(status_code=404, detail=tr("table_not_found", table=table_name))
+    rows = payload.get("rows")
+    if not rows or not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail=tr("bulk_rows_required"))
+
+    schema = validation.TABLE_SCHEMAS[table_name]
+
+    def validate_rows():
+        # Champs du schéma uniquement ; un champ absent des lignes est contrôlé comme vide
+        df = pd.DataFrame.from_records(rows).reindex(columns=list(schema.model_fields))
+        result = validation.validate_frame(df, schema)
+        if not result.ok:
+            raise HTTPException(
+                status_code=422,
+                detail={"message": tr("bulk_invalid_rows", count=result.invalid_count), **result.as_dict()},
+            )
+        return validation.to_records(df, schema)
+
+    records = await run_cpu("bulk", validate_rows)
+
+    # Un seul INSERT exécuté en lot (executemany)
+    await db.execute(insert(model), records)
+    await db.commit()
+    return {"table": table_name, "inserted": len(records)}
+
+
 # ========================
 # ROOT ENDPOINT
 # ========================
@@ -326,6 +481,14 @@ async def create_dataframe(payload: dict, db: AsyncSession = Depends(get_db)):
     result_table = await db.execute(query_table)
     data_table = result_table.scalars().all()
 
+    # Construction et fusion des DataFrames hors de la boucle d'événements
+    return {"dataframe": await run_cpu("dataframe", merge_dataframes, data_pays, data_table)}
+
+
+def merge_dataframes(data_pays, data_table):
+    """
+    DataFrame croisé (pays x table) à partir des objets chargés, sous forme de dictionnaire.
+    """
     # Conversion des données en DataFrames
     df_pays = pd.DataFrame([item.__dict__ for item in data_pays])
     df_table = pd.DataFrame([item.__dict__ for item in data_table])
@@ -333,12 +496,10 @@ async def create_dataframe(payload: dict, db: AsyncSession = Depends(get_db)):
     # Nettoyage des colonnes inutiles
     df_pays = df_pays.drop("_sa_instance_state", axis=1, errors="ignore")
     df_table = df_table.drop("_sa_instance_state", axis=1, errors="ignore")
-    print(f"✅ df_pays : { df_pays }")
-    print(f"✅ df_table { df_table }")  
     # Fusion des deux DataFrames pour créer un DataFrame croisé
     try:
         dataframe_croise = pd.merge(df_pays, df_table, on="id_pays", how="inner")
-        return {"dataframe": dataframe_croise.to_dict()}
+        return dataframe_croise.to_dict()
     except KeyError:
         raise HTTPException(status_code=400, detail=tr("merge_key_error"))
 
@@ -392,28 +553,45 @@ async def train_model_endpoint(payload: dict):
     if not dataframe_dict:
         raise HTTPException(status_code=400, detail=tr("missing_dataframe"))
 
+    # Préparation, entraînement et prédictions hors de la boucle d'événements
+    return await run_cpu("training", train_model, payload, dataframe_dict, target_column)
+
+
+def train_model(payload, dataframe_dict, target_column):
+    """
+    Entraînement du VotingRegressor sur le DataFrame reçu, enregistrement du modèle et prédictions sur tout X.
+    """
     # Convertir le dictionnaire en DataFrame
     df = pd.DataFrame.from_dict(dataframe_dict)
     print(tr("avant_separation", shape=df.shape))
 
-    # Préparer X et y
-    X = df.drop(columns=[target_column, "region", "nom_pays", "sous_region", "id_unite"], errors="ignore")
-    y = df[target_column]
-
-    X = preprocess_features(X)
-    X, y = prepare_data_generic(df, target_column=target_column)
-
-    if y is None:
+    if not target_column or target_column not in df.columns:
         raise HTTPException(status_code=400, detail=tr("target_required"))
 
+    # Labels pour l'axe X (exemple : années si dispo, sinon index)
+    labels = df["annee"].tolist() if "annee" in df.columns else None
+
+    # Préparer X et y : matrices prétraitées lues depuis le feature store si déjà calculées
+    def build_features():
+        X, y = prepare_data_generic(df, target_column=target_column)
+        return preprocess_features(X), y
+
+    key = feature_store.make_key(
+        table=payload.get("table"),
+        filters={"region": payload.get("region"), "pays": payload.get("pays")},
+        target=target_column,
+        fingerprint=feature_store.dataframe_fingerprint(df),
+    )
+    X, y = feature_store.load_or_build(key, build_features)
+
     model = create_voting_regressor()
-    trained_model = train_voting_regressor(model, X, y)
-    joblib.dump(trained_model, "voting_regressor.pkl")
+    trained_model = train_voting_regressor(model, X, y, plot=False)
+    model_store.save_model(trained_model)
 
     # Prédictions sur tout X
     predictions = trained_model.predict(X)
-    # Labels pour l'axe X (exemple : années si dispo, sinon index)
-    labels = list(df["annee"]) if "annee" in df.columns else list(range(len(predictions)))
+    if labels is None:
+        labels = list(range(len(predictions)))
 
     return {
         "prediction": list(predictions),
@@ -421,6 +599,170 @@ async def train_model_endpoint(payload: dict):
         "message": tr("model_trained")
     }
 
+@app.post("/predict/")
+async def predict_endpoint(payload: dict):
+    """
+    Endpoint de prédiction avec le dernier modèle entraîné (chargé en mémoire mappée).
+    """
+    rows = payload.get("rows")
+    if not rows:
+        raise HTTPException(status_code=400, detail=tr("missing_rows"))
+
+    model = model_store.load_model()
+    if model is None:
+        raise HTTPException(status_code=404, detail=tr("model_not_found"))
+
+    X = pd.DataFrame(rows)
+    if hasattr(model, "feature_names_in_"):
+        missing = [column for column in model.feature_names_in_ if column not in X.columns]
+        if missing:
+            raise HTTPException(status_code=400, detail=tr("missing_features", columns=", ".join(map(str, missing))))
+        X = X.reindex(columns=model.feature_names_in_)
+    # Lignes vérifiées avant le regroupement : une requête invalide ne fait pas échouer le lot
+    X = X.apply(pd.to_numeric, errors="coerce")
+    invalid = X.columns[X.isna().any()].tolist()
+    if invalid:
+        raise HTTPException(status_code=400, detail=tr("invalid_feature_values", columns=", ".join(map(str, invalid))))
+    # Les requêtes concurrentes sont regroupées en un seul appel à predict, exécuté hors de la boucle
+    predictions = await batcher_for(model, run=run_cpu).predict(X)
+    return {"prediction": predictions.tolist()}
+
+# ========================
+# ENDPOINT prévision (séries temporelles)
+# ========================
+
+# Tables disposant d'une dimension `annee` exploitable pour la prévision
+FORECAST_TABLES = {
+    "mortalite": models.Mortalite,
+    "population_hiv": models.PopulationHIV,
+    "statistique": models.Statistique,
+}
+
+@app.get("/forecast/")
+async def forecast_endpoint(
+    table: str = Query("mortalite"),
+    horizon: int = Query(5, ge=1, le=50),
+    method: str = Query("holt"),
+    alpha: float = Query(0.5, gt=0, le=1),
+    beta: float = Query(0.3, gt=0, le=1),
+    region: str = Query(None),
+    id_type_statistique: int = Query(None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Endpoint de prévision de toutes les séries pays d'un indicateur en une seule passe.
+    """
+    model = FORECAST_TABLES.get(table)
+    if not model:
+        raise HTTPException(status_code=400, detail=tr("invalid_forecast_table"))
+    if method not in FORECAST_METHODS:
+        raise HTTPException(status_code=400, detail=tr("invalid_forecast_method", methods=", ".join(FORECAST_METHODS)))
+    # Une série par (pays, type) : sans type, les statistiques de tous les types seraient mélangées
+    if table == "statistique" and id_type_statistique is None:
+        raise HTTPException(status_code=400, detail=tr("statistic_type_required"))
+
+    # Lecture des seules colonnes utiles, sans instancier d'objets ORM
+    query = select(model.id_pays, model.annee, model.valeur)
+    if region:
+        query = query.join(models.Pays, models.Pays.id_pays == model.id_pays).where(models.Pays.region == region)
+    if table == "statistique":
+        query = query.where(models.Statistique.id_type_statistique == id_type_statistique)
+    result = await db.execute(query)
+    rows = result.all()
+
+    def forecast():
+        df = pd.DataFrame(rows, columns=["id_pays", "annee", "valeur"])
+        try:
+            forecast_df = forecast_dataframe(df, horizon, method=method, alpha=alpha, beta=beta)
+        except DuplicateSeriesError as e:
+            raise HTTPException(status_code=400, detail=tr("duplicate_series", error=str(e)))
+        forecast_df["prevision"] = forecast_df["prevision"].astype(object).where(forecast_df["prevision"].notna(), None)
+        return sorted(forecast_df["annee"].unique().tolist()), forecast_df.to_dict(orient="records")
+
+    annees, previsions = await run_cpu("forecast", forecast)
+    return {
+        "table": table,
+        "methode": method,
+        "horizon": horizon,
+        "annees": annees,
+        "previsions": previsions,
+    }
+
+@app.post("/backtest/")
+async def backtest_endpoint(payload: dict):
+    """
+    Endpoint d'évaluation à origine glissante (fenêtre croissante sur `annee`).
+    Compare le VotingRegressor aux prévisions de base et renvoie les erreurs par pays.
+    """
+    dataframe_dict = payload.get("dataframe")
+    target_column = payload.get("target_column")
+    min_train_years = _positive_int(payload, "min_train_years", 3)
+    horizon = _positive_int(payload, "horizon", 1)
+    if not dataframe_dict:
+        raise HTTPException(status_code=400, detail=tr("missing_dataframe"))
+    if not target_column:
+        raise HTTPException(status_code=400, detail=tr("target_required"))
+
+    # Les coupures sont déjà réparties sur plusieurs processus (joblib) ; la coordination
+    # et la fusion des erreurs quittent la boucle d'événements
+    return await run_cpu("training", backtest, payload, dataframe_dict, target_column, min_train_years, horizon)
+
+
+def _positive_int(payload, name, default):
+    """
+    Paramètre entier >= 1 du corps de la requête (400 sinon).
+    """
+    value = payload.get(name, default)
+    # bool est un int pour Python : refusé comme les décimaux ("2.5", 2.5) et les textes
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise HTTPException(status_code=400, detail=tr("invalid_backtest_parameter", name=name))
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise HTTPException(status_code=400, detail=tr("invalid_backtest_parameter", name=name))
+    if value < 1:
+        raise HTTPException(status_code=400, detail=tr("invalid_backtest_parameter", name=name))
+    return value
+
+
+def _backtest_forecasts(df, target_column, min_train_years, horizon):
+    """
+    Backtest des prévisions de base ; une série par pays, sans doublon d'année (400 sinon).
+    """
+    try:
+        return backtest_forecasts(
+            df[["id_pays", "annee", target_column]].rename(columns={target_column: "valeur"}),
+            min_train_years=min_train_years, horizon=horizon, n_jobs=1
+        )
+    except DuplicateSeriesError as e:
+        raise HTTPException(status_code=400, detail=tr("duplicate_series", error=str(e)))
+
+
+def backtest(payload, dataframe_dict, target_column, min_train_years, horizon):
+    """
+    Backtest du VotingRegressor et des prévisions de base, erreurs par pays et par méthode.
+    """
+    df = pd.DataFrame.from_dict(dataframe_dict)
+    if not {"id_pays", "annee", target_column}.issubset(df.columns):
+        raise HTTPException(status_code=400, detail=tr("backtest_columns_required"))
+
+    # Prévisions de base en premier : des doublons (pays, année) sont refusés avant l'entraînement
+    baselines = _backtest_forecasts(df, target_column, min_train_years, horizon)
+    predictions = pd.concat([
+        backtest_model(
+            df, target_column, min_train_years=min_train_years, horizon=horizon,
+            use_feature_store=True, table=payload.get("table"),
+            filters={"region": payload.get("region"), "pays": payload.get("pays")}
+        ),
+        baselines,
+    ], ignore_index=True)
+    table = error_table(predictions)
+
+    return {
+        "par_pays": table.to_dict(orient="records"),
+        "par_methode": compare_methods(table).to_dict(orient="records"),
+    }
+
 # ========================
 # RUN SERVER
 # ========================
@@ -0,0 +1,132 @@
+import copy
+import os
+import threading
+from pathlib import Path
+
+import joblib
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+
+
+# Emplacement du modèle entraîné (relatif au dossier de lancement de l'API, comme avant)
+MODEL_PATH = Path(os.getenv("MODEL_PATH", "voting_regressor.pkl"))
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class PackedForestRegressor:
+    """
+    Représentation « à plat » d'un RandomForestRegressor entraîné.
+    Les arbres scikit-learn recopient leurs nœuds dans une mémoire privée au chargement,
+    ce qui empêche tout partage par mmap. Ici, tous les arbres sont concaténés dans
+    quelques tableaux NumPy que joblib peut mapper en lecture seule.
+    """
+
+    def __init__(self, forest):
+        trees = [estimator.tree_ for estimator in forest.estimators_]
+        counts = np.array([tree.node_count for tree in trees], dtype=np.int64)
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        def shift(children, offset):
+            # Les indices d'enfants deviennent globaux, -1 (feuille) est conservé
+            return np.where(children == -1, -1, children + offset)
+
+        self.roots = offsets
+        self.children_left = np.concatenate([shift(t.children_left, o) for t, o in zip(trees, offsets)])
+        self.children_right = np.concatenate([shift(t.children_right, o) for t, o in zip(trees, offsets)])
+        self.feature = np.concatenate([np.maximum(t.feature, 0) for t in trees])
+        self.threshold = np.concatenate([t.threshold for t in trees])
+        self.value = np.concatenate([t.value[:, :, 0] for t in trees])
+        if all(hasattr(t, "missing_go_to_left") for t in trees):
+            self.missing_go_to_left = np.concatenate([t.missing_go_to_left.astype(bool) for t in trees])
+        else:
+            self.missing_go_to_left = np.zeros(len(self.feature), dtype=bool)
+        self.max_depth = max(tree.max_depth for tree in trees)
+        self.n_outputs_ = forest.n_outputs_
+        self.n_features_in_ = forest.n_features_in_
+        if hasattr(forest, "feature_names_in_"):
+            self.feature_names_in_ = forest.feature_names_in_
+
+    def predict(self, X):
+        """
+        Prédit pour toutes les lignes et tous les arbres à la fois, niveau par niveau.
+        """
+        # scikit-learn compare les caractéristiques en float32 aux seuils des nœuds
+        X = np.asarray(X, dtype=np.float32)
+        rows = np.arange(len(X))[None, :]
+        node = np.repeat(self.roots[:, None], len(X), axis=1)
+
+        for _ in range(self.max_depth):
+            left = self.children_left[node]
+            leaf = left == -1
+            if leaf.all():
+                break
+            x = X[rows, self.feature[node]]
+            go_left = np.where(np.isnan(x), self.missing_go_to_left[node], x <= self.threshold[node])
+            node = np.where(leaf, node, np.where(go_left, left, self.children_right[node]))
+
+        prediction = self.value[node].mean(axis=0)
+        return prediction[:, 0] if self.n_outputs_ == 1 else prediction
+
+
+def pack_model(model):
+    """
+    Copie du modèle où chaque RandomForestRegressor est remplacé par un PackedForestRegressor.
+    Le VotingRegressor n'appelle que `predict` sur ses estimateurs : la copie prédit à l'identique.
+    """
+    if isinstance(model, RandomForestRegressor):
+        return PackedForestRegressor(model)
+    if not hasattr(model, "estimators_") or not hasattr(model, "named_estimators_"):
+        return model
+
+    packed = copy.copy(model)
+    packed.estimators_ = [pack_model(estimator) for estimator in model.estimators_]
+    packed.named_estimators_ = type(model.named_estimators_)(
+        **{name: pack_model(estimator) for name, estimator in model.named_estimators_.items()}
+    )
+    return packed
+
+
+def save_model(model, path=MODEL_PATH):
+    """
+    Sauvegarde un modèle entraîné dans un format chargeable en mémoire mappée.
+    - Les forêts sont converties en PackedForestRegressor (tableaux NumPy uniquement).
+    - Pas de compression : joblib écrit les tableaux NumPy bruts, alignés, dans le fichier.
+    - Écriture dans un fichier temporaire puis renommage atomique : un worker qui recharge
+      le modèle ne lit jamais un fichier à moitié écrit.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp-{os.getpid()}")
+    joblib.dump(pack_model(model), tmp, compress=0)
+    os.replace(tmp, path)
+    with _lock:
+        _cache.pop(str(path), None)
+    return path
+
+
+def load_model(path=MODEL_PATH, mmap_mode="r"):
+    """
+    Charge un modèle avec ses tableaux NumPy mappés en mémoire (lecture seule).
+    Tous les workers uvicorn d'un même nœud partagent ainsi une seule copie physique
+    des arbres du RandomForest via le cache de pages du système.
+    Le modèle est mis en cache par processus et rechargé si le fichier a changé.
+    Returns:
+        Le modèle chargé, ou None si le fichier n'existe pas.
+    """
+    path = Path(path)
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    key = str(path)
+    with _lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+    model = joblib.load(path, mmap_mode=mmap_mode)
+    with _lock:
+        _cache[key] = (mtime, model)
+    return model
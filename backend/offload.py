@@ -0,0 +1,139 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Fils d'exécution du travail CPU (pandas, NumPy et scikit-learn libèrent le GIL dans leurs calculs)
+OFFLOAD_WORKERS = int(os.getenv("OFFLOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Tâches admises en attente d'un fil, au-delà de celles en cours : les suivantes sont refusées
+OFFLOAD_QUEUE_DEPTH = int(os.getenv("OFFLOAD_QUEUE_DEPTH", "32"))
+
+
+def _limit(route, concurrency, timeout):
+    """
+    Limites d'une catégorie de route, surchargées par OFFLOAD_<ROUTE>_CONCURRENCY et OFFLOAD_<ROUTE>_TIMEOUT
+    """
+    prefix = f"OFFLOAD_{route.upper()}"
+    return int(os.getenv(f"{prefix}_CONCURRENCY", str(concurrency))), float(os.getenv(f"{prefix}_TIMEOUT", str(timeout)))
+
+
+# Catégorie de route -> (tâches simultanées, délai maximal en secondes, attente comprise)
+# "predict" : lots de /predict/ regroupés par batching.MicroBatcher
+# L'entraînement et le backtest, calculs les plus longs, partagent une catégorie
+ROUTE_LIMITS = {
+    "dataframe": _limit("dataframe", 2, 30),
+    "forecast": _limit("forecast", 2, 30),
+    "bulk": _limit("bulk", 2, 30),
+    "predict": _limit("predict", 2, 10),
+    "training": _limit("training", 1, 300),
+}
+DEFAULT_LIMIT = (1, 60.0)
+
+
+class ExecutorSaturated(Exception):
+    """
+    File d'attente pleine : la tâche est refusée sans être exécutée.
+    """
+
+
+class ExecutorTimeout(Exception):
+    """
+    Délai dépassé : la réponse est abandonnée (une tâche déjà démarrée va à son terme,
+    un fil ne pouvant pas être interrompu, et garde sa place jusque-là).
+    """
+
+
+class CpuExecutor:
+    """
+    Exécute le travail CPU des routes dans un pool de fils borné, pour que la boucle
+    d'événements continue de servir les autres connexions.
+    - Au plus `workers + queue_depth` tâches admises (en cours ou en attente) :
+      au-delà, ExecutorSaturated (à traduire en 503 par l'API).
+    - Chaque catégorie de route a son nombre de tâches simultanées et son délai
+      (ExecutorTimeout au-delà, attente dans la file comprise).
+    - Une tâche abandonnée après le délai occupe sa place jusqu'à la fin réelle de son
+      exécution : les limites valent pour le travail effectivement en cours.
+    """
+
+    def __init__(self, workers=OFFLOAD_WORKERS, queue_depth=OFFLOAD_QUEUE_DEPTH, limits=None):
+        if workers < 1 or queue_depth < 0:
+            raise ValueError("workers doit être supérieur ou égal à 1 et queue_depth positif")
+        self.workers = workers
+        self.max_pending = workers + queue_depth
+        self.limits = dict(ROUTE_LIMITS if limits is None else limits)
+        self.pending = 0
+        self._pool = None
+        self._semaphores = {}
+
+    def _semaphore(self, route):
+        semaphore = self._semaphores.get(route)
+        if semaphore is None:
+            concurrency, _ = self.limits.get(route, DEFAULT_LIMIT)
+            semaphore = self._semaphores[route] = asyncio.Semaphore(concurrency)
+        return semaphore
+
+    async def run(self, route, fn, *args, **kwargs):
+        """
+        Exécute fn(*args, **kwargs) dans le pool et attend son résultat.
+        Args:
+            route (str): Catégorie de route (clé de ROUTE_LIMITS).
+
+        Returns:
+            Résultat de fn ; ses exceptions sont propagées telles quelles.
+        """
+        if self.pending >= self.max_pending:
+            raise ExecutorSaturated(f"{self.pending} tâches en cours ou en attente")
+        _, timeout = self.limits.get(route, DEFAULT_LIMIT)
+        self.pending += 1
+        started = []
+        try:
+            return await asyncio.wait_for(self._execute(route, fn, args, kwargs, started), timeout)
+        except asyncio.TimeoutError:
+            raise ExecutorTimeout(f"{route} : délai de {timeout:g} s dépassé")
+        finally:
+            # Tâche jamais démarrée (délai dépassé dans la file, erreur) : place libérée ici
+            if not started:
+                self.pending -= 1
+
+    async def _execute(self, route, fn, args, kwargs, started):
+        semaphore = self._semaphore(route)
+        await semaphore.acquire()
+        try:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="offload")
+            future = asyncio.wrap_future(self._pool.submit(fn, *args, **kwargs))
+        except BaseException:
+            semaphore.release()
+            raise
+        started.append(future)
+
+        def done(f):
+            semaphore.release()
+            self.pending -= 1
+            # Résultat d'une tâche abandonnée : exception consommée (pas d'avertissement)
+            if not f.cancelled():
+                f.exception()
+
+        future.add_done_callback(done)
+        # La tâche continue si l'attente est annulée (délai) : elle libère sa place en se terminant
+        return await asyncio.shield(future)
+
+    def shutdown(self):
+        """
+        Arrêt du pool (tâches en cours menées à leur terme) ; recréé à la prochaine tâche.
+        """
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+        # Sémaphores liés à la boucle d'événements qui s'arrête
+        self._semaphores.clear()
+
+
+executor = CpuExecutor()
+
+
+async def run_cpu(route, fn, *args, **kwargs):
+    """
+    Exécute un travail CPU dans l'exécuteur partagé du processus.
+    """
+    return await executor.run(route, fn, *args, **kwargs)
@@ -224,10 +224,11 @@ def preprocess_features(X):
     print(tr("after_preprocessing", shape=X.shape))
     return X
 
-def train_voting_regressor(model, X, y):
+def train_voting_regressor(model, X, y, plot=True):
     """
     Entraîne un modèle VotingRegressor avec les caractéristiques (X) et la cible (y).
     Évalue le modèle après l'entraînement.
+    plot=False (API) : pas de graphique des prédictions.
     """
 
     # Séparer les données en ensemble d'entraînement et de test
@@ -253,10 +254,10 @@ def train_voting_regressor(model, X, y):
     print(tr("rmse", rmse=rmse))
     print(tr("r2", r2=r2))
 
-    
-
+    if not plot:
+        return model
 
-    plt.figure(figsize=(10, 6))
+    fig = plt.figure(figsize=(10, 6))
     plt.plot(y_test.values, label="Valeurs réelles", color="blue", marker="o")
     plt.plot(y_pred, label="Prédictions", color="orange", linestyle="--", marker="x")
     plt.xlabel("Index")
@@ -266,6 +267,8 @@ def train_voting_regressor(model, X, y):
     plt.grid(True)
     plt.tight_layout()
     plt.show()
+    # Figure libérée : pyplot garde une référence à chaque figure ouverte
+    plt.close(fig)
 
     return model
 
@@ -0,0 +1,237 @@
+"""
+Mesures de performance du module prediction (prétraitement, entraînement, prédiction).
+
+Les fonctions de prediction.py sont exécutées sur des DataFrames synthétiques au format
+renvoyé par /dataframe/ (pays fusionnés avec une table de faits), pour plusieurs nombres
+de lignes et plusieurs cardinalités de colonnes catégorielles (largeur de l'encodage one-hot).
+
+Pour chaque combinaison, phase par phase :
+- prepare : prepare_data_generic
+- preprocess : preprocess_features
+- fit / predict de chaque estimateur de create_voting_regressor (rf, knn, svr) et de l'ensemble
+- train : train_voting_regressor complet (découpage, entraînement, évaluation, graphique)
+sont relevés la durée (médiane de plusieurs répétitions) et le pic d'allocation mémoire
+(tracemalloc : objets Python et tableaux NumPy, sur une exécution supplémentaire non chronométrée).
+
+Exécution sans affichage (backend matplotlib Agg : plt.show() ne bloque pas), résultats
+JSON dans benchmarks/results/, comparables entre eux avec --compare.
+
+Utilisation :
+    python prediction_benchmark.py
+    python prediction_benchmark.py --sizes 1000 10000 50000 --cardinalities 10 1000 --repeat 1
+    python prediction_benchmark.py --compare ancien.json nouveau.json --seuil 0.2
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.model_selection import train_test_split
+
+from prediction import create_voting_regressor, prepare_data_generic, preprocess_features, train_voting_regressor
+
+
+BACKEND_DIR = Path(__file__).resolve().parent
+RESULTS_DIR = BACKEND_DIR / "benchmarks" / "results"
+
+DEFAULT_SIZES = [1_000, 5_000]
+DEFAULT_CARDINALITIES = [10, 100]
+# Colonnes catégorielles ajoutées au DataFrame (chacune de la cardinalité mesurée)
+CATEGORICAL_COLUMNS = 2
+SEED = 42
+
+# Hausse relative tolérée et écart minimal (s) pour signaler une régression
+REGRESSION_THRESHOLD = 0.2
+MIN_TIME_DELTA = 0.05
+
+
+def merged_frame(n_rows, cardinality, categorical_columns=CATEGORICAL_COLUMNS, seed=SEED):
+    """
+    DataFrame au format de /dataframe/ : colonnes de la table pays, colonnes de la table de faits
+    et colonnes catégorielles supplémentaires de la cardinalité demandée.
+    Args:
+        n_rows (int): Nombre de lignes.
+        cardinality (int): Nombre de valeurs distinctes de chaque colonne catégorielle.
+
+    Returns:
+        DataFrame: Données prêtes pour prepare_data_generic (cible : valeur).
+    """
+    rng = np.random.default_rng(seed)
+    n_pays = max(1, min(200, n_rows // 10))
+    id_pays = rng.integers(1, n_pays + 1, n_rows)
+    annee = rng.integers(2000, 2019, n_rows)
+    df = pd.DataFrame({
+        "id_pays": id_pays,
+        "nom_pays": pd.Series(id_pays).map(lambda i: f"Pays {i}"),
+        "region": pd.Series(id_pays % 6).map(lambda i: f"Région {i}"),
+        "sous_region": None,
+        "id": np.arange(1, n_rows + 1),
+        "annee": annee,
+        "id_unite": None,
+    })
+    for j in range(categorical_columns):
+        codes = rng.integers(0, cardinality, n_rows)
+        df[f"categorie_{j}"] = pd.Series(codes).map(lambda k: f"c{k}").astype(object)
+    df["valeur"] = (id_pays * 10 + (annee - 2000) * 3 + rng.normal(0, 5, n_rows)).round(2)
+    return df
+
+
+@contextlib.contextmanager
+def _muted():
+    """
+    Sorties console de prediction.py (print des dimensions et des types) écartées
+    """
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def measure(fn, repeat):
+    """
+    Durée (médiane de `repeat` exécutions) et pic d'allocation mémoire d'une phase.
+    La mémoire est mesurée sur une exécution supplémentaire, tracemalloc ralentissant le code Python.
+    Returns:
+        tuple: (résultat de la dernière exécution, durée en s, pic mémoire en Mo)
+    """
+    tracemalloc.start()
+    with _muted():
+        result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with _muted():
+            result = fn()
+        durations.append(time.perf_counter() - start)
+    return result, round(statistics.median(durations), 4), round(peak / 1024 ** 2, 2)
+
+
+def benchmark_case(n_rows, cardinality, repeat=3):
+    """
+    Mesure de toutes les phases pour un nombre de lignes et une cardinalité
+    Returns:
+        list: Une mesure par phase {rows, cardinality, features, phase, estimator, wall_s, peak_mb}
+    """
+    df = merged_frame(n_rows, cardinality)
+    records = []
+
+    def record(phase, estimator, wall_s, peak_mb, features):
+        records.append({"rows": n_rows, "cardinality": cardinality, "features": features, "phase": phase,
+                        "estimator": estimator, "wall_s": wall_s, "peak_mb": peak_mb})
+        print(f"⏱️ {n_rows:>7} lignes  card. {cardinality:>5}  {phase:<10} {estimator or '':<7} "
+              f"{wall_s:>9.4f} s  {peak_mb:>8.2f} Mo")
+
+    # prepare_data_generic modifie le DataFrame reçu (index) : une copie par exécution
+    (X, y), wall, peak = measure(lambda: prepare_data_generic(df.copy(), target_column="valeur"), repeat)
+    record("prepare", None, wall, peak, X.shape[1])
+    X, wall, peak = measure(lambda: preprocess_features(X), repeat)
+    record("preprocess", None, wall, peak, X.shape[1])
+
+    # Même découpage que train_voting_regressor
+    X_train, X_test, y_train, _ = train_test_split(X, y, test_size=0.2, random_state=42)
+    voting = create_voting_regressor()
+    for name, estimator in voting.estimators + [("voting", voting)]:
+        fitted, wall, peak = measure(lambda: clone(estimator).fit(X_train, y_train), repeat)
+        record("fit", name, wall, peak, X.shape[1])
+        _, wall, peak = measure(lambda: fitted.predict(X_test), repeat)
+        record("predict", name, wall, peak, X.shape[1])
+
+    def train():
+        model = train_voting_regressor(create_voting_regressor(), X, y)
+        # Une figure par entraînement : fermée pour ne pas fausser les mesures suivantes
+        plt.close("all")
+        return model
+
+    _, wall, peak = measure(train, repeat)
+    record("train", "voting", wall, peak, X.shape[1])
+    return records
+
+
+def compare_results(previous, current, threshold=REGRESSION_THRESHOLD):
+    """
+    Comparaison de deux fichiers de mesures, phase par phase
+    Returns:
+        list: Écarts {rows, cardinality, phase, estimator, metric, before, after}
+    """
+    def key(p):
+        return p["rows"], p["cardinality"], p["phase"], p["estimator"]
+
+    before = {key(p): p for p in previous.get("phases", [])}
+    findings = []
+    for after in current.get("phases", []):
+        ref = before.get(key(after))
+        if ref is None:
+            continue
+        for metric, min_delta in (("wall_s", MIN_TIME_DELTA), ("peak_mb", 1.0)):
+            old, new = ref[metric], after[metric]
+            if new - old > min_delta and new > old * (1 + threshold):
+                findings.append(dict(zip(("rows", "cardinality", "phase", "estimator"), key(after)),
+                                     metric=metric, before=old, after=new))
+    return findings
+
+
+def main():
+    """
+    Mesures des phases de prediction.py, ou comparaison de deux fichiers de mesures
+    """
+    parser = argparse.ArgumentParser(description="Mesures de performance du module prediction")
+    parser.add_argument("--sizes", nargs="+", type=int, default=DEFAULT_SIZES, help="Nombres de lignes")
+    parser.add_argument("--cardinalities", nargs="+", type=int, default=DEFAULT_CARDINALITIES,
+                        help="Valeurs distinctes des colonnes catégorielles")
+    parser.add_argument("--repeat", type=int, default=3, help="Répétitions chronométrées par phase (médiane)")
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON des mesures")
+    parser.add_argument("--compare", nargs=2, type=Path, metavar=("ANCIEN", "NOUVEAU"),
+                        help="Compare deux fichiers de mesures (code de sortie 1 si régression)")
+    parser.add_argument("--seuil", type=float, default=REGRESSION_THRESHOLD, help="Hausse relative tolérée")
+    args = parser.parse_args()
+
+    if args.compare:
+        previous, current = (json.loads(path.read_text(encoding="utf-8")) for path in args.compare)
+        findings = compare_results(previous, current, args.seuil)
+        for f in findings:
+            print(f"🐢 {f['rows']} lignes, card. {f['cardinality']}, {f['phase']} {f['estimator'] or ''} "
+                  f"{f['metric']} : {f['before']} → {f['after']}")
+        if findings:
+            print(f"❌ {len(findings)} régressions au-delà de {args.seuil:.0%}")
+            sys.exit(1)
+        print("✅ Aucune régression")
+        return
+
+    phases = []
+    for n_rows in args.sizes:
+        for cardinality in args.cardinalities:
+            phases.extend(benchmark_case(n_rows, cardinality, args.repeat))
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpu_count": os.cpu_count()},
+        "options": {"repeat": args.repeat, "categorical_columns": CATEGORICAL_COLUMNS, "seed": SEED},
+        "phases": phases,
+    }
+    output = args.output or RESULTS_DIR / f"prediction_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+    print(f"📊 Mesures : {output}")
+
+
+if __name__ == "__main__":
+    main()
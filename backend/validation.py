@@ -0,0 +1,273 @@
+"""
+Validation vectorisée des données en masse, dérivée des schémas pydantic.
+
+Les contraintes déclarées dans schemas.py (Field(ge=..., gt=..., le=..., lt=...,
+min_length=..., max_length=...), champs obligatoires, types int / float / str) sont
+traduites une fois en règles par colonne, puis appliquées comme masques sur des
+DataFrames ou des lots Arrow entiers : aucune instance pydantic n'est créée par ligne.
+
+Utilisé par l'ETL (ETL/etl_dataset.py) et par l'endpoint d'insertion en masse de l'API.
+Ce module ne dépend que de pydantic, numpy et pandas (pyarrow pour les lots Arrow).
+"""
+import typing
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+from annotated_types import Ge, Gt, Le, Lt, MaxLen, MinLen
+
+import schemas
+
+
+# Table SQL -> schéma de création correspondant
+TABLE_SCHEMAS = {
+    "pays": schemas.PaysCreate,
+    "unite": schemas.UniteCreate,
+    "type_statistique": schemas.TypeStatistiqueCreate,
+    "type_traitement": schemas.TypeTraitementCreate,
+    "population_hiv": schemas.PopulationHIVCreate,
+    "mortalite": schemas.MortaliteCreate,
+    "statistique": schemas.StatistiqueCreate,
+    "traitement": schemas.TraitementCreate,
+    "transmission_mere_enfant": schemas.TransmissionMereEnfantCreate,
+}
+
+# Métadonnées annotated_types -> nom de la règle
+BOUNDS = {Ge: "ge", Gt: "gt", Le: "le", Lt: "lt", MinLen: "min_length", MaxLen: "max_length"}
+
+
+class ColumnRule:
+    """
+    Règles d'un champ du schéma : type, caractère obligatoire et bornes.
+    """
+
+    def __init__(self, field, kind, required, bounds):
+        self.field = field
+        self.kind = kind
+        self.required = required
+        self.bounds = bounds
+
+    def __repr__(self):
+        return f"ColumnRule({self.field!r}, {self.kind}, required={self.required}, {self.bounds})"
+
+
+def _kind(annotation):
+    """
+    Type de base d'une annotation (Optional[int] -> "int").
+    """
+    args = [a for a in typing.get_args(annotation) if a is not type(None)]
+    base = args[0] if typing.get_origin(annotation) is typing.Union and args else annotation
+    return {int: "int", float: "float", str: "str"}.get(base)
+
+
+@lru_cache(maxsize=None)
+def schema_rules(schema):
+    """
+    Règles par colonne déduites des Field d'un schéma pydantic.
+    Args:
+        schema (type): Classe pydantic (ex. schemas.MortaliteCreate).
+
+    Returns:
+        tuple: ColumnRule, dans l'ordre des champs du schéma.
+    """
+    rules = []
+    for name, info in schema.model_fields.items():
+        bounds = {}
+        for meta in info.metadata:
+            for cls, rule in BOUNDS.items():
+                if isinstance(meta, cls):
+                    bounds[rule] = getattr(meta, rule)
+        rules.append(ColumnRule(name, _kind(info.annotation), info.is_required(), bounds))
+    return tuple(rules)
+
+
+class ValidationResult:
+    """
+    Résultat d'une validation : masque des lignes conformes et nombre de violations par règle.
+    """
+
+    def __init__(self, n_rows):
+        self.valid = np.ones(n_rows, dtype=bool)
+        self.violations = {}
+
+    def add(self, field, rule, bad):
+        count = int(bad.sum())
+        if count:
+            self.violations[f"{field}:{rule}"] = self.violations.get(f"{field}:{rule}", 0) + count
+            self.valid &= ~bad
+
+    @property
+    def invalid_count(self):
+        return int((~self.valid).sum())
+
+    @property
+    def ok(self):
+        return bool(self.valid.all())
+
+    def invalid_rows(self, limit=None):
+        """
+        Positions des lignes non conformes (les `limit` premières).
+        """
+        rows = np.flatnonzero(~self.valid)
+        return rows[:limit].tolist() if limit else rows.tolist()
+
+    def summary(self):
+        return ", ".join(f"{rule} ({count})" for rule, count in sorted(self.violations.items()))
+
+    def as_dict(self, limit=20):
+        return {
+            "rows": int(len(self.valid)),
+            "invalid": self.invalid_count,
+            "violations": dict(sorted(self.violations.items())),
+            "invalid_rows": self.invalid_rows(limit),
+        }
+
+
+def _check_numbers(result, rule, values, missing):
+    """
+    Type numérique et bornes, sur un tableau float64 (NaN = absent ou non numérique).
+    """
+    present = ~missing
+    not_number = present & np.isnan(values)
+    if rule.kind == "int":
+        with np.errstate(invalid="ignore"):
+            not_number |= present & ~np.isnan(values) & (values != np.floor(values))
+    result.add(rule.field, "type", not_number)
+
+    checked = present & ~not_number
+    with np.errstate(invalid="ignore"):
+        tests = {
+            "ge": lambda bound: values >= bound,
+            "gt": lambda bound: values > bound,
+            "le": lambda bound: values <= bound,
+            "lt": lambda bound: values < bound,
+        }
+        for name, test in tests.items():
+            if name in rule.bounds:
+                result.add(rule.field, name, checked & ~test(rule.bounds[name]))
+
+
+def _check_lengths(result, rule, lengths, missing):
+    """
+    Type texte et longueur des chaînes (min_length, max_length), sur un tableau float64
+    des longueurs (NaN = absent ou valeur non textuelle).
+    """
+    present = ~missing
+    result.add(rule.field, "type", present & np.isnan(lengths))
+    if "min_length" in rule.bounds:
+        result.add(rule.field, "min_length", present & (lengths < rule.bounds["min_length"]))
+    if "max_length" in rule.bounds:
+        result.add(rule.field, "max_length", present & (lengths > rule.bounds["max_length"]))
+
+
+def _str_lengths(series):
+    """
+    Longueur de chaque chaîne (NaN pour une valeur absente ou qui n'est pas du texte).
+    """
+    if pd.api.types.is_string_dtype(series) or pd.api.types.is_object_dtype(series):
+        return series.str.len().to_numpy(dtype=np.float64, na_value=np.nan)
+    return np.full(len(series), np.nan)
+
+
+def validate_frame(df, schema, columns=None):
+    """
+    Validation vectorisée d'un DataFrame selon un schéma pydantic.
+    Args:
+        df (DataFrame): Données à valider.
+        schema (type): Classe pydantic, ou nom de table SQL (clé de TABLE_SCHEMAS).
+        columns (dict): Champ du schéma -> colonne du DataFrame, si les noms diffèrent.
+            Seuls les champs présents dans le DataFrame sont contrôlés.
+
+    Returns:
+        ValidationResult: Masque des lignes conformes et violations par règle.
+    """
+    schema = TABLE_SCHEMAS.get(schema, schema)
+    columns = columns or {}
+    result = ValidationResult(len(df))
+    for rule in schema_rules(schema):
+        column = columns.get(rule.field, rule.field)
+        if column not in df.columns:
+            continue
+        series = df[column]
+        missing = series.isna().to_numpy()
+        if rule.required:
+            result.add(rule.field, "requis", missing)
+
+        if rule.kind in ("int", "float"):
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            _check_numbers(result, rule, values, missing)
+        elif rule.kind == "str":
+            _check_lengths(result, rule, _str_lengths(series), missing)
+    return result
+
+
+def validate_arrow(batch, schema, columns=None):
+    """
+    Validation vectorisée d'une table ou d'un lot Arrow (pyarrow.compute, sans conversion pandas
+    pour les colonnes numériques et texte).
+    Args:
+        batch (pa.Table | pa.RecordBatch): Données à valider.
+        schema (type): Classe pydantic, ou nom de table SQL (clé de TABLE_SCHEMAS).
+        columns (dict): Champ du schéma -> colonne Arrow, si les noms diffèrent.
+
+    Returns:
+        ValidationResult: Masque des lignes conformes et violations par règle.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    schema = TABLE_SCHEMAS.get(schema, schema)
+    columns = columns or {}
+    result = ValidationResult(batch.num_rows)
+    for rule in schema_rules(schema):
+        column = columns.get(rule.field, rule.field)
+        if column not in batch.schema.names:
+            continue
+        array = batch.column(column)
+        missing = pc.is_null(array, nan_is_null=True).to_numpy(zero_copy_only=False)
+        if rule.required:
+            result.add(rule.field, "requis", missing)
+
+        if rule.kind in ("int", "float"):
+            if not (pa.types.is_integer(array.type) or pa.types.is_floating(array.type)):
+                # Texte ou autre : même conversion que pour un DataFrame
+                values = pd.to_numeric(array.to_pandas(), errors="coerce").to_numpy(
+                    dtype=np.float64, na_value=np.nan)
+            else:
+                values = pc.cast(array, pa.float64()).to_numpy(zero_copy_only=False)
+            _check_numbers(result, rule, values, missing)
+        elif rule.kind == "str":
+            if pa.types.is_string(array.type) or pa.types.is_large_string(array.type):
+                lengths = pc.cast(pc.utf8_length(array), pa.float64()).to_numpy(zero_copy_only=False)
+            else:
+                lengths = _str_lengths(array.to_pandas())
+            _check_lengths(result, rule, lengths, missing)
+    return result
+
+
+def to_records(df, schema, valid=None):
+    """
+    Lignes conformes converties en dictionnaires prêts pour un INSERT en masse
+    (champs du schéma uniquement, int / float / str Python, None pour les valeurs absentes).
+    Args:
+        df (DataFrame): Données validées par validate_frame (colonnes = champs du schéma).
+        schema (type): Classe pydantic, ou nom de table SQL (clé de TABLE_SCHEMAS).
+        valid (ndarray): Masque des lignes à conserver (toutes par défaut).
+
+    Returns:
+        list: Un dictionnaire par ligne.
+    """
+    schema = TABLE_SCHEMAS.get(schema, schema)
+    if valid is not None:
+        df = df[valid]
+    data = {}
+    for rule in schema_rules(schema):
+        if rule.field not in df.columns:
+            continue
+        series = df[rule.field]
+        if rule.kind == "int":
+            series = pd.to_numeric(series, errors="coerce").astype("Int64")
+        elif rule.kind == "float":
+            series = pd.to_numeric(series, errors="coerce")
+        data[rule.field] = series.astype(object).where(series.notna(), None).tolist()
+    return [dict(zip(data, values)) for values in zip(*data.values())]